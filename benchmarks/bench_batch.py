@@ -0,0 +1,65 @@
+"""
+Batch ingestion time of many svg files, one at a time versus add_svgs
+with an increasing number of worker threads.
+
+    python -m benchmarks.bench_batch
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from svgmapper.mapper import SVGMapper
+
+from .common import scaled_svg
+
+
+FILES = 200
+FILE_SIZE = 256*1024
+
+
+def specs(paths):
+    return [(path, (i%20)*500, (i//20)*500) for i, path in enumerate(paths)]
+
+
+def sequential(paths):
+    mapper = SVGMapper(10**5, 10**5)
+    for path, x, y in specs(paths):
+        mapper.add_svg_fromfile(path, x, y)
+
+
+def batch(paths, workers):
+    mapper = SVGMapper(10**5, 10**5)
+    errors = mapper.add_svgs(specs(paths), workers=workers)
+    assert not any(errors)
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(FILES):
+            svg = scaled_svg('map1.svg', FILE_SIZE+i)
+            path = os.path.join(tmpdir, 'part{}.svg'.format(i))
+            with open(path, 'wb') as f:
+                f.write(svg)
+            paths.append(path)
+
+        start = time.perf_counter()
+        sequential(paths)
+        base = time.perf_counter()-start
+        print("{:<16}{:>10.1f} ms".format("sequential", base*1000))
+
+        cpus = os.cpu_count() or 1
+        for workers in sorted({1, 2, 4, cpus}):
+            start = time.perf_counter()
+            batch(paths, workers)
+            elapsed = time.perf_counter()-start
+            print("{:<16}{:>10.1f} ms   speedup {:.2f}x".format(
+                "{} workers".format(workers), elapsed*1000, base/elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
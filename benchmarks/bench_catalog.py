@@ -0,0 +1,61 @@
+"""
+Cold start of a batch run adding a library of svg files, sizing each file
+(lazy mapper) or parsing it (eager mapper), without a catalog and with a
+catalog pre-indexed by index_directory. Files are sized without librsvg,
+so the savings are a lower bound for svgs librsvg has to size.
+
+    python -m benchmarks.bench_catalog
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from svgmapper.catalog import SourceCatalog
+from svgmapper.mapper import SVGMapper
+
+from .common import synthetic_svg, best_of
+
+
+FILES = 500
+ELEMENTS = [10, 1000]
+
+
+def add_files(paths, lazy, catalog):
+    mapper = SVGMapper(10**6, 10**6, lazy=lazy, catalog=catalog)
+    for i, path in enumerate(paths):
+        mapper.add_svg_fromfile(path, (i%100)*300, (i//100)*300)
+    return mapper
+
+
+def main():
+    print("{:>10}{:>8}{:>12}{:>14}{:>14}{:>10}".format("elements", "lazy",
+        "index(ms)", "no catalog(ms)", "catalog(ms)", "speedup"))
+    for elements in ELEMENTS:
+        tmpdir = tempfile.mkdtemp()
+        try:
+            paths = []
+            for i in range(FILES):
+                path = os.path.join(tmpdir, 'source{}.svg'.format(i))
+                with open(path, 'wb') as f:
+                    f.write(synthetic_svg(elements, 2, width=100+i))
+                paths.append(path)
+
+            catalog = SourceCatalog(os.path.join(tmpdir, 'catalog.sqlite'))
+            start = time.perf_counter()
+            catalog.index_directory(tmpdir)
+            index = time.perf_counter()-start
+
+            for lazy in (True, False):
+                plain = best_of(lambda: add_files(paths, lazy, None), 3)
+                cataloged = best_of(lambda: add_files(paths, lazy, catalog),
+                        3)
+                print("{:>10}{:>8}{:>12.1f}{:>14.1f}{:>14.1f}{:>9.1f}x".format(
+                    elements, str(lazy), index*1000, plain*1000,
+                    cataloged*1000, plain/cataloged))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Output size and time writing a sheet uncompressed, compressed while it's
+written at several levels, and compressed after rendering it whole.
+
+    python -m benchmarks.bench_compression
+"""
+import gzip
+import os
+import shutil
+import tempfile
+
+from svgmapper.cache import PartCache
+from svgmapper.compression import zstandard
+from svgmapper.mapper import SVGMapper
+
+from .common import fixture_path, best_of
+
+
+PARTS = 2000
+LEVELS = {'gzip': [1, 6, 9], 'zstd': [1, 3, 19]}
+
+
+def build():
+    mapper = SVGMapper(100000, 100000, cache=PartCache())
+    for i in range(PARTS):
+        mapper.add_svg_fromfile(fixture_path('editor.svg'), (i%100)*1000,
+                (i//100)*1100)
+    return mapper
+
+
+def main():
+    mapper = build()
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'out')
+
+    def plain():
+        mapper.to_svg(path, pretty_print=False)
+
+    def whole():
+        with open(path, 'wb') as f:
+            f.write(gzip.compress(mapper.to_svg(pretty_print=False)))
+
+    try:
+        print("{:>10}{:>8}{:>12}{:>12}".format("method", "level", "size(KB)",
+            "time(ms)"))
+        for name, func in (('plain', plain), ('gzip blob', whole)):
+            elapsed = best_of(func, 3)
+            print("{:>10}{:>8}{:>12.1f}{:>12.1f}".format(name, '-',
+                os.path.getsize(path)/1024.0, elapsed*1000))
+
+        for compression, levels in sorted(LEVELS.items()):
+            if compression == 'zstd' and zstandard is None:
+                continue
+            for level in levels:
+                elapsed = best_of(lambda: mapper.to_svg(path,
+                    pretty_print=False, compression=compression,
+                    compression_level=level), 3)
+                print("{:>10}{:>8}{:>12.1f}{:>12.1f}".format(compression,
+                    level, os.path.getsize(path)/1024.0, elapsed*1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Output size and serialization time placing the same parts many times,
+inlining every copy versus <symbol>/<use> deduplication.
+
+    python -m benchmarks.bench_dedup
+"""
+from svgmapper.mapper import SVGMapper
+from svgmapper.cache import PartCache
+
+from .common import scaled_svg, best_of
+
+
+FIXTURES = ['map1.svg', 'map4_rect.svg']
+PLACEMENTS = [10, 100, 1000]
+SOURCE_SIZE = 64*1024
+
+
+def build_mapper(sources, placements):
+    mapper = SVGMapper(10**6, 10**6, cache=PartCache())
+    for i in range(placements):
+        svg = sources[i%len(sources)]
+        mapper.add_svg_fromstring(svg, (i%100)*500, (i//100)*500)
+    return mapper
+
+
+def main():
+    sources = [scaled_svg(f, SOURCE_SIZE) for f in FIXTURES]
+
+    print("{:>10}{:>14}{:>14}{:>12}{:>12}".format("parts", "inline(KB)",
+        "dedup(KB)", "inline(ms)", "dedup(ms)"))
+
+    for placements in PLACEMENTS:
+        mapper = build_mapper(sources, placements)
+        inline_size = len(mapper.to_svg())
+        dedup_size = len(mapper.to_svg(dedup=True))
+        inline_time = best_of(lambda: mapper.to_svg(), 3)
+        dedup_time = best_of(lambda: mapper.to_svg(dedup=True), 3)
+        print("{:>10}{:>14.1f}{:>14.1f}{:>12.1f}{:>12.1f}".format(placements,
+            inline_size/1024.0, dedup_size/1024.0,
+            inline_time*1000, dedup_time*1000))
+
+
+if __name__ == '__main__':
+    main()
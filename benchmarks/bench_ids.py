@@ -0,0 +1,62 @@
+"""
+Cost of namespacing source ids when writing a sheet, using the id index
+of each source, versus copying and rescanning each placement to prefix
+its ids. Sources have many gradients, written once in a shared defs.
+
+    python -m benchmarks.bench_ids
+"""
+from copy import deepcopy
+
+from svgmapper.mapper import SVGMapper
+from svgmapper.transform import prefix_ids
+
+from .common import best_of
+
+
+PLACEMENTS = 2000
+SOURCES = 4
+GRADIENTS = 100
+
+
+def source(number):
+    gradients = b"".join(b'<linearGradient id="g%d"><stop offset="0" '
+            b'stop-color="#%06d"/></linearGradient>' % (i, i)
+            for i in range(GRADIENTS))
+    rects = b"".join(b'<rect x="%d" width="1" height="10" fill="url(#g%d)"/>'
+            % (i, i) for i in range(GRADIENTS))
+    return (b'<svg xmlns="http://www.w3.org/2000/svg" width="%d" '
+            b'height="10"><defs>%s</defs>%s</svg>' % (GRADIENTS+number,
+                gradients, rects))
+
+
+def main():
+    mapper = SVGMapper(10**6, 10**6)
+    mapper.margin_width = 0
+    sources = [source(i) for i in range(SOURCES)]
+    for i in range(PLACEMENTS):
+        mapper.add_svg_fromstring(sources[i%SOURCES], (i%100)*200,
+                (i//100)*20)
+
+    def rescan():
+        # Copy and prefix every placement, with the defs inside each one
+        for i, row in enumerate(mapper.parts.rows()):
+            group = mapper._generate_group(row)
+            root = deepcopy(group.root)
+            prefix_ids(root, "p{}-".format(i))
+
+    indexed = best_of(lambda: mapper.to_svg(pretty_print=False), 3)
+    rescanned = best_of(rescan, 3)
+    output = mapper.to_svg(pretty_print=False)
+
+    print("{} placements of {} sources with {} gradients each".format(
+        PLACEMENTS, SOURCES, GRADIENTS))
+    print("{:>24}{:>12}".format("method", "time(ms)"))
+    print("{:>24}{:>12.1f}".format("indexed+shared defs", indexed*1000))
+    print("{:>24}{:>12.1f}".format("copy+rescan (no write)",
+        rescanned*1000))
+    print("output {:.1f}KB, {} gradients written".format(len(output)/1024.0,
+        output.count(b'<linearGradient')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""
+Re-rendering time after moving a single part, full render versus
+incremental mappers reusing each part serialized output.
+
+    python -m benchmarks.bench_incremental
+"""
+from svgmapper.mapper import SVGMapper
+
+from .common import fixture_path, best_of
+
+
+PARTS = [100, 1000, 5000]
+
+
+def build(count, incremental):
+    mapper = SVGMapper(50000, 50000, incremental=incremental)
+    for i in range(count):
+        mapper.add_svg_fromfile(fixture_path('map4_rect.svg'),
+                (i%100)*450, (i//100)*150, uid='part{}'.format(i))
+    return mapper
+
+
+def edit_and_render(mapper, dedup):
+    x = 45000 if mapper.parts[0][1] == 0 else 0
+    mapper.move_part(0, x, 0)
+    mapper.to_svg(dedup=dedup, pretty_print=False)
+
+
+def main():
+    print("{:<8}{:<8}{:>12}{:>18}".format("parts", "dedup", "full(ms)",
+        "incremental(ms)"))
+    for count in PARTS:
+        for dedup in (False, True):
+            times = []
+            for incremental in (False, True):
+                mapper = build(count, incremental)
+                mapper.to_svg(dedup=dedup, pretty_print=False)
+                times.append(best_of(lambda: edit_and_render(mapper, dedup)))
+            print("{:<8}{:<8}{:>12.1f}{:>18.1f}".format(count, str(dedup),
+                times[0]*1000, times[1]*1000))
+
+
+if __name__ == '__main__':
+    main()
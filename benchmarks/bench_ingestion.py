@@ -0,0 +1,49 @@
+"""
+Per-part ingestion time, before and after single-parse dimension
+extraction, for the tests/data fixtures scaled up to multi-MB files.
+
+    python -m benchmarks.bench_ingestion
+"""
+from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.utils import rsvg_dimensions
+
+from .common import scaled_svg, best_of
+
+
+FIXTURES = ['map1.svg', 'map2.svg', 'map3_cm.svg', 'map4_rect.svg']
+SIZES = [1<<20, 4<<20, 16<<20]
+
+
+def ingest_two_parses(svg, dpi):
+    """Ingestion as it was done before, librsvg sizing plus lxml parse"""
+    width, height = rsvg_dimensions(svg, dpi)
+    return SVGPart.fromstring(svg, width=width, height=height, dpi=dpi)
+
+
+def ingest_single_parse(svg, dpi):
+    """lxml parse, dimensions extracted from the parsed tree"""
+    mapper = SVGMapper(10**9, 10**9, dpi=dpi)
+    mapper.add_svg_fromstring(svg, 0, 0)
+    return mapper
+
+
+def main():
+    dpi = 90.0
+    print("{:<16}{:>10}{:>16}{:>16}".format("fixture", "size(MB)",
+        "two parses(ms)", "one parse(ms)"))
+
+    for filename in FIXTURES:
+        for size in SIZES:
+            svg = scaled_svg(filename, size)
+            try:
+                before = best_of(lambda: ingest_two_parses(svg, dpi), 3)
+                before = "{:.1f}".format(before*1000)
+            except ValueError:
+                before = "n/a" # librsvg unavailable
+            after = best_of(lambda: ingest_single_parse(svg, dpi), 3)
+            print("{:<16}{:>10.1f}{:>16}{:>16.1f}".format(filename,
+                len(svg)/float(1<<20), before, after*1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Peak memory and time loading very large source svgs from file, reading
+the whole file into memory before parsing versus parsing it straight from
+the file, and sizing a file reading only its root element. Each
+measurement runs in a new process so peak RSS isn't shared.
+
+    python -m benchmarks.bench_large_input
+"""
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from svgmapper.mapper import SVGPart
+from svgmapper.utils import svg_dimensions, svg_file_dimensions
+
+from .common import scaled_svg
+
+
+SIZES = [16*1024*1024, 64*1024*1024]
+
+
+def read_part(path):
+    with open(path, 'br') as f:
+        return SVGPart(f.read())
+
+
+def read_dimensions(path):
+    with open(path, 'br') as f:
+        return svg_dimensions(f.read())
+
+
+METHODS = [
+    ('read+parse', read_part),
+    ('fromfile', SVGPart.fromfile),
+    ('read+size', read_dimensions),
+    ('file size', svg_file_dimensions),
+]
+
+
+def measure(func, path, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    result = func(path)
+    elapsed = time.perf_counter()-start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del result
+    queue.put(((after-before)/1024.0, elapsed))
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print("{:>10}{:>14}{:>14}{:>14}".format("file(MB)", "method",
+            "peak(MB)", "time(ms)"))
+        for size in SIZES:
+            path = os.path.join(tmpdir, 'large.svg')
+            with open(path, 'wb') as f:
+                f.write(scaled_svg('map1.svg', size))
+            file_size = os.path.getsize(path)/(1024.0*1024.0)
+
+            for name, func in METHODS:
+                queue = multiprocessing.Queue()
+                process = multiprocessing.Process(target=measure,
+                        args=(func, path, queue))
+                process.start()
+                memory, elapsed = queue.get()
+                process.join()
+                print("{:>10.1f}{:>14}{:>14.1f}{:>14.1f}".format(file_size,
+                    name, memory, elapsed*1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
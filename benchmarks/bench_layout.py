@@ -0,0 +1,41 @@
+"""
+Runtime and sheet utilization packing random rectangle sets.
+
+    python -m benchmarks.bench_layout
+"""
+import random
+import time
+
+from svgmapper.layout import pack
+
+
+SHEET = (2000, 2000)
+COUNTS = [1000, 10000, 30000, 100000]
+# (min, max) rectangle side
+SIDES = [(10, 100), (50, 400)]
+
+
+def main():
+    random.seed(0)
+    print("{:>8}{:>12}{:>8}{:>12}{:>18}".format("rects", "sides",
+        "sheets", "time(ms)", "utilization(%)"))
+
+    for low, high in SIDES:
+        for count in COUNTS:
+            sizes = [(random.randint(low, high), random.randint(low, high))
+                for _ in range(count)]
+
+            start = time.perf_counter()
+            _, sheets = pack(sizes, *SHEET)
+            elapsed = time.perf_counter()-start
+
+            # Last sheet is partially filled, leave it out
+            full = sheets[:-1] or sheets
+            utilization = sum(s.utilization() for s in full)/len(full)
+            print("{:>8}{:>12}{:>8}{:>12.1f}{:>18.1f}".format(count,
+                "{}-{}".format(low, high), len(sheets), elapsed*1000,
+                utilization*100))
+
+
+if __name__ == '__main__':
+    main()
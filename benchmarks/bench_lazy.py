@@ -0,0 +1,59 @@
+"""
+Memory and time of a planner building many candidate layouts of the same
+svgs, and rendering only one of them, with parts parsed when added and
+with lazy parts. Each measurement runs in a new process so peak RSS isn't
+shared.
+
+    python -m benchmarks.bench_lazy
+"""
+import multiprocessing
+import resource
+import time
+
+from svgmapper.mapper import SVGMapper
+
+from .common import synthetic_svg
+
+
+CANDIDATES = [10, 100]
+SOURCES = 20
+
+
+def measure(count, lazy, queue):
+    svgs = [synthetic_svg(2000, 2, 10, width=100+i) for i in range(SOURCES)]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    candidates = []
+    for c in range(count):
+        mapper = SVGMapper(10000, 10000, lazy=lazy)
+        for i, svg in enumerate(svgs):
+            mapper.add_svg_fromstring(svg, ((i+c)%SOURCES)*400, 0)
+        candidates.append(mapper)
+    build = time.perf_counter()-start
+
+    start = time.perf_counter()
+    candidates[-1].to_svg(pretty_print=False)
+    render = time.perf_counter()-start
+
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(((after-before)/1024.0, build, render))
+
+
+def main():
+    print("{:>12}{:>8}{:>12}{:>12}{:>12}".format("candidates", "lazy",
+        "peak(MB)", "build(ms)", "render(ms)"))
+    for count in CANDIDATES:
+        for lazy in (False, True):
+            queue = multiprocessing.Queue()
+            process = multiprocessing.Process(target=measure,
+                    args=(count, lazy, queue))
+            process.start()
+            memory, build, render = queue.get()
+            process.join()
+            print("{:>12}{:>8}{:>12.1f}{:>12.1f}{:>12.1f}".format(count,
+                str(lazy), memory, build*1000, render*1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Finding parts by uid in a composed sheet, with an XPath query per id
+(as find_id did), through the figure id index, and through the mapper
+placements without parsing any output.
+
+    python -m benchmarks.bench_lookup
+"""
+import time
+
+from lxml import etree
+
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+from svgmapper.transform import SVGFigure
+
+from .common import fixture_path
+
+
+PARTS = [1000, 10000]
+
+
+def build(count):
+    mapper = SVGMapper(10**6, 10**6, cache=PartCache())
+    for i in range(count):
+        mapper.add_svg_fromfile(fixture_path('map4_rect.svg'),
+                (i%1000)*500, (i//1000)*200, uid='part{}'.format(i))
+    return mapper
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter()-start
+
+
+def main():
+    print("{:>8}{:>14}{:>14}{:>14}".format("parts", "xpath(ms)",
+        "index(ms)", "mapper(ms)"))
+    for count in PARTS:
+        mapper = build(count)
+        figure = SVGFigure.fromstring(mapper.to_svg(pretty_print=False))
+        uids = ['part{}'.format(i) for i in range(count)]
+        find = etree.XPath("//*[@id=$id]")
+
+        # Only a sample with XPath (it's quadratic), scaled to all uids
+        sample = uids[:min(count, 1000)]
+        xpath_time = timed(lambda: [find(figure.root, id=uid)[0]
+            for uid in sample])*count/len(sample)
+        index_time = timed(lambda: figure.find_ids(uids))
+        mapper_time = timed(mapper.placements_by_uid)
+
+        print("{:>8}{:>14.1f}{:>14.1f}{:>14.1f}".format(count,
+            xpath_time*1000, index_time*1000, mapper_time*1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Output size and rendering time with and without the optimizer, for
+sheets composed from each test fixture.
+
+    python -m benchmarks.bench_optimize
+"""
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+from svgmapper.optimize import Optimizer
+
+from .common import fixture_path, best_of
+
+
+FIXTURES = ['map1.svg', 'map2.svg', 'map3_cm.svg', 'map4_rect.svg',
+        'editor.svg']
+PARTS = 200
+
+
+def build(filename):
+    mapper = SVGMapper(100000, 100000, cache=PartCache())
+    for i in range(PARTS):
+        mapper.add_svg_fromfile(fixture_path(filename), (i%20)*4000,
+                (i//20)*4000)
+    return mapper
+
+
+def main():
+    print("{:>16}{:>12}{:>12}{:>10}{:>12}{:>12}".format("fixture",
+        "plain(KB)", "optim(KB)", "saved", "plain(ms)", "optim(ms)"))
+    for filename in FIXTURES:
+        mapper = build(filename)
+        plain = mapper.to_svg(pretty_print=False)
+        optimizer = Optimizer()
+        optimized = mapper.to_svg(pretty_print=False, optimize=optimizer)
+        report = optimizer.report()
+
+        plain_time = best_of(lambda: mapper.to_svg(pretty_print=False))
+        optimized_time = best_of(lambda: mapper.to_svg(pretty_print=False,
+            optimize=Optimizer(measure=False)))
+
+        print("{:>16}{:>12.1f}{:>12.1f}{:>9.1f}%{:>12.1f}{:>12.1f}".format(
+            filename, len(plain)/1024.0, len(optimized)/1024.0,
+            100.0*report.saved/report.original, plain_time*1000,
+            optimized_time*1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Time per overlap-checked insertion, grid spatial index versus checking
+every box already placed.
+
+    python -m benchmarks.bench_overlap
+"""
+import random
+import time
+
+from svgmapper.spatial import GridIndex, boxes_overlap
+
+
+COUNTS = [1000, 10000, 50000]
+
+
+def random_boxes(count, surface):
+    boxes = []
+    for _ in range(count):
+        x, y = random.uniform(0, surface), random.uniform(0, surface)
+        w, h = random.uniform(20, 100), random.uniform(20, 100)
+        boxes.append((x, y, x+w, y+h))
+    return boxes
+
+
+def insert_indexed(boxes):
+    index = GridIndex(100)
+    for i, box in enumerate(boxes):
+        if not index.intersects(box):
+            index.insert(i, box)
+    return len(index)
+
+
+def insert_naive(boxes):
+    placed = []
+    for box in boxes:
+        if not any(boxes_overlap(box, other) for other in placed):
+            placed.append(box)
+    return len(placed)
+
+
+def main():
+    random.seed(0)
+    print("{:>8}{:>10}{:>18}{:>18}".format("boxes", "placed",
+        "grid(us/insert)", "naive(us/insert)"))
+
+    for count in COUNTS:
+        # Surface big enough for most boxes to be placed
+        boxes = random_boxes(count, int((count*6000)**0.5))
+
+        start = time.perf_counter()
+        placed = insert_indexed(boxes)
+        grid = (time.perf_counter()-start)/count
+
+        if count <= 10000:
+            start = time.perf_counter()
+            insert_naive(boxes)
+            naive = "{:.1f}".format((time.perf_counter()-start)/count*1e6)
+        else:
+            naive = "skipped"
+
+        print("{:>8}{:>10}{:>18.1f}{:>18}".format(count, placed, grid*1e6,
+            naive))
+
+
+if __name__ == '__main__':
+    main()
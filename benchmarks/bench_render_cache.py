@@ -0,0 +1,81 @@
+"""
+Nightly rebuild of unchanged sheets: building and rendering each sheet
+from its svg files, against a warm render cache (the sheet is still
+built to fingerprint it, the output copied from the cache). Lazy sheets
+with a catalog don't read the svg files either. Also the fingerprint
+cost for many placements.
+
+    python -m benchmarks.bench_render_cache
+"""
+import os
+import shutil
+import tempfile
+
+from svgmapper.cache import RenderCache
+from svgmapper.catalog import SourceCatalog
+from svgmapper.mapper import SVGMapper
+
+from .common import synthetic_svg, best_of
+
+
+SHEETS = 20
+SOURCES = 50
+PLACEMENTS = 200
+FINGERPRINT_PLACEMENTS = [1000, 10000]
+
+
+def render(paths, directory, render_cache=None, lazy=False, catalog=None):
+    for sheet in range(SHEETS):
+        mapper = SVGMapper(10**5, 10**5, lazy=lazy, catalog=catalog,
+                render_cache=render_cache)
+        for i in range(PLACEMENTS):
+            mapper.add_svg_fromfile(paths[(i+sheet)%SOURCES], (i%50)*300,
+                    (i//50)*300)
+        mapper.to_svg(os.path.join(directory, 'sheet{}.svg'.format(sheet)),
+                pretty_print=False)
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        paths = []
+        for i in range(SOURCES):
+            paths.append(os.path.join(tmpdir, 'source{}.svg'.format(i)))
+            with open(paths[-1], 'wb') as f:
+                f.write(synthetic_svg(200, 2, width=100+i))
+        output = os.path.join(tmpdir, 'output')
+        os.makedirs(output)
+
+        cache = RenderCache(os.path.join(tmpdir, 'renders'))
+        catalog = SourceCatalog(os.path.join(tmpdir, 'catalog.sqlite'))
+        render(paths, output, cache, True, catalog) # Warm up
+
+        cases = [("render", {}),
+            ("render cache", {'render_cache': cache}),
+            ("render cache, lazy", {'render_cache': cache, 'lazy': True}),
+            ("render cache, lazy, catalog", {'render_cache': cache,
+                'lazy': True, 'catalog': catalog})]
+
+        print("{} sheets of {} placements".format(SHEETS, PLACEMENTS))
+        print("{:>30}{:>12}{:>10}".format("", "time(ms)", "speedup"))
+        baseline = None
+        for name, options in cases:
+            seconds = best_of(lambda: render(paths, output, **options), 3)
+            baseline = baseline or seconds
+            print("{:>30}{:>12.1f}{:>9.1f}x".format(name, seconds*1000,
+                baseline/seconds))
+
+        print("\n{:>12}{:>18}".format("placements", "fingerprint(ms)"))
+        svg = synthetic_svg(10, 1)
+        for count in FINGERPRINT_PLACEMENTS:
+            mapper = SVGMapper(10**6, 10**6)
+            for i in range(count):
+                mapper.add_svg_fromstring(svg, (i%1000)*200, (i//1000)*200)
+            print("{:>12}{:>18.2f}".format(count,
+                best_of(mapper.fingerprint)*1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Rendering time of many independent sheets, one at a time versus
+render_sheets with an increasing number of worker threads.
+
+    python -m benchmarks.bench_sheets
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from svgmapper.batch import build_sheet, render_sheets
+from svgmapper.cache import PartCache
+
+from .common import scaled_svg
+
+
+SHEETS = 100
+PARTS_PER_SHEET = 16
+PART_SIZE = 64*1024
+
+
+def definitions(svg):
+    for i in range(SHEETS):
+        parts = [(svg, (j%4)*500, (j//4)*500) for j in range(PARTS_PER_SHEET)]
+        yield {'name': 'sheet{}'.format(i), 'width': 2000, 'height': 2000,
+                'parts': parts}
+
+
+def sequential(svg, directory):
+    cache = PartCache()
+    for definition in definitions(svg):
+        path = os.path.join(directory, definition['name']+'.svg')
+        build_sheet(definition, cache).to_svg(path, pretty_print=False)
+
+
+def main():
+    svg = scaled_svg('map1.svg', PART_SIZE)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        sequential(svg, tmpdir)
+        base = time.perf_counter()-start
+        print("{:<16}{:>10.1f} ms".format("sequential", base*1000))
+
+        cpus = os.cpu_count() or 1
+        for workers in sorted({1, 2, 4, cpus}):
+            start = time.perf_counter()
+            results = render_sheets(definitions(svg), tmpdir, workers)
+            elapsed = time.perf_counter()-start
+            assert not any(r.error for r in results)
+            render = sum(r.render_time for r in results)/len(results)
+            print("{:<16}{:>10.1f} ms   speedup {:.2f}x   "
+                    "{:.1f} ms/sheet render".format(
+                "{} workers".format(workers), elapsed*1000, base/elapsed,
+                render*1000))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Output throughput of parts serialized from their parsed tree, and copied
+from their source bytes into the output (splice), for parts parsed when
+added and lazy parts (parsed when written, unless spliced).
+
+    python -m benchmarks.bench_splice
+"""
+from svgmapper.mapper import SVGMapper
+
+from .common import synthetic_svg, best_of
+
+
+SOURCES = 50
+PLACEMENTS = 1000
+ELEMENTS = [10, 1000]
+
+
+def build(elements, lazy):
+    mapper = SVGMapper(10**6, 10**6, lazy=lazy)
+    svgs = [synthetic_svg(elements, 2, width=100+i) for i in range(SOURCES)]
+    for i in range(PLACEMENTS):
+        mapper.add_svg_fromstring(svgs[i%SOURCES], (i%100)*300,
+                (i//100)*200, rotate=(i%2 == 1))
+    return mapper
+
+
+def main():
+    print("{:>10}{:>8}{:>12}{:>14}{:>14}{:>10}".format("elements", "lazy",
+        "output(MB)", "serialize(ms)", "splice(ms)", "speedup"))
+    for elements in ELEMENTS:
+        for lazy in (False, True):
+            mapper = build(elements, lazy)
+            size = len(mapper.to_svg(pretty_print=False, splice=True))
+            serialized = best_of(lambda: mapper.to_svg(pretty_print=False), 3)
+            spliced = best_of(lambda: mapper.to_svg(pretty_print=False,
+                splice=True), 3)
+            print("{:>10}{:>8}{:>12.1f}{:>14.1f}{:>14.1f}{:>9.1f}x".format(
+                elements, str(lazy), size/float(1<<20), serialized*1000,
+                spliced*1000, serialized/spliced))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Peak memory and time of to_svg, building the whole output tree in
+memory (as it was done before) versus streaming each part group.
+Each measurement runs in a new process so peak RSS isn't shared.
+
+    python -m benchmarks.bench_streaming
+"""
+import multiprocessing
+import resource
+import time
+import os
+
+from svgmapper.mapper import SVGMapper
+from svgmapper.transform import SVGFigure
+
+from .common import scaled_svg
+
+
+PLACEMENTS = [100, 1000, 5000]
+SOURCE_SIZE = 16*1024
+
+
+def build_mapper(placements):
+    svg = scaled_svg('map1.svg', SOURCE_SIZE)
+    mapper = SVGMapper(10**6, 10**6)
+    for i in range(placements):
+        mapper.add_svg_fromstring(svg, (i%100)*500, (i//100)*500)
+    return mapper
+
+
+def tree_to_file(mapper, path):
+    surf = SVGFigure(str(mapper.width), str(mapper.height))
+    mapper._place_parts(surf)
+    surf.save(path)
+
+
+def stream_to_file(mapper, path):
+    mapper.to_svg(path, pretty_print=False)
+
+
+def measure(mode, placements, path, queue):
+    mapper = build_mapper(placements)
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    mode(mapper, path)
+    elapsed = time.perf_counter()-start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((elapsed, (after-before)/1024.0))
+
+
+def run(mode, placements, path):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure,
+            args=(mode, placements, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    path = 'bench_streaming_output.svg'
+    print("{:>8}{:>12}{:>16}{:>12}{:>16}".format("parts", "tree(ms)",
+        "tree peak(MB)", "stream(ms)", "stream peak(MB)"))
+    try:
+        for placements in PLACEMENTS:
+            tree_time, tree_peak = run(tree_to_file, placements, path)
+            stream_time, stream_peak = run(stream_to_file, placements, path)
+            print("{:>8}{:>12.1f}{:>16.1f}{:>12.1f}{:>16.1f}".format(
+                placements, tree_time*1000, tree_peak,
+                stream_time*1000, stream_peak))
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Memory used by many placements of a few distinct svgs, and time to
+compute all their bounding boxes. Each measurement runs in a new process
+so peak RSS isn't shared.
+
+    python -m benchmarks.bench_table
+"""
+import multiprocessing
+import resource
+import time
+
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+
+from .common import fixture_path
+
+
+PLACEMENTS = [10000, 100000]
+FIXTURES = ['map1.svg', 'map2.svg', 'map4_rect.svg']
+
+
+def build(count):
+    mapper = SVGMapper(10**7, 10**7, cache=PartCache())
+    for i in range(count):
+        mapper.add_svg_fromfile(fixture_path(FIXTURES[i%len(FIXTURES)]),
+                (i%1000)*1000, (i//1000)*1000, rotate=(i%2 == 0))
+    return mapper
+
+
+def measure(count, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    mapper = build(count)
+    elapsed = time.perf_counter()-start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    mapper.parts.bounding_boxes(mapper.margin_width)
+    boxes = time.perf_counter()-start
+    queue.put(((after-before)/1024.0, elapsed, boxes))
+
+
+def main():
+    print("{:>12}{:>14}{:>14}{:>14}".format("placements", "peak(MB)",
+        "build(ms)", "boxes(ms)"))
+    for count in PLACEMENTS:
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure, args=(count, queue))
+        process.start()
+        memory, elapsed, boxes = queue.get()
+        process.join()
+        print("{:>12}{:>14.1f}{:>14.1f}{:>14.2f}".format(count, memory,
+            elapsed*1000, boxes*1000))
+
+
+if __name__ == '__main__':
+    main()
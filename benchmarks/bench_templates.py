@@ -0,0 +1,70 @@
+"""
+Cost of each template variant, remembered (hit) and rendered (miss),
+against parsing and sizing the same rendered svg, and adding many
+variants to a mapper.
+
+    python -m benchmarks.bench_templates
+"""
+from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.template import Template
+
+from .common import fixture_path, best_of
+
+
+VARIANTS = 1000
+PLACEMENTS = 10000
+
+
+def params(i):
+    return {'holes': 2+i%3, 'width': 100+i%51, 'height': 80+(i//51)%11}
+
+
+def main():
+    template = Template.fromfile(fixture_path('template1.svg'))
+    variants = [params(i) for i in range(VARIANTS)]
+    rendered = [template.render(p) for p in variants]
+
+    def misses():
+        template.clear()
+        for p in variants:
+            template.variant(p)
+
+    def hits():
+        for p in variants:
+            template.variant(p)
+
+    def parsed():
+        for svg in rendered:
+            SVGPart.fromstring(svg)
+
+    hit = best_of(hits, 3)/VARIANTS
+    miss = best_of(misses, 3)/VARIANTS
+    parse = best_of(parsed, 3)/VARIANTS
+    print("{:>14}{:>14}{:>14}".format("hit(us)", "miss(us)", "parse(us)"))
+    print("{:>14.1f}{:>14.1f}{:>14.1f}".format(hit*1e6, miss*1e6,
+        parse*1e6))
+
+    def build(add):
+        mapper = SVGMapper(10**6, 10**6)
+        for i in range(PLACEMENTS):
+            add(mapper, i, (i%100)*300, (i//100)*200)
+        return mapper
+
+    def add_template(mapper, i, x, y):
+        mapper.add_template(template, x, y, variants[i%VARIANTS])
+
+    def add_svg(mapper, i, x, y):
+        mapper.add_svg_fromstring(rendered[i%VARIANTS], x, y)
+
+    template.clear()
+    templates = best_of(lambda: build(add_template), 1)
+    svgs = best_of(lambda: build(add_svg), 1)
+    print("\n{} placements of {} variants".format(PLACEMENTS, VARIANTS))
+    print("{:>14}{:>16}{:>10}".format("template(ms)", "fromstring(ms)",
+        "speedup"))
+    print("{:>14.1f}{:>16.1f}{:>9.1f}x".format(templates*1000, svgs*1000,
+        svgs/templates))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Time to write a large surface as a single document versus a grid of
+tiles, and size of the largest tile.
+
+    python -m benchmarks.bench_tiles
+"""
+import os
+import shutil
+import tempfile
+import time
+
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+
+from .common import fixture_path
+
+
+PARTS = 20000
+COLUMNS = 200
+TILE_SIZES = [2000, 5000, 10000]
+
+
+def build():
+    # map4_rect.svg is 400x100, placed in a 200 columns grid
+    mapper = SVGMapper(COLUMNS*450, (PARTS//COLUMNS)*150, cache=PartCache())
+    for i in range(PARTS):
+        mapper.add_svg_fromfile(fixture_path('map4_rect.svg'),
+                (i%COLUMNS)*450, (i//COLUMNS)*150)
+    return mapper
+
+
+def main():
+    mapper = build()
+    tmpdir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmpdir, 'surface.svg')
+        start = time.perf_counter()
+        mapper.to_svg(path, pretty_print=False)
+        elapsed = time.perf_counter()-start
+        print("surface {}x{}, {} parts".format(mapper.width, mapper.height,
+            PARTS))
+        print("{:>10}{:>8}{:>12}{:>14}{:>14}".format("tile", "tiles",
+            "parts", "time(ms)", "largest(KB)"))
+        print("{:>10}{:>8}{:>12}{:>14.1f}{:>14.1f}".format("none", 1, PARTS,
+            elapsed*1000, os.path.getsize(path)/1024.0))
+
+        for size in TILE_SIZES:
+            directory = os.path.join(tmpdir, str(size))
+            os.mkdir(directory)
+            start = time.perf_counter()
+            tiles = mapper.to_tiles(size, size, directory)
+            elapsed = time.perf_counter()-start
+            largest = max(os.path.getsize(t.output) for t in tiles)
+            print("{:>10}{:>8}{:>12}{:>14.1f}{:>14.1f}".format(size,
+                len(tiles), sum(t.parts for t in tiles), elapsed*1000,
+                largest/1024.0))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
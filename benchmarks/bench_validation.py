@@ -0,0 +1,47 @@
+"""
+Bounds validation time for a batch of placements, one _fits_inside call
+per placement versus a single validate_placements pass.
+
+    python -m benchmarks.bench_validation
+"""
+import random
+
+from svgmapper.mapper import SVGMapper
+
+from .common import best_of
+
+
+PLACEMENTS = [10000, 100000]
+
+
+def placements(count):
+    rand = random.Random(count)
+    return ([rand.uniform(0, 10000) for _ in range(count)],
+            [rand.uniform(0, 10000) for _ in range(count)],
+            [rand.uniform(1, 1000) for _ in range(count)],
+            [rand.uniform(1, 1000) for _ in range(count)],
+            [rand.random() < 0.5 for _ in range(count)])
+
+
+def one_by_one(mapper, x, y, width, height, rotate):
+    valid = []
+    for i in range(len(x)):
+        valid.append(mapper._fits_inside(x[i], y[i], width[i], height[i],
+            rotate[i]))
+    return valid
+
+
+def main():
+    mapper = SVGMapper(10000, 10000)
+    print("{:>12}{:>16}{:>16}".format("placements", "per item(ms)",
+        "bulk(ms)"))
+    for count in PLACEMENTS:
+        columns = placements(count)
+        single = best_of(lambda: one_by_one(mapper, *columns), 3)
+        bulk = best_of(lambda: mapper.validate_placements(*columns), 3)
+        print("{:>12}{:>16.1f}{:>16.1f}".format(count, single*1000,
+            bulk*1000))
+
+
+if __name__ == '__main__':
+    main()
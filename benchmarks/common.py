@@ -0,0 +1,123 @@
+"""
+Helpers shared by the benchmark scripts
+"""
+import os
+import time
+from lxml import etree
+
+
+DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'tests', 'data')
+
+
+def fixture_path(filename=""):
+    return os.path.join(DATA_PATH, filename)
+
+
+def load_fixture(filename):
+    with open(fixture_path(filename), 'br') as f:
+        return f.read()
+
+
+def scaled_svg(filename, size):
+    """
+    Scale up a test fixture by replicating its root children until the
+    svg is at least size bytes long, the root element (and so its
+    dimensions) is left untouched.
+
+    Arguments:
+        filename (str): fixture filename inside tests/data
+        size (int): minimum size of the resulting svg in bytes
+
+    Returns:
+        bytes: scaled svg
+    """
+    root = etree.fromstring(load_fixture(filename))
+    root.tail = None
+    if len(root) == 0:
+        etree.SubElement(root, etree.QName(root, 'g'))
+
+    # Split the serialized root so children keep the root namespaces
+    # instead of redeclaring them
+    text = etree.tostring(root)
+    start, rest = text.split(b'>', 1)
+    chunk = rest[:rest.rindex(b'</')]
+
+    repeat = max(1, size//len(chunk)+1)
+    return start+b'>'+chunk*repeat+b'</svg>'
+
+
+def best_of(func, repeat=5, number=1):
+    """
+    Time func calls returning the best time per call in seconds
+
+    Arguments:
+        func (callable): function to benchmark, called without arguments
+        repeat (int): number of timing rounds
+        number (int): calls per round
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = (time.perf_counter()-start)/number
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def synthetic_svg(elements=10, depth=1, gradients=0, width=100, height=100,
+        units='px'):
+    """
+    Generate a svg with the given number of shapes, nested inside depth
+    levels of transformed groups, and filled with gradients defined in
+    the svg defs.
+
+    Arguments:
+        elements (int): number of shapes (paths, rects and circles) in
+            each innermost group.
+        depth (int): group nesting depth
+        gradients (int): number of linear gradients, referenced by the
+            shapes in turn.
+        width (int): svg width
+        height (int): svg height
+        units (str): width and height units
+
+    Returns:
+        bytes: generated svg
+    """
+    shapes = []
+    for i in range(elements):
+        fill = ('url(#g{})'.format(i%gradients) if gradients else
+                '#{:06x}'.format(i*2654435%0xffffff))
+        x, y = (i*7)%width, (i*13)%height
+        if i%3 == 0:
+            shape = ('<path d="M{} {} l{:.3f} {:.3f} h-5.25 v5.5 '
+                     'c1.5,2.25 3.125,-1.5 4.0625,0.875z" fill="{}"/>'.format(
+                         x, y, (i%17)/3.0, (i%11)/7.0, fill))
+        elif i%3 == 1:
+            shape = ('<rect x="{}" y="{}" width="{}" height="{}" '
+                     'style="fill:{};stroke:#000;stroke-width:0.5"/>'.format(
+                         x, y, 1+i%9, 1+i%5, fill))
+        else:
+            shape = '<circle cx="{}" cy="{}" r="{}" fill="{}"/>'.format(
+                    x, y, 1+i%4, fill)
+        shapes.append(shape)
+
+    content = "".join(shapes)
+    for level in range(depth):
+        content = '<g transform="translate({0} {0}) rotate({1})">{2}</g>'.format(
+                level, level*5, content)
+
+    defs = ""
+    if gradients:
+        defs = "<defs>{}</defs>".format("".join(
+            '<linearGradient id="g{0}"><stop offset="0" stop-color="#{1:06x}"/>'
+            '<stop offset="1" stop-color="#fff"/></linearGradient>'.format(
+                i, i*7919%0xffffff) for i in range(gradients)))
+
+    return ('<svg xmlns="http://www.w3.org/2000/svg" '
+            'width="{0}{2}" height="{1}{2}" viewBox="0 0 {0} {1}">'
+            '{3}{4}</svg>'.format(width, height, units, defs,
+                content)).encode()
@@ -0,0 +1,317 @@
+"""
+Benchmark suite covering svg sizing, part construction, part additions
+and output, on synthetic svgs of increasing size and complexity. Each
+case runs in a new process, and records its wall time, python memory
+allocations (tracemalloc, lxml trees are allocated by libxml2 and only
+show up in RSS) and peak RSS growth. Results are saved as JSON, and
+can be compared with the results of a previous run:
+
+    python -m benchmarks.suite --output before.json
+    ... change things ...
+    python -m benchmarks.suite --output after.json --compare before.json
+
+    # Only cases whose name contains any of the given strings
+    python -m benchmarks.suite -k add_svg -k to_svg
+"""
+from collections import namedtuple
+import argparse
+import datetime
+import gc
+import json
+import multiprocessing
+import platform
+import queue as queue_module
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.transform import SVGFigure
+from svgmapper.utils import svg_dimensions
+
+from .common import synthetic_svg
+
+
+FORMAT_VERSION = 1
+
+# Regressions smaller than this fraction are considered noise
+DEFAULT_THRESHOLD = 0.1
+
+# Svg complexity levels: (elements, depth, gradients)
+COMPLEXITY = {
+    'small': (10, 1, 0),
+    'medium': (1000, 3, 10),
+    'large': (100000, 5, 100),
+}
+
+PART_COUNTS = [10, 1000, 100000]
+OUTPUT_PART_COUNTS = [10, 1000, 10000]
+
+
+# setup(*args) builds the state run(state) is timed with, both must be
+# module level functions so cases can be sent to processes started with
+# any multiprocessing start method.
+Case = namedtuple('Case', ['name', 'params', 'setup', 'args', 'run',
+    'repeat'])
+
+# Seconds a case can run before it's considered hung
+CASE_TIMEOUT = 3600
+
+
+def part_svg():
+    return synthetic_svg(20, 2, 2, width=100, height=50)
+
+
+def build_mapper(count):
+    mapper = SVGMapper(1000*120, (count//1000+1)*70)
+    svg = part_svg()
+    for i in range(count):
+        mapper.add_svg_fromstring(svg, (i%1000)*120, (i//1000)*70)
+    return mapper
+
+
+def add_parts_state(count):
+    return part_svg(), count
+
+
+def add_parts(state):
+    svg, count = state
+    mapper = SVGMapper(1000*120, (count//1000+1)*70)
+    for i in range(count):
+        mapper.add_svg_fromstring(svg, (i%1000)*120, (i//1000)*70)
+
+
+def place_parts(mapper):
+    surf = SVGFigure(str(mapper.width), str(mapper.height))
+    mapper._place_parts(surf)
+
+
+def write_svg(mapper):
+    mapper.to_svg(pretty_print=False)
+
+
+def cases():
+    """
+    Returns:
+        list: Case for each benchmark in the suite
+    """
+    result = []
+    for level, (elements, depth, gradients) in COMPLEXITY.items():
+        svg = synthetic_svg(elements, depth, gradients)
+        params = {'complexity': level, 'elements': elements,
+                  'depth': depth, 'bytes': len(svg)}
+        args = (elements, depth, gradients)
+        repeat = 3 if level == 'large' else 10
+        result.append(Case('svg_dimensions[{}]'.format(level), params,
+            synthetic_svg, args, svg_dimensions, repeat))
+        result.append(Case('svgpart[{}]'.format(level), params,
+            synthetic_svg, args, SVGPart.fromstring, repeat))
+
+    for count in PART_COUNTS:
+        result.append(Case('add_svg_fromstring[{}]'.format(count),
+            {'parts': count}, add_parts_state, (count,), add_parts,
+            1 if count >= 100000 else 5))
+
+    for count in OUTPUT_PART_COUNTS:
+        repeat = 3 if count >= 10000 else 5
+        result.append(Case('place_parts[{}]'.format(count), {'parts': count},
+            build_mapper, (count,), place_parts, repeat))
+        result.append(Case('to_svg[{}]'.format(count), {'parts': count},
+            build_mapper, (count,), write_svg, repeat))
+
+    return result
+
+
+def measure(case, queue):
+    """Run case in the current process, and put its results in queue"""
+    state = case.setup(*case.args)
+    gc.collect()
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    times = []
+    for _ in range(case.repeat):
+        start = time.perf_counter()
+        case.run(state)
+        times.append(time.perf_counter()-start)
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Traced separately, tracemalloc slows down allocations
+    gc.collect()
+    tracemalloc.start()
+    case.run(state)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    queue.put({
+        'name': case.name,
+        'params': case.params,
+        'repeat': case.repeat,
+        'time': min(times),
+        'time_median': statistics.median(times),
+        'allocated_peak': peak,
+        'allocated_retained': retained,
+        'rss_peak': (rss_after-rss_before)*1024,
+    })
+
+
+def run_case(case, timeout=CASE_TIMEOUT):
+    """Run case in a new process so peak RSS isn't shared between cases
+
+    Returns:
+        dict: case results
+
+    Raises:
+        RuntimeError: when the process dies (exception, killed for
+            memory...) or takes longer than timeout seconds.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=measure, args=(case, queue))
+    process.start()
+
+    deadline = time.monotonic()+timeout
+    result = None
+    while result is None:
+        alive = process.is_alive()
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            # Results are put before exiting, checked once more after
+            if not alive:
+                process.join()
+                raise RuntimeError("{} exited with code {}".format(
+                    case.name, process.exitcode))
+            if time.monotonic() > deadline:
+                process.terminate()
+                process.join()
+                raise RuntimeError("{} timed out after {}s".format(
+                    case.name, timeout))
+
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError("{} exited with code {}".format(case.name,
+            process.exitcode))
+    return result
+
+
+def revision():
+    """Current git revision of the tree, or None"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short',
+            'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names=None):
+    """
+    Arguments:
+        names (list): run only the cases whose names contain any of
+            these strings, all of them when None.
+
+    Returns:
+        dict: suite results, ready to be saved as JSON
+    """
+    results, failures = [], []
+    for case in cases():
+        if names and not any(name in case.name for name in names):
+            continue
+        try:
+            result = run_case(case)
+        except RuntimeError as error:
+            print("FAILED", error)
+            failures.append(case.name)
+            continue
+        print_result(result)
+        results.append(result)
+
+    return {
+        'format': FORMAT_VERSION,
+        'revision': revision(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'failures': failures,
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare suite results with the results of a previous run, cases
+    missing from either are ignored.
+
+    Arguments:
+        results (dict): current suite results
+        baseline (dict): previous suite results
+        threshold (float): fraction over the baseline considered a
+            regression.
+
+    Returns:
+        list: (name, metric, baseline, current) for each regression
+    """
+    previous = {r['name']: r for r in baseline['results']}
+    regressions = []
+
+    print("\n{:<28}{:>12}{:>12}{:>12}".format("vs "+str(baseline['revision']),
+        "time", "allocated", "rss"))
+    for result in results['results']:
+        before = previous.get(result['name'])
+        if before is None:
+            continue
+
+        ratios = []
+        for metric in ('time', 'allocated_peak', 'rss_peak'):
+            ratio = result[metric]/float(before[metric]) if before[metric] else 1.0
+            ratios.append(ratio)
+            # RSS growth differences under 1MB are noise
+            if ratio > 1+threshold and (metric != 'rss_peak' or
+                    result[metric]-before[metric] > 1<<20):
+                regressions.append((result['name'], metric, before[metric],
+                    result[metric]))
+
+        print("{:<28}{:>11.2f}x{:>11.2f}x{:>11.2f}x".format(result['name'],
+            *ratios))
+
+    for name, metric, before, current in regressions:
+        print("REGRESSION {} {}: {} -> {}".format(name, metric, before,
+            current))
+    return regressions
+
+
+def print_result(result):
+    print("{:<28}{:>14.2f}{:>14.1f}{:>14.1f}".format(result['name'],
+        result['time']*1000, result['allocated_peak']/1024.0,
+        result['rss_peak']/1024.0))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="svgmapper benchmark suite")
+    parser.add_argument('-k', dest='names', action='append',
+        help="only run cases whose name contains this string")
+    parser.add_argument('--output', help="save results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of a previous run")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help="fraction over the previous run reported as regression")
+    args = parser.parse_args(argv)
+
+    print("{:<28}{:>14}{:>14}{:>14}".format("case", "time(ms)",
+        "allocated(KB)", "rss(KB)"))
+    results = run_suite(args.names)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 1 if results['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -27,7 +27,12 @@ setup(
 
     # package
     packages = ['svgmapper'],
-    install_requires = ['lxml', 'pgi', 'unittest2', 'nose'],
+    install_requires = ['lxml', 'unittest2', 'nose'],
+    # librsvg bindings, only used for svgs whose size can't be resolved
+    # from their attributes
+    # numpy vectorizes bulk operations over the placed parts
+    extras_require = {'rsvg': ['pgi'], 'numpy': ['numpy'],
+        'zstd': ['zstandard']},
     zip_safe = False,
 
     # Tests
@@ -0,0 +1,164 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+from .cache import PartCache
+from .mapper import SVGMapper
+from .transform import DEFAULT_SVG_DPI
+
+# Max number of sheets queued or rendering per worker, extra definitions
+# are not read from the input until a sheet is done.
+PENDING_PER_WORKER = 2
+
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1)+4)
+
+# Mapper settings a sheet definition can change
+SHEET_SETTINGS = ('margin_width', 'border_width', 'border_color')
+
+
+# Outcome of each rendered sheet, error is None when it was written, and
+# times are in seconds.
+SheetResult = namedtuple('SheetResult',
+        ['index', 'name', 'output', 'error', 'load_time', 'render_time'])
+
+
+def build_sheet(definition, cache=None, catalog=None, render_cache=None):
+    """
+    Create a mapper from a sheet definition
+
+    Arguments:
+        definition (dict): sheet definition with width, height and parts,
+            and optionally dpi, margin_width, border_width and
+            border_color. parts is a list of (svg, x, y) or
+            (svg, x, y, options) as in SVGMapper.add_svgs.
+        cache (PartCache|None): cache used to reuse parsed svg sources
+        catalog (SourceCatalog|None): catalog of svg dimensions, see
+            SVGMapper
+        render_cache (RenderCache|None): cache of rendered outputs, see
+            SVGMapper
+
+    Returns:
+        SVGMapper
+    """
+    mapper = SVGMapper(definition['width'], definition['height'],
+            definition.get('dpi', DEFAULT_SVG_DPI), cache, catalog=catalog,
+            render_cache=render_cache)
+
+    for setting in SHEET_SETTINGS:
+        if setting in definition:
+            setattr(mapper, setting, definition[setting])
+
+    for spec in definition.get('parts', ()):
+        svg, x, y = spec[:3]
+        options = spec[3] if len(spec) > 3 else {}
+        if isinstance(svg, bytes):
+            mapper.add_svg_fromstring(svg, x, y, **options)
+        else:
+            mapper.add_svg_fromfile(svg, x, y, **options)
+
+    return mapper
+
+
+class _DirectorySink(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, name):
+        return open(os.path.join(self.directory, name+'.svg'), 'wb')
+
+
+def render_sheets(sheets, output, workers=None, cache=None, dedup=False,
+        pretty_print=False, catalog=None, render_cache=None):
+    """
+    Build and render many independent sheets concurrently on a pool of
+    threads (lxml releases the GIL while parsing and serializing).
+
+    Sheets are read from the input as workers become free, and each one
+    is released once written, so only a few of them are in memory at any
+    time no matter how many are rendered.
+
+    Arguments:
+        sheets (iterable): SVGMapper instances, or sheet definitions
+            (see build_sheet). Definitions can set the sheet name with
+            'name', by default it's sheet-<index>.
+        output (str|callable): directory where each sheet is saved as
+            <name>.svg, or callable returning the writable binary stream
+            for a sheet name, closed once the sheet is written.
+        workers (int|None): Number of threads, or None for the default
+        cache (PartCache|None): parsed source cache shared by all the
+            sheets built from definitions, or None to use a new one for
+            the batch.
+        dedup (bool): Output repeated parts as symbols, see to_svg
+        pretty_print (bool): Indent output, see to_svg
+        catalog (SourceCatalog|None): catalog of svg dimensions used by
+            the sheets built from definitions.
+        render_cache (RenderCache|None): cache of rendered outputs used
+            by the sheets built from definitions, sheets whose inputs
+            didn't change since they were rendered are copied from it.
+
+    Returns:
+        list: SheetResult for each sheet, in input order
+    """
+    if isinstance(output, str):
+        if not os.path.isdir(output):
+            raise ValueError("Output directory doesn't exist")
+        sink = _DirectorySink(output)
+    else:
+        sink = output
+
+    if cache is None:
+        cache = PartCache()
+
+    workers = workers or DEFAULT_WORKERS
+    assert(workers > 0)
+
+    def render(index, sheet):
+        if isinstance(sheet, SVGMapper):
+            name = "sheet-{}".format(index)
+        else:
+            name = sheet.get('name') or "sheet-{}".format(index)
+
+        load_time = render_time = 0.0
+        stream = None
+        try:
+            start = time.perf_counter()
+            if not isinstance(sheet, SVGMapper):
+                sheet = build_sheet(sheet, cache, catalog, render_cache)
+            load_time = time.perf_counter()-start
+
+            start = time.perf_counter()
+            stream = sink(name)
+            try:
+                sheet.to_svg(stream, dedup=dedup, pretty_print=pretty_print)
+            finally:
+                stream.close()
+            render_time = time.perf_counter()-start
+        except Exception as error:
+            # Don't leave partially written sheets behind
+            if stream is not None and isinstance(sink, _DirectorySink):
+                try:
+                    os.remove(stream.name)
+                except OSError:
+                    pass
+            return SheetResult(index, name, None, error, load_time,
+                    render_time)
+
+        destination = getattr(stream, 'name', None)
+        return SheetResult(index, name, destination, None, load_time,
+                render_time)
+
+    results = []
+    max_pending = workers*PENDING_PER_WORKER
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = []
+        for index, sheet in enumerate(sheets):
+            pending.append(executor.submit(render, index, sheet))
+            # Wait for the oldest sheet before reading more of them
+            if len(pending) >= max_pending:
+                results.append(pending.pop(0).result())
+        results.extend(f.result() for f in pending)
+
+    return results
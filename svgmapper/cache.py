@@ -0,0 +1,414 @@
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from lxml import etree
+from .transform import SVGFigure
+from .utils import (svg_dimensions, content_digest, file_digest,
+        parse_svg, parse_svg_file, user_cache_directory, DIMENSIONS_ERROR_MSG)
+
+DEFAULT_CACHE_ENTRIES = 512
+DEFAULT_CACHE_BYTES = 256*1024*1024
+
+# Max total size of the outputs kept by render caches
+DEFAULT_RENDER_CACHE_BYTES = 1024*1024*1024
+
+# Extension of the outputs stored in render caches
+RENDER_EXTENSION = ".render"
+
+# Outputs stored between scans of the render cache directory, the total
+# size is tracked in between and only refreshed from the directory to
+# account for outputs stored or removed by other processes.
+RENDER_CACHE_RESCAN = 256
+
+
+CacheInfo = namedtuple('CacheInfo',
+        ['hits', 'misses', 'evictions', 'entries', 'bytes'])
+
+
+class CachedSource(object):
+
+    def __init__(self, digest, root, size, source=None):
+        """
+        Parsed svg source stored in the cache
+
+        Arguments:
+            digest (str): source content hash
+            root (lxml.etree._Element): parsed svg root, used as template
+                and never modified.
+            size (int): source size in bytes
+            source (bytes|str|None): svg content or file it was parsed
+                from, so parts created from it can be spliced.
+        """
+        self.digest = digest
+        self.size = size
+        self.source = source
+        self._root = root
+        self._dimensions = {}
+
+    @property
+    def root(self):
+        """Parsed svg root, it must not be modified"""
+        return self._root
+
+    def figure(self):
+        """
+        Returns:
+            SVGFigure: new figure containing a copy of the source tree
+        """
+        figure = SVGFigure()
+        figure.root = deepcopy(self._root)
+        return figure
+
+    def dimensions(self, dpi):
+        """
+        Source dimensions in px, resolved once for each dpi
+
+        Arguments:
+            dpi (Number): dpi used for unit conversion to px
+
+        Returns:
+            (int, int): width, height
+        """
+        try:
+            return self._dimensions[dpi]
+        except KeyError:
+            dimensions = svg_dimensions(self._root, dpi)
+            self._dimensions[dpi] = dimensions
+            return dimensions
+
+
+class PartCache(object):
+
+    def __init__(self, max_entries=DEFAULT_CACHE_ENTRIES,
+            max_bytes=DEFAULT_CACHE_BYTES):
+        """
+        Least recently used cache of parsed svg sources keyed by their
+        content hash, files are also keyed by path and modification time
+        so they are not read again while unchanged.
+
+        Arguments:
+            max_entries (int): Max number of sources kept
+            max_bytes (int): Max total size of the sources kept, measured
+                as the size of the svg content.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._sources = OrderedDict()
+        self._files = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._sources)
+
+    def __contains__(self, digest):
+        return digest in self._sources
+
+    def _lookup(self, digest):
+        with self._lock:
+            source = self._sources.get(digest)
+            if source is not None:
+                self._sources.move_to_end(digest)
+                self.hits += 1
+            return source
+
+    def _insert(self, source):
+        with self._lock:
+            if source.digest in self._sources:
+                return self._sources[source.digest]
+
+            self.misses += 1
+            self._sources[source.digest] = source
+            self._bytes += source.size
+            self._evict()
+            return source
+
+    def _evict(self):
+        """Remove least recently used sources until limits are met, the
+        newest source is always kept."""
+        while len(self._sources) > 1 and (
+                len(self._sources) > self.max_entries or
+                self._bytes > self.max_bytes):
+            _, source = self._sources.popitem(last=False)
+            self._bytes -= source.size
+            self.evictions += 1
+
+    def get(self, svg, digest=None):
+        """
+        Return cached source for svg content, parsing it on a miss
+
+        Arguments:
+            svg (bytes): svg file content
+            digest (str|None): svg content hash if already known
+
+        Returns:
+            CachedSource
+        """
+        assert(isinstance(svg, bytes))
+        digest = digest or content_digest(svg)
+
+        source = self._lookup(digest)
+        if source is not None:
+            return source
+
+        try:
+            root = parse_svg(svg)
+        except etree.XMLSyntaxError:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
+
+        return self._insert(CachedSource(digest, root, len(svg), svg))
+
+    def get_file(self, path, digest=None):
+        """
+        Return cached source for a svg file, the file is only read when
+        its modification time or size changed, or the source was evicted
+
+        Arguments:
+            path (str): path to svg file
+            digest (str|None): file content hash if already known
+
+        Returns:
+            CachedSource
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            known = self._files.get(path)
+            if known is not None and known[0] == key:
+                source = self._lookup(known[1])
+                if source is not None:
+                    return source
+
+        # Hashed and parsed from the file, so its content is never loaded
+        # whole into memory.
+        digest = digest or file_digest(path)
+        source = self._lookup(digest)
+        if source is None:
+            try:
+                root = parse_svg_file(path)
+            except etree.XMLSyntaxError:
+                raise ValueError(DIMENSIONS_ERROR_MSG)
+            source = self._insert(CachedSource(digest, root, stat.st_size,
+                path))
+
+        with self._lock:
+            self._files[path] = (key, source.digest)
+            # Forget files whose sources were evicted
+            if len(self._files) > 2*self.max_entries:
+                self._files = {p: k for p, k in self._files.items()
+                        if k[1] in self._sources}
+        return source
+
+    def info(self):
+        """
+        Returns:
+            CacheInfo: hits, misses, evictions, entries and bytes used
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                    len(self._sources), self._bytes)
+
+    def clear(self):
+        """Remove all sources and reset statistics"""
+        with self._lock:
+            self._sources.clear()
+            self._files.clear()
+            self._bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+
+# Process-wide cache that can be shared between mappers
+default_cache = PartCache()
+
+
+class RenderCache(object):
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_RENDER_CACHE_BYTES):
+        """
+        Directory of rendered outputs keyed by the mapper fingerprint (see
+        SVGMapper.fingerprint), so sheets whose inputs didn't change are
+        copied instead of rendered again. Many processes can share the
+        same directory, outputs are stored atomically. Least recently
+        used outputs are removed when the total size is over max_bytes.
+
+        Arguments:
+            directory (str|None): cache directory, or None for renders/
+                inside the user cache directory.
+            max_bytes (int): Max total size of the outputs kept
+        """
+        self.directory = os.path.abspath(directory or
+                os.path.join(user_cache_directory(), 'renders'))
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Total size of the stored outputs, None until scanned, and
+        # outputs stored since the last scan.
+        self._bytes = None
+        self._stored = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key+RENDER_EXTENSION)
+
+    def _touch(self, path):
+        """Set the output last use time, file timestamps set by the
+        system can be too coarse to order outputs written in a row."""
+        now = time.time_ns()
+        try:
+            os.utime(path, ns=(now, now))
+        except OSError:
+            pass # Removed by another process
+
+    def _entries(self):
+        """(mtime, size, path) of the stored outputs"""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(RENDER_EXTENSION):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue # Removed by another process
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def __len__(self):
+        return len(self._entries())
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key, output=None):
+        """
+        Copy a stored output
+
+        Arguments:
+            key (str): output fingerprint
+            output (str|file|None): path or writable binary stream the
+                output is copied to, or None to return it.
+
+        Returns:
+            bytes|bool|None: output when no path or stream is given, True
+                when copied, or None if it isn't stored.
+        """
+        path = self._path(key)
+        try:
+            source = open(path, 'rb')
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with source:
+            # Used outputs are evicted last
+            self._touch(path)
+            with self._lock:
+                self.hits += 1
+
+            if output is None:
+                return source.read()
+            if isinstance(output, str):
+                with open(output, 'wb') as destination:
+                    shutil.copyfileobj(source, destination)
+            else:
+                shutil.copyfileobj(source, output)
+            return True
+
+    def put(self, key, output):
+        """
+        Store an output, replacing any output with the same key
+
+        Arguments:
+            key (str): output fingerprint
+            output (str|bytes): path of the output file, or its content
+        """
+        path = self._path(key)
+        handle, temp = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(handle, 'wb') as destination:
+                if isinstance(output, bytes):
+                    destination.write(output)
+                else:
+                    with open(output, 'rb') as source:
+                        shutil.copyfileobj(source, destination)
+                size = destination.tell()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+        self._touch(path)
+
+        with self._lock:
+            self._stored += 1
+            rescan = self._bytes is None or \
+                    self._stored >= RENDER_CACHE_RESCAN
+            if not rescan:
+                self._bytes += size-replaced
+                if self._bytes <= self.max_bytes:
+                    return
+        self._evict(path)
+
+    def _evict(self, keep):
+        """Scan the stored outputs, and remove the least recently used
+        ones until the size limit is met, keep (the newest output) is
+        never removed."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+
+        with self._lock:
+            self._bytes = total
+            self._stored = 0
+            self.evictions += evicted
+
+    def info(self):
+        """
+        Returns:
+            CacheInfo: hits, misses, evictions, entries and bytes stored
+        """
+        entries = self._entries()
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                    len(entries), sum(size for _, size, _ in entries))
+
+    def clear(self):
+        """Remove all stored outputs and reset statistics"""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+            self._bytes = 0
+            self._stored = 0
@@ -0,0 +1,451 @@
+"""
+Persistent catalog of svg sources metadata, shared between runs and
+processes. Pre-index a directory of sources with:
+
+    python -m svgmapper.catalog [--catalog PATH] [--dpi DPI] DIRECTORY...
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+from lxml import etree
+from .compression import EXTENSIONS
+from .transform import DEFAULT_SVG_DPI
+from .utils import (svg_dimensions, parse_svg_file, file_digest,
+        get_dimension_backend, set_dimension_backend, user_cache_directory,
+        DIMENSIONS_ERROR_MSG)
+
+# Catalog file inside the user cache directory
+CATALOG_FILENAME = "catalog.sqlite"
+
+# Seconds a connection waits for other processes writing the catalog
+DEFAULT_CATALOG_TIMEOUT = 30.0
+
+# Extensions of the source files indexed from directories
+SOURCE_EXTENSIONS = ('.svg',)+tuple(EXTENSIONS)
+
+# Files described by each process pool task while indexing
+INDEX_CHUNK_SIZE = 16
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    digest TEXT PRIMARY KEY,
+    size INTEGER,
+    viewbox TEXT,
+    ids TEXT
+);
+CREATE TABLE IF NOT EXISTS dimensions (
+    digest TEXT,
+    dpi REAL,
+    backend TEXT,
+    width NUMERIC,
+    height NUMERIC,
+    PRIMARY KEY (digest, dpi, backend)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER,
+    size INTEGER,
+    digest TEXT
+);
+"""
+
+
+# Metadata of a source, viewbox is None when the svg doesn't have one,
+# ids None when unknown (only the root element was read), and dimensions
+# a {dpi: (width, height)} dict for the selected dimension backend.
+CatalogEntry = namedtuple('CatalogEntry',
+        ['digest', 'size', 'viewbox', 'ids', 'dimensions'])
+
+CatalogInfo = namedtuple('CatalogInfo', ['hits', 'misses', 'entries'])
+
+# Outcome of SourceCatalog.index_directory, errors is a list of
+# (path, error message) for the files that couldn't be indexed.
+IndexReport = namedtuple('IndexReport',
+        ['indexed', 'skipped', 'errors', 'seconds'])
+
+
+def default_catalog_path():
+    """
+    Returns:
+        str: catalog path inside the user cache directory
+    """
+    return os.path.join(user_cache_directory(), CATALOG_FILENAME)
+
+
+def describe(root):
+    """
+    Metadata read from a parsed svg
+
+    Arguments:
+        root (lxml.etree._Element): svg root element
+
+    Returns:
+        (str|None, list): root viewBox and the ids in the svg
+    """
+    return root.get('viewBox'), [str(i) for i in root.xpath('//@id')]
+
+
+class SourceCatalog(object):
+
+    def __init__(self, path=None, timeout=DEFAULT_CATALOG_TIMEOUT):
+        """
+        Catalog of svg sources metadata (size, viewBox, ids and
+        dimensions for each dpi) keyed by content hash, stored in a
+        SQLite database that many processes can read and update at the
+        same time. Files are also keyed by path, modification time and
+        size so known files aren't hashed again.
+
+        Dimensions are stored for the dimension backend that resolved
+        them, changing the backend misses the catalog.
+
+        Arguments:
+            path (str|None): database path, or None for the default in
+                the user cache directory (see default_catalog_path).
+                ':memory:' creates a catalog for the calling thread.
+            timeout (Number): seconds to wait for other writers
+        """
+        self.path = path or default_catalog_path()
+        self.timeout = timeout
+
+        if self.path != ':memory:':
+            self.path = os.path.abspath(self.path)
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok=True)
+
+        # sqlite connections can't be shared between threads
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            if self.path != ':memory:':
+                # Readers don't block the writer, nor the writer readers
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """Close the calling thread connection"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _count(self, found):
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def __len__(self):
+        return self._connection().execute(
+                "SELECT COUNT(*) FROM sources").fetchone()[0]
+
+    def __contains__(self, digest):
+        return self._connection().execute(
+                "SELECT 1 FROM sources WHERE digest = ?",
+                (digest,)).fetchone() is not None
+
+    def lookup(self, digest):
+        """
+        Arguments:
+            digest (str): source content hash
+
+        Returns:
+            CatalogEntry|None: source metadata, or None if unknown
+        """
+        connection = self._connection()
+        row = connection.execute("SELECT size, viewbox, ids FROM sources "
+                "WHERE digest = ?", (digest,)).fetchone()
+        self._count(row is not None)
+        if row is None:
+            return None
+
+        dimensions = {dpi: (width, height) for dpi, width, height in
+                connection.execute("SELECT dpi, width, height FROM "
+                    "dimensions WHERE digest = ? AND backend = ?",
+                    (digest, get_dimension_backend().name))}
+        size, viewbox, ids = row
+        return CatalogEntry(digest, size, viewbox,
+                None if ids is None else json.loads(ids), dimensions)
+
+    def dimensions(self, digest, dpi=DEFAULT_SVG_DPI):
+        """
+        Arguments:
+            digest (str): source content hash
+            dpi (Number): dpi used for unit conversion to px
+
+        Returns:
+            (Number, Number)|None: source width and height in px, or None
+                when they aren't known for the dpi.
+        """
+        row = self._connection().execute("SELECT width, height FROM "
+                "dimensions WHERE digest = ? AND dpi = ? AND backend = ?",
+                (digest, dpi, get_dimension_backend().name)).fetchone()
+        self._count(row is not None)
+        return row
+
+    def add(self, digest, size, viewbox=None, ids=None, dimensions=None):
+        """
+        Store a source metadata, values already stored are kept when
+        not given.
+
+        Arguments:
+            digest (str): source content hash
+            size (int): source size in bytes
+            viewbox (str|None): root viewBox attribute
+            ids (list|None): ids in the svg, or None if unknown
+            dimensions (dict|None): {dpi: (width, height)} resolved with
+                the selected dimension backend.
+        """
+        self._store(self._connection(), [(None, digest, size, viewbox, ids,
+            dimensions)], get_dimension_backend().name)
+
+    def add_root(self, digest, root, size, dpi=DEFAULT_SVG_DPI,
+            dimensions=None, parsed=True):
+        """
+        Store the metadata of a parsed svg
+
+        Arguments:
+            digest (str): source content hash
+            root (lxml.etree._Element): svg root element
+            size (int): source size in bytes
+            dpi (Number): dpi of dimensions
+            dimensions ((Number, Number)|None): svg width and height, or
+                None to resolve them from root.
+            parsed (bool): False when only the root element was read, so
+                the ids in the svg are unknown.
+        """
+        if parsed:
+            viewbox, ids = describe(root)
+        else:
+            viewbox, ids = root.get('viewBox'), None
+        if dimensions is None:
+            dimensions = svg_dimensions(root, dpi)
+        self.add(digest, size, viewbox, ids, {dpi: tuple(dimensions)})
+
+    def _store(self, connection, entries, backend):
+        """Store (path stat|None, digest, size, viewbox, ids, dimensions)
+        entries in a single transaction"""
+        with connection:
+            for stat, digest, size, viewbox, ids, dimensions in entries:
+                connection.execute("INSERT INTO sources "
+                        "(digest, size, viewbox, ids) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(digest) DO UPDATE SET "
+                        "size = excluded.size, "
+                        "viewbox = coalesce(excluded.viewbox, viewbox), "
+                        "ids = coalesce(excluded.ids, ids)",
+                        (digest, size, viewbox,
+                            None if ids is None else json.dumps(ids)))
+                for dpi, (width, height) in (dimensions or {}).items():
+                    connection.execute("INSERT OR REPLACE INTO dimensions "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            (digest, dpi, backend, width, height))
+                if stat is not None:
+                    connection.execute("INSERT OR REPLACE INTO files "
+                            "VALUES (?, ?, ?, ?)", stat+(digest,))
+
+    def _known_file(self, path, stat):
+        row = self._connection().execute("SELECT mtime_ns, size, digest "
+                "FROM files WHERE path = ?", (path,)).fetchone()
+        if row is not None and (row[0], row[1]) == \
+                (stat.st_mtime_ns, stat.st_size):
+            return row[2]
+        return None
+
+    def file_digest(self, path):
+        """
+        Content hash of a svg file, the file is only hashed when its
+        modification time or size changed since it was cataloged.
+
+        Arguments:
+            path (str): path to svg file
+
+        Returns:
+            str: hex digest, see utils.file_digest
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        digest = self._known_file(path, stat)
+        if digest is None:
+            digest = file_digest(path)
+            with self._connection() as connection:
+                connection.execute("INSERT OR REPLACE INTO files "
+                        "VALUES (?, ?, ?, ?)",
+                        (path, stat.st_mtime_ns, stat.st_size, digest))
+        return digest
+
+    def index_directory(self, directory, dpis=(DEFAULT_SVG_DPI,),
+            workers=None, recursive=True, force=False):
+        """
+        Catalog every svg source file in a directory, files are parsed
+        and sized in parallel on a pool of processes. Files already
+        cataloged for all the dpis are skipped.
+
+        Arguments:
+            directory (str): directory with .svg, .svgz and .zst files
+            dpis (iterable): dpis the dimensions are resolved for
+            workers (int|None): Number of processes, or None for the
+                ProcessPoolExecutor default.
+            recursive (bool): Include subdirectories
+            force (bool): Parse files even if already cataloged
+
+        Returns:
+            IndexReport
+        """
+        start = time.perf_counter()
+        dpis = tuple(dpis)
+        backend = get_dimension_backend().name
+
+        pending, skipped = [], 0
+        for path in _source_files(directory, recursive):
+            if not force and self._is_indexed(path, dpis):
+                skipped += 1
+            else:
+                pending.append(path)
+
+        indexed, errors = 0, []
+        if pending:
+            connection = self._connection()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(_describe_file, pending,
+                        [dpis]*len(pending), [backend]*len(pending),
+                        chunksize=INDEX_CHUNK_SIZE)
+                for path, entry, error in results:
+                    if error is not None:
+                        errors.append((path, error))
+                    else:
+                        self._store(connection, [entry], backend)
+                        indexed += 1
+
+        return IndexReport(indexed, skipped, errors,
+                time.perf_counter()-start)
+
+    def _is_indexed(self, path, dpis):
+        digest = self._known_file(path, os.stat(path))
+        if digest is None:
+            return False
+        row = self._connection().execute("SELECT COUNT(*) FROM dimensions "
+                "WHERE digest = ? AND backend = ? AND dpi IN ({})".format(
+                    ", ".join("?"*len(dpis))),
+                (digest, get_dimension_backend().name)+dpis).fetchone()
+        return row[0] == len(set(dpis))
+
+    def info(self):
+        """
+        Returns:
+            CatalogInfo: lookup hits, misses, and sources cataloged
+        """
+        with self._lock:
+            return CatalogInfo(self.hits, self.misses, len(self))
+
+    def clear(self):
+        """Remove all the cataloged sources and reset statistics"""
+        with self._connection() as connection:
+            connection.execute("DELETE FROM sources")
+            connection.execute("DELETE FROM dimensions")
+            connection.execute("DELETE FROM files")
+        with self._lock:
+            self.hits = self.misses = 0
+
+
+def _source_files(directory, recursive=True):
+    """Absolute paths of the svg files in a directory, sorted"""
+    if not os.path.isdir(directory):
+        raise ValueError("Directory '{}' doesn't exist".format(directory))
+
+    directory = os.path.abspath(directory)
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(SOURCE_EXTENSIONS):
+                yield os.path.join(root, filename)
+        if not recursive:
+            break
+
+
+def _describe_file(path, dpis, backend):
+    """
+    Parse and size a source file, run on the index_directory processes
+
+    Returns:
+        (str, tuple|None, str|None): path, entry to store (see
+            SourceCatalog._store) and error message.
+    """
+    try:
+        if get_dimension_backend().name != backend:
+            set_dimension_backend(backend)
+        stat = os.stat(path)
+        digest = file_digest(path)
+        try:
+            root = parse_svg_file(path)
+        except etree.XMLSyntaxError:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
+        viewbox, ids = describe(root)
+        dimensions = {dpi: tuple(svg_dimensions(root, dpi)) for dpi in dpis}
+    except Exception as error:
+        return path, None, "{}: {}".format(type(error).__name__, error)
+
+    return path, ((path, stat.st_mtime_ns, stat.st_size), digest,
+            stat.st_size, viewbox, ids, dimensions), None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+            description="Catalog the svg sources in directories")
+    parser.add_argument('directories', nargs='+', metavar='DIRECTORY')
+    parser.add_argument('--catalog', help="catalog path (default {})".format(
+        default_catalog_path()))
+    parser.add_argument('--dpi', dest='dpis', type=float, action='append',
+            help="dpi the dimensions are resolved for, can be repeated "
+            "(default {})".format(DEFAULT_SVG_DPI))
+    parser.add_argument('--workers', type=int, help="number of processes")
+    parser.add_argument('--no-recursive', dest='recursive',
+            action='store_false', help="skip subdirectories")
+    parser.add_argument('--force', action='store_true',
+            help="index files already cataloged again")
+    args = parser.parse_args(argv)
+
+    catalog = SourceCatalog(args.catalog)
+    failed = False
+    for directory in args.directories:
+        try:
+            report = catalog.index_directory(directory,
+                    args.dpis or (DEFAULT_SVG_DPI,), args.workers,
+                    args.recursive, args.force)
+        except ValueError as error:
+            print(error, file=sys.stderr)
+            failed = True
+            continue
+
+        for path, error in report.errors:
+            print("{}: {}".format(path, error), file=sys.stderr)
+        failed = failed or bool(report.errors)
+        print("{}: {} indexed, {} skipped, {} errors in {:.2f}s".format(
+            directory, report.indexed, report.skipped, len(report.errors),
+            report.seconds))
+
+    print("{} sources in {}".format(len(catalog), catalog.path))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+import gzip
+import os
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+GZIP = 'gzip'
+ZSTD = 'zstd'
+
+# Compression level used when none is given
+DEFAULT_LEVELS = {GZIP: 6, ZSTD: 3}
+
+# Compression used for each output file extension
+EXTENSIONS = {'.svgz': GZIP, '.gz': GZIP, '.zst': ZSTD}
+
+# Leading bytes of compressed files
+MAGIC_NUMBERS = ((b'\x1f\x8b', GZIP), (b'\x28\xb5\x2f\xfd', ZSTD))
+
+# Size of the chunks passed to the compressor, small writes are buffered
+WRITE_BUFFER_SIZE = 64*1024
+
+
+def _check(compression):
+    """Raise ValueError for unknown or unavailable compressions"""
+    if compression not in DEFAULT_LEVELS:
+        raise ValueError("Unknown compression '{}'".format(compression))
+    if compression == ZSTD and zstandard is None:
+        raise ValueError("zstd compression requires the zstandard package")
+
+
+def path_compression(path):
+    """
+    Compression for an output path, from its extension
+
+    Arguments:
+        path (str): output file path
+
+    Returns:
+        str|None: compression, or None for uncompressed files
+    """
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def source_compression(path):
+    """
+    Compression of a source file, from its content
+
+    Arguments:
+        path (str): source file path
+
+    Returns:
+        str|None: compression, or None for uncompressed files
+    """
+    with open(path, 'rb') as source:
+        start = source.read(4)
+    for magic, compression in MAGIC_NUMBERS:
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def open_source(path):
+    """
+    Open a source file for reading, compressed files are decompressed as
+    they are read.
+
+    Arguments:
+        path (str): source file path
+
+    Returns:
+        file: readable binary stream
+    """
+    compression = source_compression(path)
+    if compression is None:
+        return open(path, 'rb')
+
+    _check(compression)
+    if compression == GZIP:
+        return gzip.open(path, 'rb')
+    return zstandard.open(path, 'rb')
+
+
+class CompressedWriter(object):
+
+    def __init__(self, stream, compression, level=None, close_stream=False):
+        """
+        Writable stream compressing the data written into another stream,
+        as it's written.
+
+        Arguments:
+            stream (file): writable binary stream receiving the compressed
+                data.
+            compression (str): 'gzip' or 'zstd' (requires zstandard)
+            level (int|None): compression level, None for the default.
+                Higher levels are smaller but slower.
+            close_stream (bool): Close stream when the writer is closed
+        """
+        _check(compression)
+        if level is None:
+            level = DEFAULT_LEVELS[compression]
+
+        self.compression = compression
+        self.level = level
+        self._stream = stream
+        self._close_stream = close_stream
+        self._buffer = []
+        self._buffered = 0
+
+        if compression == GZIP:
+            # No filename nor time in the header, so output is reproducible
+            self._compressor = gzip.GzipFile(filename='', mode='wb',
+                    compresslevel=level, fileobj=stream, mtime=0)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=level)\
+                    .stream_writer(stream, closefd=False)
+
+    @property
+    def name(self):
+        return getattr(self._stream, 'name', None)
+
+    def write(self, data):
+        self._buffer.append(data)
+        self._buffered += len(data)
+        if self._buffered >= WRITE_BUFFER_SIZE:
+            self.flush()
+
+    def flush(self):
+        """Pass buffered data to the compressor"""
+        if self._buffer:
+            self._compressor.write(b"".join(self._buffer))
+            self._buffer, self._buffered = [], 0
+
+    def close(self):
+        """Finish the compressed data, and close stream when owned"""
+        try:
+            self.flush()
+            self._compressor.close()
+        finally:
+            if self._close_stream:
+                self._stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
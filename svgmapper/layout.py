@@ -0,0 +1,317 @@
+from collections import namedtuple
+
+
+# Position assigned to each packed rectangle, index is the rectangle
+# position in the input and sheet the index of the sheet it was placed in.
+Placement = namedtuple('Placement', ['index', 'sheet', 'x', 'y', 'rotate'])
+
+# Max number of sheets rectangles are tried into, when a new sheet is
+# opened the oldest (and fullest) one is closed.
+MAX_OPEN_SHEETS = 4
+
+
+class SkylinePacker(object):
+
+    def __init__(self, width, height, allow_rotation=True):
+        """
+        Skyline bottom-left rectangle packer for a single sheet.
+
+        The free space is tracked as a skyline, a list of horizontal
+        segments (x, level, width) covering the sheet width, where level
+        is the y coordinate where the free space under each segment
+        starts. Rectangles are placed on top of the skyline at the
+        position that leaves them closest to the sheet origin.
+
+        Arguments:
+            width (Number): sheet width
+            height (Number): sheet height
+            allow_rotation (bool): Allow rectangles to be rotated 90
+                degrees when that gives a better fit.
+        """
+        self.width = width
+        self.height = height
+        self.allow_rotation = allow_rotation
+
+        # Skyline segments
+        self._xs = [0]
+        self._levels = [0]
+        self._widths = [width]
+
+        self.used_area = 0
+        self.count = 0
+
+        # Smallest rectangles that didn't fit, any rectangle at least as
+        # big in both dimensions won't fit either.
+        self._failed = []
+
+    def _find(self, width, height):
+        """
+        Find best position for an unrotated rectangle
+
+        Returns:
+            (Number, Number, Number, int)|None: top, x, y and segment
+                index for the best position, or None if it doesn't fit.
+        """
+        xs, levels, widths = self._xs, self._levels, self._widths
+        sheet_width = self.width
+        max_level = self.height-height
+
+        best = None
+        # Lowest valid level found, positions must be strictly below it
+        # once a position has been found.
+        bound = max_level
+
+        for i in range(len(xs)):
+            x = xs[i]
+            if x+width > sheet_width:
+                break
+
+            # Highest level under the rectangle, stop as soon as it can't
+            # improve the best position found.
+            level = levels[i]
+            if level > bound or (best is not None and level == bound):
+                continue
+            # Rounding of float widths can leave some remaining width
+            # past the last segment.
+            remaining = width-widths[i]
+            j = i+1
+            while remaining > 0 and j < len(levels):
+                if levels[j] > level:
+                    level = levels[j]
+                    if level > bound:
+                        break
+                remaining -= widths[j]
+                j += 1
+
+            if level > bound or (best is not None and level == bound) or \
+                    level+height > self.height:
+                continue
+            bound = level
+            best = (level+height, x, level, i)
+
+        return best
+
+    def find(self, width, height):
+        """
+        Find best position for a rectangle without placing it
+
+        Arguments:
+            width (Number): rectangle width
+            height (Number): rectangle height
+
+        Returns:
+            (Number, Number, bool)|None: x, y and True if the rectangle
+                has to be rotated, or None if it doesn't fit.
+        """
+        key = self._failed_key(width, height)
+        for failed in self._failed:
+            if key[0] >= failed[0] and key[1] >= failed[1]:
+                return None
+
+        best = self._find(width, height)
+        rotate = False
+
+        if self.allow_rotation and width != height:
+            rotated = self._find(height, width)
+            if rotated is not None and (best is None or
+                    rotated[0] < best[0]):
+                best, rotate = rotated, True
+
+        if best is None:
+            self._add_failed(key)
+            return None
+
+        return best[1], best[2], rotate
+
+    def _failed_key(self, width, height):
+        if self.allow_rotation and height > width:
+            return height, width
+        return width, height
+
+    def _add_failed(self, key):
+        """Remember a rectangle didn't fit, failures are only forgotten
+        when the skyline changes."""
+        self._failed = [f for f in self._failed
+                if not (f[0] >= key[0] and f[1] >= key[1])]
+        self._failed.append(key)
+
+    def insert(self, width, height):
+        """
+        Place a rectangle on the sheet
+
+        Arguments:
+            width (Number): rectangle width
+            height (Number): rectangle height
+
+        Returns:
+            (Number, Number, bool)|None: x, y and True if the rectangle
+                was rotated, or None if it doesn't fit.
+        """
+        position = self.find(width, height)
+        if position is None:
+            return None
+
+        x, y, rotate = position
+        if rotate:
+            width, height = height, width
+
+        self._add_segment(x, y+height, width)
+        self._failed = []
+        self.used_area += width*height
+        self.count += 1
+        return position
+
+    def _add_segment(self, x, level, width):
+        """Raise the skyline between x and x+width to level"""
+        xs, levels, widths = self._xs, self._levels, self._widths
+        end = x+width
+
+        i = xs.index(x)
+        j = i
+        while j < len(xs) and xs[j]+widths[j] <= end:
+            j += 1
+
+        # Shrink partially covered segment
+        if j < len(xs) and xs[j] < end:
+            widths[j] -= end-xs[j]
+            xs[j] = end
+
+        xs[i:j] = [x]
+        levels[i:j] = [level]
+        widths[i:j] = [width]
+
+        # Merge with neighbour segments at the same level
+        if i+1 < len(xs) and levels[i+1] == level:
+            widths[i] += widths[i+1]
+            del xs[i+1], levels[i+1], widths[i+1]
+        if i > 0 and levels[i-1] == level:
+            widths[i-1] += widths[i]
+            del xs[i], levels[i], widths[i]
+
+    def min_level(self):
+        """Lowest skyline level, no rectangle shorter than the space
+        left under it fits"""
+        return min(self._levels)
+
+    def utilization(self):
+        """Fraction of the sheet area used"""
+        return float(self.used_area)/(self.width*self.height)
+
+
+def pack(sizes, width, height, allow_rotation=True,
+        max_open_sheets=MAX_OPEN_SHEETS):
+    """
+    Pack rectangles into as few sheets as possible
+
+    Rectangles are placed from the largest to the smallest, each one in
+    the first open sheet where it fits, opening a new sheet when none of
+    them has space left.
+
+    Arguments:
+        sizes (list): (width, height) of each rectangle
+        width (Number): sheet width
+        height (Number): sheet height
+        allow_rotation (bool): Allow rectangles to be rotated 90 degrees
+        max_open_sheets (int): Max number of sheets a rectangle is tried
+            into before opening a new one.
+
+    Returns:
+        (list, list): Placement for each rectangle in input order, and
+            packer used for each sheet.
+
+    Raises:
+        ValueError: when a rectangle doesn't fit in an empty sheet
+    """
+    order = sorted(range(len(sizes)), reverse=True,
+            key=lambda i: (max(sizes[i]), min(sizes[i])))
+
+    # Shortest side among the rectangles still to be placed, used to
+    # close sheets where none of them can fit anymore.
+    if allow_rotation:
+        shortest = [min(sizes[i]) for i in order]
+    else:
+        shortest = [sizes[i][1] for i in order]
+    for i in range(len(shortest)-2, -1, -1):
+        shortest[i] = min(shortest[i], shortest[i+1])
+
+    sheets = []
+    open_sheets = []
+    placements = [None]*len(sizes)
+
+    for position_in_order, index in enumerate(order):
+        w, h = sizes[index]
+        
+        position = None
+        for sheet_index in open_sheets:
+            position = sheets[sheet_index].insert(w, h)
+            if position is not None:
+                break
+
+        if position is None:
+            sheet_index = len(sheets)
+            sheet = SkylinePacker(width, height, allow_rotation)
+            position = sheet.insert(w, h)
+            if position is None:
+                raise ValueError("Placement out of bounds")
+            sheets.append(sheet)
+            open_sheets.append(sheet_index)
+            if len(open_sheets) > max_open_sheets:
+                del open_sheets[0]
+
+        # Close sheets without space for the remaining rectangles
+        remaining = shortest[position_in_order]
+        if sheets[sheet_index].min_level()+remaining > height and \
+                sheet_index in open_sheets:
+            open_sheets.remove(sheet_index)
+
+        x, y, rotate = position
+        placements[index] = Placement(index, sheet_index, x, y, rotate)
+
+    return placements, sheets
+
+
+def layout_svgs(mapper, svgs, allow_rotation=True):
+    """
+    Place svgs automatically, packing them into the mapper surface and
+    into as many extra sheets as needed. Each svg takes its size plus
+    the mapper margins, and can be rotated 90 degrees.
+
+    Arguments:
+        mapper (SVGMapper): empty mapper used as first sheet, extra sheets
+            are created with its size and settings.
+        svgs (list): svg to place, each one either file content (bytes),
+            path to file (str), or a tuple (svg, options) where options is
+            a dict with width, height and uid as in add_svg_fromstring.
+        allow_rotation (bool): Allow svgs to be rotated 90 degrees
+
+    Returns:
+        list: SVGMapper sheets, starting with mapper
+    """
+    if mapper.parts:
+        raise ValueError("Layout requires an empty mapper")
+
+    parts, uids, sizes = [], [], []
+    margins = 2*mapper.margin_width
+
+    for svg in svgs:
+        if isinstance(svg, tuple):
+            svg, options = svg
+        else:
+            options = {}
+
+        part = mapper._load_part(svg, options.get('width'),
+                options.get('height'))
+        parts.append(part)
+        uids.append(options.get('uid'))
+        sizes.append((part.scaled_width+margins, part.scaled_height+margins))
+
+    placements, sheets = pack(sizes, mapper.width, mapper.height,
+            allow_rotation)
+
+    mappers = [mapper]+[mapper.new_sheet() for _ in sheets[1:]]
+    for placement in placements:
+        mappers[placement.sheet]._add_part(parts[placement.index],
+                placement.x, placement.y, uids[placement.index],
+                rotate=placement.rotate)
+
+    return mappers
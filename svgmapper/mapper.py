@@ -1,12 +1,66 @@
+from array import array
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import partial
+from io import BytesIO
 from numbers import Number
+import hashlib
+import math
+import os
+from lxml import etree
 from .transform import (SVGFigure, SVGElement, GroupElement, 
-        RectElement, DEFAULT_SVG_DPI)
-from .utils import svg_dimensions
+        RectElement, SymbolElement, UseElement, DefsElement,
+        ClipPathElement, SVGStreamWriter, Matrix, IdIndex, prefix_ids,
+        rotation_angle, rotated_box, rotated_size, format_number, SVG,
+        NSMAP, DEFAULT_SVG_DPI)
+from .utils import (svg_dimensions, svg_file_dimensions, content_digest,
+        file_digest, DIMENSIONS_ERROR_MSG)
+from .spatial import GridIndex
+from .table import PartTable
+from .validation import validate_placements
+from .optimize import Optimizer
+from .compression import path_compression
+from .splice import (SPLICE_MARKER, read_source, source_body,
+        has_id_attributes, splice_fragment)
 
 DEFAULT_MARGIN_WIDTH = 10
 DEFAULT_BORDER_WIDTH = 0.1
 DEFAULT_BORDER_COLOR = "blue" #"rgb(255, 0, 0)"
 
+# Prefix for the ids of symbols generated for repeated parts
+SYMBOL_ID_PREFIX = "svgmapper-symbol-"
+
+# Prefix for the ids inside each placed source, followed by the source
+# position so ids from different sources can't collide.
+ID_NAMESPACE_PREFIX = "svgmapper-src"
+
+# Max number of transforms remembered for each part
+MAX_PART_TRANSFORMS = 8
+
+# Id of the clip path limiting each tile content to the tile
+TILE_CLIP_ID = "svgmapper-tile-clip"
+
+# Filename of each tile when written to a directory
+TILE_FILENAME = "tile-{row}-{column}.svg"
+
+# Changed when the output for the same inputs changes, so fingerprints
+# from previous versions don't match.
+FINGERPRINT_VERSION = 2
+
+
+# Placed part, index is its position in SVGMapper.parts, rotation is in
+# degrees, and width and height are its bounding box size once rotated,
+# without margins.
+Placement = namedtuple('Placement',
+        ['index', 'uid', 'part', 'x', 'y', 'rotation', 'width', 'height'])
+
+# Tile written by SVGMapper.to_tiles, x, y, width and height is the area
+# of the surface it covers, parts the number of parts drawn in it, and
+# output where it was written.
+Tile = namedtuple('Tile',
+        ['row', 'column', 'x', 'y', 'width', 'height', 'parts', 'output'])
+
 
 
 class SVGPart(object):
@@ -14,12 +68,14 @@ class SVGPart(object):
    
     def __init__(self, svg, width=None, height=None, 
             scaled_width=None, scaled_height=None,
-            rotate=False, dpi=DEFAULT_SVG_DPI):
+            rotate=False, dpi=DEFAULT_SVG_DPI, digest=None, loader=None,
+            source=None):
         """
         Uses viewbox to scale original image
 
         Arguments:
-            svg (bytes): svg file content
+            svg (bytes|SVGFigure|None): svg file content, already parsed
+                svg figure, or None for lazy parts.
             width (Number|None): svg image width, or None to extract
                 from svg.
             height (Number|None): svg image height, or None to extract
@@ -28,14 +84,39 @@ class SVGPart(object):
                 into, or None to use original width.
             scaled_height (Number|None): height svg will be scaled
                 into or None to use original height.
+            rotate (bool|Number): True to rotate svg 90 degrees, or
+                rotation angle in degrees clockwise.
             dpi (Number): dpi used to extract svg dimmensions
+            digest (str|None): svg content hash, used to identify parts
+                with the same content. Computed when svg is bytes.
+            loader (callable|None): function returning the parsed svg
+                figure of a lazy part, called when the svg is needed for
+                output, see lazy(). width and height are required.
+            source (bytes|str|None): svg content or file the part was
+                created from, used to copy it into the output as it is.
+                svg when it's bytes.
         """
         assert(isinstance(dpi, Number))
-        assert(isinstance(svg, bytes))
+        assert(isinstance(svg, (bytes, SVGFigure)) or
+                (svg is None and loader is not None))
+
+        # Parse only once, dimensions are extracted from the same tree
+        if svg is None:
+            assert(width and height)
+            figure = None
+        elif isinstance(svg, SVGFigure):
+            figure = svg
+        else:
+            source = svg
+            digest = digest or content_digest(svg)
+            try:
+                figure = SVGFigure.fromstring(svg)
+            except etree.XMLSyntaxError:
+                raise ValueError(DIMENSIONS_ERROR_MSG)
 
         # Extract svg dimmensions when not provided
         if not width or not height:
-            width, height = svg_dimensions(svg, dpi)
+            width, height = svg_dimensions(figure.root, dpi)
         
         self.width, self.height = width, height
 
@@ -44,11 +125,28 @@ class SVGPart(object):
         self.scaled_height = scaled_height or self.height
 
         self.rotate = rotate
+        self.digest = digest
+
+        # Part transform and rotated box for each rotation and margin
+        self._placement = {}
+
+        # Index of the ids in the svg, built on first use
+        self._id_index = None
 
-        figure = SVGFigure.fromstring(svg)
-        svg = SVGElement([figure], self.scaled_width, self.scaled_height)
-        svg.viewbox(0, 0, self.width, self.height)
-        self._svg = svg
+        # Parsed svg, and the scaled svg element containing it. Lazy
+        # parts parse it with the loader when needed.
+        self._loader = loader
+        self._figure = figure
+        self._svg = None
+        if figure is not None:
+            self._scaled_svg()
+
+        # Source, and its root element bytes read when spliced (or False
+        # when it can't be spliced) and whether they have ids.
+        self.source = source
+        self._body = None
+        self._body_ids = False
+        self._shell = None
 
     @classmethod
     def fromstring(cls, string, **kwargs):
@@ -72,64 +170,356 @@ class SVGPart(object):
             width (number|None): svg image new width, None to use original
             height (number|None): svg image new height, None to use original
         """
-        with open(filepath, 'br') as f:
-            string = f.read()
+        # The file is parsed and hashed in chunks, its content is never
+        # loaded whole into memory.
+        try:
+            figure = SVGFigure.fromfile(filepath)
+        except etree.XMLSyntaxError:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
 
-        return cls(string, **kwargs)
+        if not kwargs.get('digest'):
+            kwargs['digest'] = file_digest(filepath)
+        return cls(figure, source=filepath, **kwargs)
+
+    @classmethod
+    def lazy(cls, source, width=None, height=None, dpi=DEFAULT_SVG_DPI,
+            cache=None, digest=None, **kwargs):
+        """
+        Create a lazy SVGPart, only the svg dimensions (from its root
+        element) and content hash are read. The svg is parsed from the
+        source when it's needed for output, and released afterwards.
+        Files must not change until the part is output.
+
+        Arguments:
+            source (bytes|str): svg content, or path to svg file
+            width (number|None): svg image width, or None to extract
+                from svg.
+            height (number|None): svg image height, or None to extract
+                from svg.
+            dpi (Number): dpi used to extract svg dimmensions
+            cache (PartCache|None): cache used to parse the svg, or None
+                to parse it every time it's loaded.
+            digest (str|None): svg content hash if already known
+            scaled_width (number|None): svg image new width, None to use
+                original
+            scaled_height (number|None): svg image new height, None to use
+                original
+        """
+        if isinstance(source, bytes):
+            digest = digest or content_digest(source)
+            sized = BytesIO(source)
+        else:
+            digest = digest or file_digest(source)
+            sized = source
+
+        if not width or not height:
+            width, height = svg_file_dimensions(sized, dpi)
+        return cls(None, width, height, dpi=dpi, digest=digest,
+                loader=partial(_load_source, source, cache), source=source,
+                **kwargs)
+
+    @classmethod
+    def fromsource(cls, source, width=None, height=None,
+            dpi=DEFAULT_SVG_DPI, **kwargs):
+        """
+        Create SVGPart from a cached source, reusing its parsed tree and
+        dimensions.
+
+        Arguments:
+            source (cache.CachedSource): cached svg source
+            width (number|None): svg image width, or None to use the
+                source dimensions.
+            height (number|None): svg image height, or None to use the
+                source dimensions.
+            dpi (Number): dpi used to extract svg dimmensions
+            scaled_width (number|None): svg image new width, None to use
+                original
+            scaled_height (number|None): svg image new height, None to use
+                original
+        """
+        if not width or not height:
+            width, height = source.dimensions(dpi)
+        return cls(source.figure(), width=width, height=height, dpi=dpi,
+                digest=source.digest, source=source.source, **kwargs)
     
     def get_size(self):
         return self.width, self.height
 
+    @property
+    def figure(self):
+        """
+        Returns:
+            SVGFigure: part svg, parsed first for lazy parts not loaded
+        """
+        if self._figure is None:
+            self._figure = self._loader()
+        return self._figure
+
+    @property
+    def loaded(self):
+        """True when the part svg is parsed"""
+        return self._figure is not None
+
+    def release(self):
+        """
+        Drop the parsed svg of a lazy part, it's parsed again from its
+        source when needed. Other parts keep their svg. Source bytes read
+        for splicing are always dropped.
+        """
+        self._body = None
+        if self._loader is not None:
+            self._figure = None
+            self._svg = None
+            self._id_index = None
+
+    def _source_body(self):
+        """Source root element bytes, or None, see splice.source_body"""
+        if self._body is None:
+            self._body = False
+            if self.source is not None:
+                self._body = source_body(read_source(self.source)) or False
+            self._body_ids = bool(self._body) and \
+                    has_id_attributes(self._body)
+        return self._body or None
+
+    def has_ids(self, splice=False):
+        """
+        Arguments:
+            splice (bool): the part source is read for splicing, lazy
+                parts not loaded check it instead of parsing their svg.
+
+        Returns:
+            bool: True when the part svg has ids
+        """
+        if splice and self._figure is None and \
+                self._source_body() is not None:
+            return self._body_ids
+        return len(self.id_index) > 0
+
+    def splice_body(self):
+        """
+        Returns:
+            memoryview|None: part svg root element as written in its
+                source, to be copied into the output without parsing and
+                serializing it, or None when it can't be copied (unknown
+                source, ids that must be namespaced, encoding...).
+        """
+        body = self._source_body()
+        if body is None or self.has_ids(splice=True):
+            return None
+        return body
+
+    def splice_shell(self):
+        """
+        svg element scaling the part, with a marker in place of the part
+        svg, see splice.splice_fragment. Created on first use.
+        """
+        if self._shell is None:
+            shell = SVGElement([], self.scaled_width, self.scaled_height)
+            shell.viewbox(0, 0, self.width, self.height)
+            shell.root.text = SPLICE_MARKER
+            self._shell = shell
+        return self._shell
+
+    def _scaled_svg(self):
+        """svg element scaling the part svg, created on first use"""
+        if self._svg is None:
+            svg = SVGElement([self.figure], self.scaled_width,
+                    self.scaled_height)
+            svg.viewbox(0, 0, self.width, self.height)
+            self._svg = svg
+        return self._svg
+
+    def part_key(self):
+        """
+        Key identifying parts with the same content plus scale, that can
+        share the same source, or None when the content is unknown.
+        """
+        if self.digest is None:
+            return None
+        return (self.digest, self.width, self.height,
+                self.scaled_width, self.scaled_height)
+
+    def symbol_key(self):
+        """
+        Key identifying parts that can share the same symbol, content
+        plus viewBox, or None when the content is unknown. The scale is
+        applied by each use of the symbol.
+        """
+        if self.digest is None:
+            return None
+        return (self.digest, self.width, self.height)
+
+    @property
+    def id_index(self):
+        """
+        Returns:
+            IdIndex: index of the ids in the part svg and the references
+                to them, built once and reused for every placement.
+        """
+        if self._id_index is None:
+            self._id_index = IdIndex(self.figure.root)
+        return self._id_index
+
+    def generate_symbol(self, symbol_id):
+        """
+        Generate a symbol with a copy of the svg content, its ids are
+        prefixed with the symbol id so they don't collide with others.
+
+        Arguments:
+            symbol_id (str): symbol id
+        """
+        root = deepcopy(self.figure.root)
+        prefix_ids(root, symbol_id+"-")
+        return SymbolElement(symbol_id, [root], self.width, self.height)
+
+    def generate_use(self, symbol_id):
+        """
+        Generate an use element instancing the part symbol with its
+        scaled dimensions.
+
+        Arguments:
+            symbol_id (str): symbol id
+        """
+        return UseElement(symbol_id, self.scaled_width, self.scaled_height)
+
+    def rescaled(self, scaled_width=None, scaled_height=None):
+        """
+        Copy of the part scaled to a new size, parts are shared between
+        placements so they are never changed in place.
+
+        Arguments:
+            scaled_width (Number|None): new width, or None for the
+                original width
+            scaled_height (Number|None): new height, or None for the
+                original height
+
+        Returns:
+            SVGPart
+        """
+        if self._loader is not None:
+            return SVGPart(None, self.width, self.height, scaled_width,
+                    scaled_height, self.rotate, digest=self.digest,
+                    loader=self._loader, source=self.source)
+
+        figure = SVGFigure()
+        figure.root = deepcopy(self._figure.root)
+        return SVGPart(figure, self.width, self.height, scaled_width,
+                scaled_height, self.rotate, digest=self.digest,
+                source=self.source)
+
+    def placed_size(self, rotate=None):
+        """
+        Size of the scaled svg bounding box once rotated
+
+        Arguments:
+            rotate (bool|Number|None): rotation, or None for part rotation
+
+        Returns:
+            (Number, Number): width, height
+        """
+        return rotated_size(self.scaled_width, self.scaled_height,
+                self.rotate if rotate is None else rotate)
+
+    def _part_transform(self, margin_width, rotate=None):
+        """
+        Rotate part when enabled, and move it to leave space for margins
+        and so its bounding box starts at the group origin.
+
+        Returns:
+            (Matrix, tuple): part transform, and rotated bounding box
+        """
+        angle = rotation_angle(self.rotate if rotate is None else rotate)
+        key = (angle, margin_width)
+        try:
+            return self._placement[key]
+        except KeyError:
+            pass
+
+        box = rotated_box(self.scaled_width, self.scaled_height, angle)
+        matrix = Matrix.translate(margin_width-box[0],
+                margin_width-box[1])*Matrix.rotate(angle)
+
+        # Only a few rotations are expected for each part
+        if len(self._placement) >= MAX_PART_TRANSFORMS:
+            self._placement.clear()
+        self._placement[key] = (matrix, box)
+        return matrix, box
+
     def generate_group(self, margin_width=0, border_width=0, 
-            border_color=DEFAULT_BORDER_COLOR):
+            border_color=DEFAULT_BORDER_COLOR, content=None, x=0, y=0,
+            rotate=None):
         """
-        Generate svg group ready for placing into surface
+        Generate svg group ready for placing into surface, placement,
+        rotation and margins are composed into a single transform on as
+        few elements as possible.
 
         Argumens:
+            margin_width (Number): margin around the svg
+            border_width (Number): border width, or 0 for no border
+            border_color (str): border color
+            content (FigureElement|None): element placed instead of the
+                svg (i.e. an use of the part symbol), or None for the svg
+            x (Number): group x position
+            y (Number): group y position
+            rotate (bool|Number|None): rotation, or None for part rotation
         """
-        part_group = GroupElement([self._svg])
-        
-        # Rotate part when enabled
-        if self.rotate:
-            part_group.rotate(90.0, x=margin_width, y=margin_width)
-            rotation_compensation = self.scaled_height
-        else:
-            rotation_compensation = 0
+        content = content or self._scaled_svg()
+        part_matrix, (min_x, min_y, max_x, max_y) = \
+                self._part_transform(margin_width, rotate)
+        placement = Matrix.translate(x, y)
 
-        # Move svg to leave space for margins, and to compensate rotation
-        if margin_width>0:
-            part_group.moveto(margin_width, margin_width-rotation_compensation)
-    
-        # Add borders to the group when enabled  
-        elements = [part_group]
-        if border_width > 0:
-            rect_width = self.scaled_width+2*margin_width-border_width
-            rect_height= self.scaled_height+2*margin_width-border_width
-            border_compensation = float(border_width)/2
+        # Without border the part transform is merged into the group one
+        if border_width <= 0:
+            group = GroupElement([content])
+            group.set_matrix(placement*part_matrix)
+            return group
 
-            if self.rotate:
-                rect_width, rect_height = rect_height, rect_width
+        # Nested svg elements don't support transform, they are wrapped
+        if content.root.tag == SVG+"svg":
+            content = GroupElement([content])
+        content.set_matrix(part_matrix)
 
-            elements.append(RectElement(
-                border_compensation, border_compensation, 
-                rect_width, rect_height, 
-                border_width, border_color))
+        # Add borders to the group when enabled  
+        rect_width = max_x-min_x+2*margin_width-border_width
+        rect_height = max_y-min_y+2*margin_width-border_width
+        border_compensation = float(border_width)/2
+        border = RectElement(border_compensation, border_compensation,
+                rect_width, rect_height, border_width, border_color)
 
-        return GroupElement(elements)
+        group = GroupElement([content, border])
+        group.set_matrix(placement)
+        return group
 
 
 
 class SVGMapper(object):
 
-    def __init__(self, width, height, dpi=DEFAULT_SVG_DPI):
+    def __init__(self, width, height, dpi=DEFAULT_SVG_DPI, cache=None,
+            incremental=False, lazy=False, catalog=None, render_cache=None):
         """
         Arguments:
             - Width (Number): Surface width in px
             - Height (Number): Surface height in px
             - dpi (Number): dpi used to extract svg dimmensions if
                 needed
+            - cache (PartCache|None): Cache used to reuse parsed svg
+                sources (e.g. cache.default_cache), or None to parse
+                every svg added.
+            - incremental (bool): Keep each part serialized output
+                between to_svg calls, so only parts added or changed
+                since the last call are generated again.
+            - lazy (bool): Only read svgs dimensions and content hash
+                when they are added, they are parsed when the output is
+                generated and released afterwards, see SVGPart.lazy.
+            - catalog (SourceCatalog|None): Persistent catalog of svg
+                dimensions (see catalog.SourceCatalog), svgs found in it
+                aren't sized, and the svgs sized are added to it.
+            - render_cache (RenderCache|None): Outputs of previous
+                to_svg calls, keyed by fingerprint, reused instead of
+                rendering mappers with the same inputs again.
         """
-        self.parts = []
+        self._table = PartTable()
         self.width = width
         self.height = height
 
@@ -145,6 +535,62 @@ class SVGMapper(object):
         # 
         self.dpi = dpi
 
+        # Parsed svg sources cache
+        self.cache = cache
+
+        # Spatial index of the parts bounding boxes, built on first use
+        self._index = None
+        self._index_margin = None
+
+        # Serialized output of each part, and of the symbols defs, kept
+        # when incremental. Parts are keyed by their placement row, so
+        # changed parts miss the cache, and changes to the output
+        # settings discard them.
+        self.incremental = incremental
+        self._fragments = {}
+        self._defs_fragment = None
+        self._fragments_settings = None
+
+        # Id indexes of the sources being written, and (index, mapping)
+        # for those renamed on each placement, see _namespace_ids
+        self._namespaced = []
+        self._placement_ids = {}
+
+        # Keep only svgs sizes and sources until they are output
+        self.lazy = lazy
+
+        # Svg dimensions shared between runs and processes
+        self.catalog = catalog
+
+        # Outputs shared between runs and processes
+        self.render_cache = render_cache
+
+    @property
+    def parts(self):
+        """
+        Placed parts, a sequence of (part, x, y, uid) tuples. Parts with
+        the same content and scale share the same SVGPart, use the table
+        for each placement rotation.
+
+        Returns:
+            PartTable
+        """
+        return self._table
+
+    def new_sheet(self):
+        """
+        Create an empty mapper with the same surface size and settings
+
+        Returns:
+            SVGMapper
+        """
+        sheet = SVGMapper(self.width, self.height, self.dpi, self.cache,
+                self.incremental, self.lazy, self.catalog, self.render_cache)
+        sheet.border_width = self.border_width
+        sheet.border_color = self.border_color
+        sheet.margin_width = self.margin_width
+        return sheet
+
     def _fits_inside(self, x, y, width, height, rotate):
         """Returns true if svg fits inside mapping surface for a given
         position.
@@ -154,21 +600,41 @@ class SVGMapper(object):
             y (Number): placement y coordinate
             width (Number): SVG width in pixels
             height (Number): SVG height in pixels
-            rotate (Bool): True if the SVG has to be rotated 90 degrees
+            rotate (Bool|Number): True if the SVG has to be rotated 90
+                degrees, or rotation angle in degrees.
 
         Returns:
             Bool: True if it fits, false otherwise
         """ 
         if rotate:
-            return self._fits_inside(x, y, height, width, False)
+            width, height = rotated_size(width, height, rotate)
 
         full_width = width+2*self.margin_width
         full_height= height+2*self.margin_width
 
         return (x+full_width <= self.width and y+full_height <= self.height)
         
+    def validate_placements(self, x, y, width, height, rotate=None):
+        """
+        Check many placements fit inside the surface at once, without
+        adding them. See validation.validate_placements.
+
+        Arguments:
+            x (sequence): placements x coordinate
+            y (sequence): placements y coordinate
+            width (sequence): svgs width (not including margins)
+            height (sequence): svgs height (not including margins)
+            rotate (sequence|None): True for svgs rotated 90 degrees, or
+                rotation angle in degrees, None if none is rotated.
+
+        Returns:
+            validation.Validation: valid mask, and failure reasons
+        """
+        return validate_placements(x, y, width, height, rotate,
+                self.width, self.height, self.margin_width)
+
     def add_svg_fromstring(self, svg, x, y, width=None, height=None, 
-            rotate=False, uid=None):
+            rotate=False, uid=None, check_overlap=False):
         """
         Add svg to surface, from a string
 
@@ -182,78 +648,1062 @@ class SVGMapper(object):
             height (number | None): SVG height (not including margins) or None
                 to extract from svg. If the height is different from the
                 svg's real height, it will be scaled.
-            rotate (bool): Rotate svg 90 degrees in-place
+            rotate (bool|Number): Rotate svg 90 degrees in-place, or any
+                angle in degrees clockwise. Rotated svgs are placed with
+                their bounding box top left corner at (x, y).
             uid (string|None): User assigned id for the part, or None. It will
                 be added to the group containing the svg and its border.
+            check_overlap (bool): Raise ValueError if the svg (margins
+                included) overlaps any part already added.
         """
         assert(x>=0 and y>=0)
+        part = self._load_part(svg, width, height, rotate)
+        self._add_part(part, x, y, uid, check_overlap, rotate)
 
-        svg_width, svg_height = svg_dimensions(svg, self.dpi)
-        width = width or svg_width
-        height = height or svg_height
-        
-        assert(width>0 and height>0)
+    def add_svg_fromfile(self, path, x, y, width=None, height=None, 
+            rotate=False, uid=None, check_overlap=False):
+        """
+        Add svg from local file, see add_svg_fromstring
+        """
+        assert(x>=0 and y>=0)
+        part = self._load_part(path, width, height, rotate)
+        self._add_part(part, x, y, uid, check_overlap, rotate)
+
+    def add_template(self, template, x, y, params=None, width=None,
+            height=None, rotate=False, uid=None, check_overlap=False):
+        """
+        Add a parametric svg, rendered for the given parameters. Variants
+        are sized without parsing them, see template.Template.part.
+
+        Arguments:
+            template (template.Template): compiled template
+            x (positive number): Part x position
+            y (positive number): Part y position
+            params (dict|None): template parameter values
+            width, height, rotate, uid, check_overlap: see
+                add_svg_fromstring
+
+        Raises:
+            ValueError: for invalid parameters or placements
+        """
+        assert(x>=0 and y>=0)
+        part = template.part(params, dpi=self.dpi, scaled_width=width,
+                scaled_height=height, rotate=rotate)
+        self._add_part(part, x, y, uid, check_overlap, rotate)
+
+    def add_svgs(self, svgs, workers=None):
+        """
+        Add many svgs, reading, parsing and sizing them in parallel on a
+        pool of threads (lxml releases the GIL while parsing). Parts are
+        added in the same order they were given, and errors are reported
+        for each svg instead of stopping the whole batch.
+
+        Arguments:
+            svgs (iterable): (svg, x, y) or (svg, x, y, options) tuples,
+                where svg is the file content (bytes) or path (str), and
+                options a dict with any of width, height, rotate, uid
+                and check_overlap as in add_svg_fromstring.
+            workers (int|None): Number of threads, or None for the
+                ThreadPoolExecutor default.
 
-        # Check svg (margins included) fits into the surface.
+        Returns:
+            list: None for each svg added, or the exception raised
+                while adding it.
+        """
+        specs = [spec if len(spec) == 4 else tuple(spec)+({},)
+                for spec in svgs]
+
+        def load(spec):
+            svg, x, y, options = spec
+            assert(x>=0 and y>=0)
+            return self._load_part(svg, options.get('width'),
+                    options.get('height'), options.get('rotate', False))
+
+        def load_safe(spec):
+            try:
+                return load(spec), None
+            except Exception as error:
+                return None, error
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            loaded = list(executor.map(load_safe, specs))
+
+        # Placement checks depend on previous parts, done in order
+        errors = []
+        for (_, x, y, options), (part, error) in zip(specs, loaded):
+            if error is None:
+                try:
+                    self._add_part(part, x, y, options.get('uid'),
+                            options.get('check_overlap', False),
+                            options.get('rotate', False))
+                except Exception as e:
+                    error = e
+            errors.append(error)
+
+        return errors
+
+    def _load_part(self, source, width=None, height=None, rotate=False):
+        """
+        Create part from svg content or file, using the cache if enabled.
+        svg is parsed once and its dimensions extracted from the
+        resulting tree. Cached svgs already placed with the same scale
+        return the placed part, without copying its tree.
+
+        Arguments:
+            source (bytes|str): svg file content, or path to svg file
+            width (number|None): scaled width, or None for svg width
+            height (number|None): scaled height, or None for svg height
+            rotate (bool|Number): Rotate svg 90 degrees, or any angle
+
+        Returns:
+            SVGPart
+        """
+        options = dict(scaled_width=width, scaled_height=height,
+                rotate=rotate, dpi=self.dpi)
+
+        # Sources in the catalog aren't sized (nor files hashed) again
+        digest = dimensions = None
+        known = {}
+        if self.catalog is not None:
+            if isinstance(source, bytes):
+                digest = content_digest(source)
+            else:
+                digest = self.catalog.file_digest(source)
+            dimensions = self.catalog.dimensions(digest, self.dpi)
+            known['digest'] = digest
+            if dimensions is not None:
+                known['width'], known['height'] = dimensions
+
+        # Lazy parts with the same content and scale are shared too, so
+        # each distinct svg is loaded once for output.
+        if self.lazy:
+            part = SVGPart.lazy(source, cache=self.cache, **dict(options,
+                **known))
+            if digest is not None and dimensions is None:
+                self.catalog.add(digest, _source_size(source),
+                        dimensions={self.dpi: part.get_size()})
+            return self._table.find_source(part.part_key()) or part
+
+        if self.cache is None:
+            if isinstance(source, bytes):
+                part = SVGPart.fromstring(source, **dict(options, **known))
+            else:
+                part = SVGPart.fromfile(source, **dict(options, **known))
+            if digest is not None and dimensions is None:
+                self.catalog.add_root(digest, part.figure.root,
+                        _source_size(source), self.dpi, part.get_size())
+            return part
+
+        if isinstance(source, bytes):
+            cached = self.cache.get(source, digest)
+        else:
+            cached = self.cache.get_file(source, digest)
+
+        if dimensions is None:
+            dimensions = cached.dimensions(self.dpi)
+            if digest is not None:
+                self.catalog.add_root(digest, cached.root, cached.size,
+                        self.dpi, dimensions)
+        svg_width, svg_height = dimensions
+        part = self._table.find_source((cached.digest, svg_width,
+            svg_height, width or svg_width, height or svg_height))
+        if part is not None:
+            return part
+        return SVGPart.fromsource(cached, width=svg_width, height=svg_height,
+                **options)
+
+    def _add_part(self, part, x, y, uid, check_overlap=False, rotate=None):
+        """
+        Check part placement and store it
+
+        Arguments:
+            part (SVGPart): part to add
+            x (positive number): Part x position
+            y (positive number): Part y position
+            uid (string|None): User assigned id for the part, or None.
+            check_overlap (bool): Check part doesn't overlap others
+            rotate (bool|Number|None): Part rotation, or None to use the
+                part rotate attribute.
+        """
+        assert(part.scaled_width>0 and part.scaled_height>0)
+        rotation = rotation_angle(part.rotate if rotate is None else rotate)
+        box = self._check_placement(x, y, part.scaled_width,
+                part.scaled_height, rotation, check_overlap)
+
+        self._table.append(part, x, y, uid, rotation)
+        if self._index is not None:
+            self._index.insert(len(self._table)-1, box)
+
+    def _check_placement(self, x, y, width, height, rotate,
+            check_overlap=False, ignore=None):
+        """
+        Check part (margins included) fits into the surface at a position
+        and optionally that it doesn't overlap other parts.
+
+        Arguments:
+            x (Number): Part x position
+            y (Number): Part y position
+            width (Number): Part scaled width
+            height (Number): Part scaled height
+            rotate (bool|Number): Part rotation
+            check_overlap (bool): Check part doesn't overlap others
+            ignore (int|None): position of a part that can be overlapped
+                (i.e. the part itself when it's moved)
+
+        Returns:
+            tuple: part bounding box
+
+        Raises:
+            ValueError: when the placement is invalid
+        """
         if not self._fits_inside(x, y, width, height, rotate):
             raise ValueError("Placement out of bounds")
 
-        # Create part and store
-        part = SVGPart.fromstring(svg, width=svg_width, height=svg_height,
-                scaled_width=width, scaled_height=height, rotate=rotate,
-                dpi=self.dpi)
-        self.parts.append((part, x, y, uid))
+        box = self._box(x, y, *rotated_size(width, height, rotate))
+        if check_overlap:
+            overlapping = self._spatial_index().query(box)
+            overlapping.discard(ignore)
+            if overlapping:
+                raise ValueError("Placement overlaps another part")
 
-    def add_svg_fromfile(self, path, x, y, width=None, height=None, 
-            rotate=False, uid=None):
+        return box
+
+    def _part_position(self, part):
+        """
+        Find a part position in self.parts
+
+        Arguments:
+            part (int|str): part position, or part uid
+
+        Returns:
+            int
+
+        Raises:
+            KeyError: when there isn't such part
         """
-        Add svg from local file
+        if isinstance(part, int):
+            if not 0 <= part < len(self._table):
+                raise KeyError(part)
+            return part
+
+        position = self._table.find_uid(part)
+        if position is None:
+            raise KeyError(part)
+        return position
+
+    def _placement(self, i):
+        """Placement at a position of self.parts"""
+        source, x, y, rotation, uid = self._table.row(i)
+        width, height = self._table.placed_size(i)
+        return Placement(i, uid, self._table.sources[source], x, y,
+                rotation, width, height)
+
+    def find_placement(self, part):
         """
-        with open(path, 'rb') as thefile:
-            content = thefile.read()
-        
-        return self.add_svg_fromstring(content, x, y, height, width, rotate, uid)
- 
-    def _place_parts(self, surf):
+        Find where a part was placed, without generating any output
+
+        Arguments:
+            part (int|str): part position, or part uid
+
+        Returns:
+            Placement
+
+        Raises:
+            KeyError: when there isn't such part
+        """
+        return self._placement(self._part_position(part))
+
+    def placements_by_uid(self):
+        """
+        Returns:
+            dict: Placement for each uid, the first placed when several
+                parts share an uid.
+        """
+        return {uid: self._placement(i) for uid, i in
+                self._table.uid_positions().items()}
+
+    def move_part(self, part, x, y, check_overlap=False):
+        """
+        Move a part to a new position
+
+        Arguments:
+            part (int|str): part position in parts, or its uid
+            x (positive number): New x position
+            y (positive number): New y position
+            check_overlap (bool): Raise ValueError if the part overlaps
+                any other part in its new position.
+        """
+        assert(x>=0 and y>=0)
+        position = self._part_position(part)
+        svg_part = self._table.part(position)
+
+        box = self._check_placement(x, y, svg_part.scaled_width,
+                svg_part.scaled_height, self._table.rotation[position],
+                check_overlap, position)
+
+        self._table.update(position, x=x, y=y)
+        if self._index is not None:
+            self._index.insert(position, box)
+
+    def update_part(self, part, width=None, height=None, rotate=None,
+            uid=None, check_overlap=False):
+        """
+        Change a part scale, rotation or uid, only the options given are
+        changed.
+
+        Arguments:
+            part (int|str): part position in parts, or its uid
+            width (Number|None): new scaled width
+            height (Number|None): new scaled height
+            rotate (bool|Number|None): new rotation, see add_svg_fromstring
+            uid (str|None): new uid
+            check_overlap (bool): Raise ValueError if the changed part
+                overlaps any other part.
+        """
+        position = self._part_position(part)
+        svg_part, x, y, _ = self._table[position]
+
+        width = width or svg_part.scaled_width
+        height = height or svg_part.scaled_height
+        if rotate is None:
+            rotation = self._table.rotation[position]
+        else:
+            rotation = rotation_angle(rotate)
+
+        box = self._check_placement(x, y, width, height, rotation,
+                check_overlap, position)
+
+        # Parts are shared, scaling uses another (or a new) source
+        source = None
+        if (width, height) != (svg_part.scaled_width, svg_part.scaled_height):
+            source = self._table.add_source(svg_part.rescaled(width, height))
+
+        self._table.update(position, rotation=rotation, source=source,
+                uid=uid)
+        if self._index is not None:
+            self._index.insert(position, box)
+
+    def remove_part(self, part):
+        """
+        Remove a part, the position of the parts after it is decreased
+
+        Arguments:
+            part (int|str): part position in parts, or its uid
+
+        Returns:
+            (SVGPart, Number, Number, str): removed part, x, y and uid
+        """
+        entry = self._table.pop(self._part_position(part))
+
+        # Index is keyed by position, rebuilt on next use
+        self._index = None
+        return entry
+
+    def _box(self, x, y, width, height):
+        """
+        Bounding box of a placed part, margins included
+
+        Arguments:
+            x (Number): Part x position
+            y (Number): Part y position
+            width (Number): Part width once rotated
+            height (Number): Part height once rotated
+
+        Returns:
+            (Number, Number, Number, Number): min_x, min_y, max_x, max_y
+        """
+        margins = 2*self.margin_width
+        return (x, y, x+width+margins, y+height+margins)
+
+    def _spatial_index(self):
+        """
+        Spatial index of the parts bounding boxes, keyed by part position
+        in self.parts. Built on first use and rebuilt if margins change.
+
+        Returns:
+            GridIndex
+        """
+        if self._index is not None and \
+                self._index_margin == self.margin_width:
+            return self._index
+
+        boxes = list(zip(*(list(column) for column in 
+            self._table.bounding_boxes(self.margin_width))))
+
+        # Cells about the size of the typical part, or a fraction of the
+        # surface when there are no parts yet.
+        if boxes:
+            sides = sorted(max(b[2]-b[0], b[3]-b[1]) for b in boxes)
+            cell_size = sides[len(sides)//2]
+        else:
+            cell_size = max(self.width, self.height)/32.0
+
+        self._index = GridIndex(max(cell_size, 1))
+        self._index_margin = self.margin_width
+        for i, box in enumerate(boxes):
+            self._index.insert(i, box)
+        return self._index
+
+    def parts_in_rect(self, x, y, width, height):
+        """
+        Find parts whose bounding box (margins included) overlaps a
+        rectangle of the surface.
+
+        Arguments:
+            x (Number): rectangle x coordinate
+            y (Number): rectangle y coordinate
+            width (Number): rectangle width
+            height (Number): rectangle height
+
+        Returns:
+            list: (part, x, y, uid) for each part, in placement order
+        """
+        keys = self._spatial_index().query((x, y, x+width, y+height))
+        return [self._table[k] for k in sorted(keys)]
+
+    def find_free_slot(self, width, height, x=0, y=0, rotate=False):
+        """
+        Find the free position nearest to (x, y) where a svg could be
+        added without overlapping other parts, candidate positions are
+        the surface origin and those touching other parts.
+
+        Arguments:
+            width (Number): SVG width in pixels (not including margins)
+            height (Number): SVG height in pixels (not including margins)
+            x (Number): target x coordinate
+            y (Number): target y coordinate
+            rotate (Bool|Number): True if the SVG will be rotated 90
+                degrees, or rotation angle in degrees.
+
+        Returns:
+            (Number, Number)|None: x, y or None if there is no free space
+        """
+        if rotate:
+            width, height = rotated_size(width, height, rotate)
+        margins = 2*self.margin_width
+
+        return self._spatial_index().free_position(width+margins,
+                height+margins, (0, 0, self.width, self.height), x, y)
+
+    def _namespace_ids(self, positions=None, splice=False):
+        """
+        Prefix the ids in each placed source with its own namespace, so
+        ids from different sources can't collide, and move the sources
+        definitions out of them so they are written once in a shared
+        defs. Identical definitions from different sources are merged.
+        Sources placed many times with ids other than their definitions
+        get a namespace for each placement too, see _placement_prefix.
+        Namespaces are numbered by the first placement of each source, so
+        the output only depends on the placements (see fingerprint).
+        Sources must be restored with _restore_ids once written.
+
+        Arguments:
+            positions (iterable|None): positions of the placements being
+                written, or None for all of them.
+            splice (bool): parts are spliced, see SVGPart.has_ids
+
+        Returns:
+            (list, tuple): shared definitions, and signature of the ids
+                renaming, output generated with the same signature
+                references the same definitions.
+        """
+        # Over all placements, so tiles name them the same
+        placements = Counter(self._table.source)
+        numbers = dict((source, number) for number, source in
+                enumerate(placements))
+        if positions is None:
+            placed = set(placements)
+        else:
+            placed = set(self._table.source[i] for i in positions)
+
+        shared, canonical, signature = [], {}, []
+        for source in sorted(placed, key=numbers.get):
+            part = self._table.sources[source]
+            if not part.has_ids(splice):
+                continue
+            index = part.id_index
+
+            number = numbers[source]
+            prefix = "{}{}-".format(ID_NAMESPACE_PREFIX, number)
+            index.rename(prefix)
+
+            merged = {}
+            for element, element_id in index.definitions:
+                key = _definition_key(element)
+                if key in canonical:
+                    merged[element_id] = canonical[key]
+                else:
+                    canonical[key] = element.get("id")
+                    shared.append(element)
+            if merged:
+                index.rename(prefix, merged)
+
+            index.detach_definitions()
+            self._namespaced.append(index)
+
+            # Definitions are shared by all placements, only the other
+            # ids are renamed on each of them
+            defined = dict((element_id, merged.get(element_id,
+                prefix+element_id)) for _, element_id in index.definitions)
+            if placements[source] > 1 and len(defined) < len(index.ids):
+                self._placement_ids[source] = (index, defined, number)
+            signature.append((source, number,
+                tuple(sorted(merged.items()))))
+
+        return shared, tuple(signature)
+
+    def _restore_ids(self):
+        """Restore the sources ids and definitions, see _namespace_ids,
+        and release lazy sources (and any source read) once written."""
+        for index in self._namespaced:
+            index.restore_definitions()
+            index.rename()
+        self._namespaced = []
+        self._placement_ids = {}
+
+        for part in self._table.sources:
+            part.release()
+
+    def _placement_prefix(self, source, position):
+        """
+        Arguments:
+            source (int): placement source
+            position (int|None): placement position
+
+        Returns:
+            str|None: prefix of the placement own ids, for sources placed
+                many times with ids other than their definitions, None
+                when the source ids are already unique in the output.
+        """
+        if position is None or source not in self._placement_ids:
+            return None
+        return "{}{}.{}-".format(ID_NAMESPACE_PREFIX,
+                self._placement_ids[source][2], position)
+
+    def _symbol_ids(self, positions=None):
+        """Assign a symbol id to each distinct part content (see
+        SVGPart.symbol_key), parts with other scales share it.
+
+        Arguments:
+            positions (iterable|None): positions of the placements whose
+                parts get a symbol, or None for all of them.
+
+        Returns:
+            (list, dict): distinct part for each symbol in order, and
+                symbol id for each symbol key
+        """
+        distinct, symbol_ids = [], {}
+        sources, seen = self._table.sources, set()
+
+        if positions is None:
+            placed = self._table.source
+        else:
+            placed = (self._table.source[i] for i in positions)
+
+        for source in placed:
+            if source in seen:
+                continue
+            seen.add(source)
+
+            part = sources[source]
+            key = part.symbol_key()
+            if key is None or key in symbol_ids:
+                continue
+
+            symbol_ids[key] = "{}{}".format(SYMBOL_ID_PREFIX, len(distinct))
+            distinct.append(part)
+
+        return distinct, symbol_ids
+
+    def _generate_symbols(self, positions=None):
+        """Generate a symbol for each distinct part content
+
+        Arguments:
+            positions (iterable|None): see _symbol_ids
+
+        Returns:
+            (list, dict): symbol elements, and symbol id for each symbol
+                key
+        """
+        distinct, symbol_ids = self._symbol_ids(positions)
+        symbols = [part.generate_symbol(symbol_ids[part.symbol_key()])
+                for part in distinct]
+        return symbols, symbol_ids
+
+    def _generate_group(self, row, symbol_id=None, content=None,
+            position=None):
+        """Generate a part group moved to its final position
+
+        Arguments:
+            row (tuple): (source, x, y, rotation, uid) placement row
+            symbol_id (str|None): id of the part symbol, the part is
+                placed with an use of it, or None to place the svg.
+            content (FigureElement|None): element placed instead of the
+                svg when there is no symbol, or None for the svg.
+            position (int|None): placement position, the svg ids are
+                renamed for it when needed, see _placement_prefix.
+
+        Returns:
+            GroupElement: part group
+        """
+        source, x, y, rotation, uid = row
+        part = self._table.sources[source]
+
+        if symbol_id is not None:
+            content = part.generate_use(symbol_id)
+        elif content is None:
+            prefix = self._placement_prefix(source, position)
+            if prefix is not None:
+                index, defined, _ = self._placement_ids[source]
+                index.rename(prefix, defined)
+
+        group = part.generate_group(self.margin_width, self.border_width,
+                    self.border_color, content, x, y, rotation)
+
+        # Asign part id to the group
+        if uid:
+            group.id(str(uid))
+
+        return group
+
+    def _group_fragment(self, writer, row, symbol_id=None, splice=False,
+            position=None):
+        """Serialize a part group, see _generate_group. When splicing,
+        the part svg is copied from its source into the serialized group
+        instead of serializing its tree, if it doesn't need any change.
+
+        Arguments:
+            writer (SVGStreamWriter): Opened document writer
+            row (tuple): (source, x, y, rotation, uid) placement row
+            symbol_id (str|None): id of the part symbol, or None
+            splice (bool): Copy the part svg from its source when possible
+            position (int|None): placement position, see _generate_group
+
+        Returns:
+            list: serialized chunks, see SVGStreamWriter.tostring
+        """
+        if splice and symbol_id is None and writer.optimizer is None:
+            part = self._table.sources[row[0]]
+            body = part.splice_body()
+            if body is not None:
+                group = self._generate_group(row, content=part.splice_shell())
+                return splice_fragment(writer.tostring(group), body)
+
+        return writer.tostring(self._generate_group(row, symbol_id,
+            position=position))
+
+    def _row_symbol_ids(self, symbol_ids):
+        """Symbol id for each source, or None for those without symbol"""
+        return [symbol_ids.get(part.symbol_key()) 
+                for part in self._table.sources]
+
+    def _generate_groups(self, symbol_ids):
+        """Generate each part group, moved to its final position
+
+        Arguments:
+            symbol_ids (dict): symbol id for each symbol key, parts with a
+                symbol are placed with an use of it.
+
+        Yields:
+            GroupElement: part group
+        """
+        source_symbols = self._row_symbol_ids(symbol_ids)
+        for i, row in enumerate(self._table.rows()):
+            yield self._generate_group(row, source_symbols[row[0]],
+                    position=i)
+
+    def _place_parts(self, surf, dedup=False):
         """Generate each part group and place them in the surface
 
         Arguments:
             surf (SVGFigure): Figure where the parts will be placed
+            dedup (bool): Place each distinct part once as a symbol in
+                the surface defs, and parts as uses of those symbols.
+        """
+        shared, _ = self._namespace_ids()
+        try:
+            if shared:
+                surf.append(DefsElement([deepcopy(e) for e in shared]))
+
+            if dedup:
+                symbols, symbol_ids = self._generate_symbols()
+                if symbols:
+                    surf.append(DefsElement(symbols))
+            else:
+                symbol_ids = {}
+
+            # Parts placed many times share their svg, each group gets a
+            # copy
+            surf.append([deepcopy(group.root) for group in
+                self._generate_groups(symbol_ids)])
+        finally:
+            self._restore_ids()
+
+    def _write_parts(self, writer, dedup=False, splice=False):
+        """Generate each part group and write it, one at a time, so only
+        one of them is kept in memory.
+
+        Arguments:
+            writer (SVGStreamWriter): Opened document writer
+            dedup (bool): Write each distinct part once as a symbol in
+                the document defs, and parts as uses of those symbols.
+            splice (bool): Copy parts svg from their sources when
+                possible, see _group_fragment.
         """
-        parts = []
+        shared, signature = self._namespace_ids(
+                splice=splice and writer.optimizer is None)
+        try:
+            if shared:
+                writer.write(DefsElement(shared))
+
+            if self.incremental:
+                return self._write_parts_incremental(writer, dedup,
+                        signature, splice)
+
+            if dedup:
+                symbols, symbol_ids = self._generate_symbols()
+                if symbols:
+                    writer.write(DefsElement(symbols))
+            else:
+                symbol_ids = {}
+
+            source_symbols = self._row_symbol_ids(symbol_ids)
+            for i, row in enumerate(self._table.rows()):
+                writer.write_raw(self._group_fragment(writer, row,
+                    source_symbols[row[0]], splice, i))
+        finally:
+            self._restore_ids()
 
-        for p in self.parts:
-            part, x, y, uid = p
-            group = part.generate_group(self.margin_width, self.border_width,
-                        self.border_color)
+    def _write_parts_incremental(self, writer, dedup=False, signature=(),
+            splice=False):
+        """Write each part reusing its serialized output from previous
+        calls when the part and output settings didn't change, see
+        _write_parts. signature is the sources ids renaming, see
+        _namespace_ids."""
+        optimizer = writer.optimizer
+        settings = (self.margin_width, self.border_width, self.border_color,
+                dedup, writer.pretty_print,
+                optimizer.settings() if optimizer is not None else None,
+                signature, splice)
+        if settings != self._fragments_settings:
+            self._fragments.clear()
+            self._defs_fragment = None
+            self._fragments_settings = settings
 
-            # Asign part id to the group
-            #g = GroupElement(group)
-            part_group = group
-            if uid:
-                part_group.id(str(uid))
+        if dedup:
+            distinct, symbol_ids = self._symbol_ids()
+            defs_key = [part.symbol_key() for part in distinct]
+            if self._defs_fragment is None or \
+                    self._defs_fragment[0] != defs_key:
+                symbols = [part.generate_symbol(symbol_ids[key])
+                        for part, key in zip(distinct, defs_key)]
+                fragment = writer.tostring(DefsElement(symbols)) \
+                        if symbols else []
+                self._defs_fragment = (defs_key, fragment)
+            writer.write_raw(self._defs_fragment[1])
+        else:
+            symbol_ids = {}
+
+        source_symbols = self._row_symbol_ids(symbol_ids)
+        fragments = {}
+        for i, row in enumerate(self._table.rows()):
+            symbol_id = source_symbols[row[0]]
+            # Parts with their own ids are written for their position
+            key = (symbol_id, None if symbol_id is not None else
+                    self._placement_prefix(row[0], i))
+
+            cached = self._fragments.get(row)
+            if cached is None or cached[0] != key:
+                cached = (key, self._group_fragment(writer, row,
+                    symbol_id, splice, i))
 
-            # Move whole group to its final positions
-            part_group.moveto(x, y)
-            parts.append(part_group)
+            fragments[row] = cached
+            writer.write_raw(cached[1])
 
-        surf.append(parts)
+        # Only keep the output of current parts
+        self._fragments = fragments
 
-    def to_svg(self, path=None):
+    def to_svg(self, path=None, dedup=False, pretty_print=True,
+            optimize=None, compression=None, compression_level=None,
+            splice=False):
         """
-        Save to svg file
+        Save to svg file, the document is streamed to the output as each
+        part is generated instead of building it whole in memory.
 
         Arguments:
-            path (string|None): Path to output file or None to return
-            svg as string.
+            path (string|file|None): Path to output file, writable binary
+                stream, or None to return svg as string.
+            dedup (bool): Output parts with the same content once as a
+                <symbol>, placing each of them with an <use> scaling it.
+            pretty_print (bool): Indent output, disable it for faster
+                and smaller output.
+            optimize (Optimizer|bool|None): Optimize output size with the
+                given optimizer (its report() gives the bytes saved), or
+                True to use one with the default settings.
+            compression (str|None): 'gzip' or 'zstd' (requires
+                zstandard) to compress the output as it's written. By
+                default paths ending in .svgz/.gz use gzip, .zst zstd, and
+                everything else is not compressed.
+            compression_level (int|None): compression level, higher is
+                smaller but slower, None for the default.
+            splice (bool): Copy parts svg from their sources (bytes or
+                files) into the output as they are, instead of parsing
+                and serializing them. Parts with ids, or when optimizing
+                or deduplicating, are serialized as usual.
+
+        With a render cache, the output is copied from the cache when an
+        output with the same fingerprint was already rendered (optimizer
+        reports aren't updated then), and stored in it otherwise.
         """
+        key = None
+        if self.render_cache is not None:
+            if compression is None and isinstance(path, str):
+                compression = path_compression(path)
+            key = self.fingerprint(dedup, pretty_print, optimize,
+                    compression, compression_level, splice)
+            if key is not None:
+                cached = self.render_cache.get(key, path)
+                if cached is not None:
+                    return cached if path is None else None
+
         width = "{}".format(self.width)
         height = "{}".format(self.height)
         surf = SVGFigure(width, height)
-      
-        self._place_parts(surf)
-       
-        if path is not None:
-            surf.save(path)
+
+        # Cached outputs written to streams are buffered to be stored
+        optimizer = _optimizer(optimize)
+        if path is None or (key is not None and not isinstance(path, str)):
+            output = BytesIO()
         else:
-            return surf.to_str()
+            output = path
+        with SVGStreamWriter(output, surf.root, pretty_print, optimizer,
+                compression, compression_level) as writer:
+            self._write_parts(writer, dedup, splice)
+
+        if key is not None:
+            if isinstance(path, str):
+                self.render_cache.put(key, path)
+            else:
+                self.render_cache.put(key, output.getvalue())
+                if path is not None:
+                    path.write(output.getvalue())
+
+        if path is None:
+            return output.getvalue()
+
+    def fingerprint(self, dedup=False, pretty_print=True, optimize=None,
+            compression=None, compression_level=None, splice=False):
+        """
+        Hash of everything the output depends on: surface size, dpi,
+        margin and border settings, each placement (source content hash,
+        scale, position, rotation and uid), and the output settings.
+        Mappers with the same fingerprint write the same output.
+
+        Arguments:
+            dedup, pretty_print, optimize, compression, compression_level,
+                splice: output settings, see to_svg.
+
+        Returns:
+            str|None: hex digest, or None when the content of a part is
+                unknown (parts created from a SVGFigure without digest).
+        """
+        # Key of each placement source, numbered by first placement as
+        # in _namespace_ids, sources left without placements and their
+        # positions don't change the output.
+        table, sources = self._table, self._table.sources
+        numbers = dict((source, number) for number, source in
+                enumerate(dict.fromkeys(table.source)))
+        keys = [sources[source].part_key() for source in numbers]
+        if None in keys:
+            return None
+        placed = array('q', [numbers[source] for source in table.source])
+
+        optimizer = _optimizer(optimize)
+        settings = (FINGERPRINT_VERSION, self.width, self.height, self.dpi,
+                self.margin_width, self.border_width, self.border_color,
+                dedup, pretty_print,
+                optimizer.settings() if optimizer is not None else None,
+                compression, compression_level, splice)
+
+        digest = hashlib.sha1(repr((settings, keys, table.uids)).encode())
+        for column in (table.x, table.y, table.rotation, placed):
+            digest.update(column.tobytes())
+        return digest.hexdigest()
+
+    def tiles(self, tile_width, tile_height):
+        """
+        Split the surface into a grid of tiles, tiles on the right and
+        bottom edges are cropped to the surface.
+
+        Arguments:
+            tile_width (Number): tile width in pixels
+            tile_height (Number): tile height in pixels
+
+        Yields:
+            (int, int, Number, Number, Number, Number): row, column, x, y,
+                width and height of each tile, by rows.
+        """
+        assert(tile_width > 0 and tile_height > 0)
+        rows = max(1, int(math.ceil(self.height/float(tile_height))))
+        columns = max(1, int(math.ceil(self.width/float(tile_width))))
+
+        for row in range(rows):
+            y = row*tile_height
+            height = min(tile_height, self.height-y)
+            for column in range(columns):
+                x = column*tile_width
+                width = min(tile_width, self.width-x)
+                yield row, column, x, y, width, height
+
+    def _write_tile(self, output, box, positions, dedup=False,
+            pretty_print=False, optimizer=None, splice=False):
+        """
+        Write a tile document, see to_tiles
+
+        Arguments:
+            output (file): writable binary stream
+            box (tuple): x, y, width and height of the tile
+            positions (list): positions of the parts drawn in the tile,
+                in placement order.
+            dedup (bool): Output repeated parts as symbols, see to_svg
+            pretty_print (bool): Indent output, see to_svg
+            optimizer (Optimizer|None): Output optimizer, see to_svg
+            splice (bool): Copy parts svg from their sources, see to_svg
+        """
+        x, y, width, height = [format_number(v) for v in box]
+        surf = SVGFigure()
+        surf.root.set("width", width)
+        surf.root.set("height", height)
+        # Parts keep their surface coordinates, the viewBox moves them
+        surf.root.set("viewBox", "{} {} {} {}".format(x, y, width, height))
+
+        shared, _ = self._namespace_ids(positions,
+                splice and optimizer is None)
+        try:
+            with SVGStreamWriter(output, surf.root, pretty_print,
+                    optimizer) as writer:
+                rect = etree.Element(SVG+"rect", {"x": x, "y": y,
+                    "width": width, "height": height}, nsmap=NSMAP)
+                defs = [ClipPathElement(TILE_CLIP_ID, [rect])]+shared
+                if dedup:
+                    symbols, symbol_ids = self._generate_symbols(positions)
+                    defs.extend(symbols)
+                else:
+                    symbol_ids = {}
+                writer.write(DefsElement(defs))
+
+                # Parts crossing the tile edges are clipped to the tile, the
+                # group is written open so parts are streamed into it.
+                newline = b"\n" if pretty_print else b""
+                writer.write_raw('<g clip-path="url(#{})">'.format(
+                    TILE_CLIP_ID).encode()+newline)
+
+                source_symbols = self._row_symbol_ids(symbol_ids)
+                for i in positions:
+                    row = self._table.row(i)
+                    writer.write_raw(self._group_fragment(writer, row,
+                        source_symbols[row[0]], splice, i))
+
+                writer.write_raw(b"</g>"+newline)
+        finally:
+            self._restore_ids()
+
+    def to_tiles(self, tile_width, tile_height, output, dedup=False,
+            pretty_print=False, skip_empty=False, optimize=None,
+            splice=False):
+        """
+        Save the surface as a grid of tile svgs, for surfaces too large to
+        be opened as a single document. Each tile only contains the parts
+        whose bounding box overlaps it, clipped to the tile edges, and
+        tiles are written one after another so only one of them is in
+        memory at any time.
+
+        Arguments:
+            tile_width (Number): tile width in pixels
+            tile_height (Number): tile height in pixels
+            output (str|callable): directory where each tile is saved as
+                tile-<row>-<column>.svg, or callable(row, column)
+                returning the writable binary stream for a tile, closed
+                once the tile is written.
+            dedup (bool): Output repeated parts as symbols, see to_svg
+            pretty_print (bool): Indent output, see to_svg
+            skip_empty (bool): Don't write tiles without parts
+            optimize (Optimizer|bool|None): Output optimizer, see to_svg
+            splice (bool): Copy parts svg from their sources, see to_svg
+
+        Returns:
+            list: Tile for each written tile, by rows
+        """
+        if isinstance(output, str):
+            if not os.path.isdir(output):
+                raise ValueError("Output directory doesn't exist")
+            directory = output
+            output = lambda row, column: open(os.path.join(directory,
+                TILE_FILENAME.format(row=row, column=column)), 'wb')
+
+        optimizer = _optimizer(optimize)
+        index = self._spatial_index()
+        tiles = []
+        for row, column, x, y, width, height in self.tiles(tile_width,
+                tile_height):
+            positions = sorted(index.query((x, y, x+width, y+height)))
+            if skip_empty and not positions:
+                continue
+
+            stream = output(row, column)
+            try:
+                self._write_tile(stream, (x, y, width, height), positions,
+                        dedup, pretty_print, optimizer, splice)
+            finally:
+                stream.close()
+
+            tiles.append(Tile(row, column, x, y, width, height,
+                len(positions), getattr(stream, 'name', None)))
+        return tiles
+
+
+def _source_size(source):
+    """Size in bytes of svg content or file"""
+    if isinstance(source, bytes):
+        return len(source)
+    return os.path.getsize(source)
+
+
+def _load_source(source, cache=None):
+    """
+    Parse the svg of a lazy part, see SVGPart.lazy
+
+    Arguments:
+        source (bytes|str): svg content, or path to svg file
+        cache (PartCache|None): cache used to parse it, or None
+
+    Returns:
+        SVGFigure
+    """
+    if cache is not None:
+        if isinstance(source, bytes):
+            return cache.get(source).figure()
+        return cache.get_file(source).figure()
+
+    try:
+        if isinstance(source, bytes):
+            return SVGFigure.fromstring(source)
+        return SVGFigure.fromfile(source)
+    except etree.XMLSyntaxError:
+        raise ValueError(DIMENSIONS_ERROR_MSG)
+
+
+def _optimizer(optimize):
+    """Optimizer for an optimize argument, see SVGMapper.to_svg"""
+    if optimize is True:
+        return Optimizer()
+    if not optimize:
+        return None
+    return optimize
+
+
+def _definition_key(element):
+    """Key identifying definitions with the same content, their id aside"""
+    definition = etree.tostring(element, with_tail=False)
+    return definition.replace(' id="{}"'.format(element.get("id")).encode(),
+            b"", 1)
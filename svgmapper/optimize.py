@@ -0,0 +1,354 @@
+from collections import namedtuple
+from copy import deepcopy
+import re
+
+from lxml import etree
+from .transform import SVG, URL_REFERENCE_RE, HREF_ATTRIBUTES
+
+# Decimals kept by default when rounding numbers
+DEFAULT_PRECISION = 3
+
+# Namespaces of the private data editors add to their documents
+EDITOR_NAMESPACES = frozenset([
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://ns.adobe.com/AdobeIllustrator/10.0/",
+    "http://ns.adobe.com/Graphs/1.0/",
+    "http://ns.adobe.com/SaveForWeb/1.0/",
+    "http://ns.adobe.com/Extensibility/1.0/",
+    "http://www.bohemiancoding.com/sketch/ns",
+])
+
+# Elements whose text content is meaningful, whitespace included
+TEXT_ELEMENTS = frozenset(SVG+tag for tag in
+        ("text", "tspan", "textPath", "style", "script", "title", "desc"))
+
+# Attributes holding numbers (with optional units) or lists of numbers
+NUMERIC_ATTRIBUTES = frozenset([
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "fx",
+    "fy", "dx", "dy", "width", "height", "viewBox", "transform",
+    "gradientTransform", "patternTransform", "offset", "opacity",
+    "fill-opacity", "stroke-opacity", "stop-opacity", "stroke-width",
+    "stroke-dasharray", "stroke-dashoffset", "stroke-miterlimit",
+    "font-size",
+])
+
+# Attributes holding path data or point lists
+PATH_ATTRIBUTES = frozenset(["d", "points"])
+
+# Style declarations dropped when set to their default value
+STYLE_DEFAULTS = {
+    "opacity": 1.0,
+    "fill-opacity": 1.0,
+    "stroke-opacity": 1.0,
+    "stop-opacity": 1.0,
+}
+
+# Numbers not part of a name, hex color or id
+NUMBER_RE = re.compile(r"(?<![#\w.])[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+PATH_TOKEN_RE = re.compile(r"[\s,]*([A-Za-z]|[-+]?(?:\d+\.?\d*|\.\d+)"
+        r"(?:[eE][-+]?\d+)?)")
+# Arc flags are a single digit, and can be written without separators
+PATH_FLAG_RE = re.compile(r"[\s,]*([01])")
+
+# Positions of the flags in the arc command parameters
+ARC_FLAGS = (3, 4)
+
+
+# Bytes written by an optimizer, original is the size the same elements
+# would have without optimizing them.
+OptimizeReport = namedtuple('OptimizeReport',
+        ['elements', 'original', 'optimized', 'saved'])
+
+
+def format_decimal(value, precision=DEFAULT_PRECISION):
+    """
+    Shortest string for a number rounded to precision decimals, without
+    leading zero nor exponent.
+
+    Arguments:
+        value (float): number
+        precision (int): decimals kept
+
+    Returns:
+        str
+    """
+    text = "{:.{}f}".format(round(value, precision), precision)
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    if text in ("-0", ""):
+        return "0"
+    if text.startswith("0."):
+        return text[1:]
+    if text.startswith("-0."):
+        return "-"+text[2:]
+    return text
+
+
+def round_numbers(value, precision=DEFAULT_PRECISION):
+    """
+    Round every number in an attribute value, units and separators are
+    kept.
+
+    Arguments:
+        value (str): attribute value
+        precision (int): decimals kept
+
+    Returns:
+        str
+    """
+    return NUMBER_RE.sub(lambda m: format_decimal(float(m.group(0)),
+        precision), value)
+
+
+def shorten_path(data, precision=DEFAULT_PRECISION):
+    """
+    Shorten path data or point lists, numbers are rounded and separators
+    are only kept where they are needed to split two numbers.
+
+    Arguments:
+        data (str): path data
+        precision (int): decimals kept
+
+    Returns:
+        str
+    """
+    parts, previous = [], None
+    command, parameter, position = None, 0, 0
+    while True:
+        if command in ("A", "a") and parameter%7 in ARC_FLAGS:
+            match = PATH_FLAG_RE.match(data, position)
+            if match is not None:
+                # Only the second flag can follow the first one directly
+                if parameter%7 == ARC_FLAGS[0] and previous is not None:
+                    parts.append(" ")
+                position = match.end()
+                parameter += 1
+                parts.append(match.group(1))
+                previous = match.group(1)
+                continue
+
+        match = PATH_TOKEN_RE.match(data, position)
+        if match is None:
+            break
+        position = match.end()
+        token = match.group(1)
+
+        if token.isalpha():
+            parts.append(token)
+            command, parameter, previous = token, 0, None
+            continue
+
+        parameter += 1
+        number = format_decimal(float(token), precision)
+        # A sign, or a dot after a number that already has one, starts
+        # a new number without any separator.
+        if previous is not None and not (number[0] == "-" or
+                (number[0] == "." and "." in previous)):
+            parts.append(" ")
+        parts.append(number)
+        previous = number
+    return "".join(parts)
+
+
+def shorten_style(style, precision=DEFAULT_PRECISION):
+    """
+    Shorten a style attribute, numbers are rounded, whitespace removed
+    and declarations with their default value dropped.
+
+    Arguments:
+        style (str): style attribute
+        precision (int): decimals kept
+
+    Returns:
+        str
+    """
+    declarations = []
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip(), value.strip()
+        if not name or not value:
+            continue
+
+        value = round_numbers(value, precision)
+        default = STYLE_DEFAULTS.get(name)
+        if default is not None:
+            try:
+                if float(value) == default:
+                    continue
+            except ValueError:
+                pass
+        declarations.append(name+":"+value)
+    return ";".join(declarations)
+
+
+def _remove(element):
+    """Remove an element from its parent keeping its tail text"""
+    parent = element.getparent()
+    if element.tail:
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "")+element.tail
+        else:
+            parent.text = (parent.text or "")+element.tail
+    parent.remove(element)
+
+
+def _namespace(name):
+    """Namespace of a tag or attribute name, None if it has none"""
+    if name[:1] == "{":
+        return name[1:name.index("}")]
+    return None
+
+
+def _references(root):
+    """Ids referenced with url(#id) or href from inside a tree"""
+    references = set()
+    for element in root.iter(tag=etree.Element):
+        for name, value in element.items():
+            if name in HREF_ATTRIBUTES:
+                if value.startswith("#"):
+                    references.add(value[1:])
+            elif "url(" in value:
+                references.update(URL_REFERENCE_RE.findall(value))
+
+        if element.tag == SVG+"style" and element.text:
+            references.update(URL_REFERENCE_RE.findall(element.text))
+    return references
+
+
+def remove_unused_defs(root):
+    """
+    Remove the definitions nested inside a tree that aren't referenced
+    from it, root itself is kept even if it's a defs element, as the
+    definitions written on their own are used by other elements.
+
+    Arguments:
+        root (lxml.etree._Element): tree root, modified in place
+
+    Returns:
+        int: number of removed definitions
+    """
+    removed = 0
+    while True:
+        references = _references(root)
+        unused = [element for defs in root.iter(SVG+"defs")
+                if defs is not root for element in defs
+                if element.tag in (etree.Comment, etree.ProcessingInstruction)
+                or (element.tag not in TEXT_ELEMENTS and
+                    element.get("id") not in references)]
+        if not unused:
+            break
+        for element in unused:
+            _remove(element)
+        removed += len(unused)
+
+    for defs in list(root.iter(SVG+"defs")):
+        if defs is not root and len(defs) == 0 and not defs.attrib:
+            _remove(defs)
+    return removed
+
+
+class Optimizer(object):
+
+    def __init__(self, precision=DEFAULT_PRECISION, measure=True):
+        """
+        Output optimization stage, shrinks each written element removing
+        comments, metadata, editor data, unused definitions and
+        whitespace, rounding numbers and shortening path data and styles.
+
+        Numbers are rounded in the coordinates of the element they are
+        in, so parts scaled up a lot may need a higher precision.
+
+        Arguments:
+            precision (int): decimals kept when rounding numbers
+            measure (bool): Keep track of the bytes saved, each element
+                is also serialized without optimizing to measure them.
+        """
+        assert(precision >= 0)
+        self.precision = precision
+        self.measure = measure
+        self.elements = 0
+        self.original = 0
+        self.optimized = 0
+
+    def settings(self):
+        """
+        Returns:
+            tuple: settings that change the optimized output
+        """
+        return (self.precision,)
+
+    def optimize(self, element):
+        """
+        Optimize a copy of an element tree, the element is not modified
+
+        Arguments:
+            element (lxml.etree._Element): tree root
+
+        Returns:
+            lxml.etree._Element: optimized copy
+        """
+        root = deepcopy(element)
+        precision = self.precision
+
+        for node in list(root.iter(etree.Comment, etree.ProcessingInstruction,
+                SVG+"metadata")):
+            _remove(node)
+
+        for node in list(root.iter(tag=etree.Element)):
+            if _namespace(node.tag) in EDITOR_NAMESPACES:
+                if node is not root:
+                    _remove(node)
+                continue
+
+            for name, value in node.items():
+                if _namespace(name) in EDITOR_NAMESPACES:
+                    del node.attrib[name]
+                elif name in PATH_ATTRIBUTES:
+                    node.set(name, shorten_path(value, precision))
+                elif name in NUMERIC_ATTRIBUTES:
+                    node.set(name, round_numbers(value, precision).strip())
+                elif name == "style":
+                    style = shorten_style(value, precision)
+                    if style:
+                        node.set(name, style)
+                    else:
+                        del node.attrib[name]
+
+        remove_unused_defs(root)
+
+        # Indentation whitespace, text elements keep it
+        for node in root.iter(tag=etree.Element):
+            if node.tag not in TEXT_ELEMENTS:
+                if node.text is not None and not node.text.strip():
+                    node.text = None
+                for child in node:
+                    if child.tail is not None and not child.tail.strip():
+                        child.tail = None
+        root.tail = None
+
+        etree.cleanup_namespaces(root)
+        return root
+
+    def record(self, original, optimized):
+        """
+        Add an element written sizes to the report
+
+        Arguments:
+            original (int): bytes without optimizing
+            optimized (int): bytes written
+        """
+        self.elements += 1
+        self.original += original
+        self.optimized += optimized
+
+    def report(self):
+        """
+        Returns:
+            OptimizeReport: elements optimized, bytes they would have
+                used without optimizing, bytes written and bytes saved.
+                Nothing is recorded when measure is disabled.
+        """
+        return OptimizeReport(self.elements, self.original, self.optimized,
+                self.original-self.optimized)
@@ -0,0 +1,170 @@
+from math import floor
+
+DEFAULT_CELL_SIZE = 256
+
+
+def boxes_overlap(a, b):
+    """
+    Returns True if boxes overlap, boxes only touching don't.
+
+    Arguments:
+        a (tuple): (min_x, min_y, max_x, max_y)
+        b (tuple): (min_x, min_y, max_x, max_y)
+    """
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class GridIndex(object):
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        """
+        Uniform grid spatial index of bounding boxes. Each box is stored
+        in every cell it covers, so queries only check the boxes sharing
+        cells with the query box instead of all of them.
+
+        Arguments:
+            cell_size (Number): grid cell width and height, performs best
+                when similar to the size of the boxes stored.
+        """
+        assert(cell_size > 0)
+        self.cell_size = cell_size
+        self._cells = {}
+        self._boxes = {}
+
+    def __len__(self):
+        return len(self._boxes)
+
+    def __contains__(self, key):
+        return key in self._boxes
+
+    def _cell_range(self, box):
+        size = self.cell_size
+        return (int(floor(box[0]/size)), int(floor(box[1]/size)),
+                int(floor(box[2]/size)), int(floor(box[3]/size)))
+
+    def _cell_keys(self, box):
+        min_x, min_y, max_x, max_y = self._cell_range(box)
+        for cx in range(min_x, max_x+1):
+            for cy in range(min_y, max_y+1):
+                yield cx, cy
+
+    def insert(self, key, box):
+        """
+        Add box to the index
+
+        Arguments:
+            key (hashable): box identifier
+            box (tuple): (min_x, min_y, max_x, max_y)
+        """
+        if key in self._boxes:
+            self.remove(key)
+
+        self._boxes[key] = box
+        for cell in self._cell_keys(box):
+            self._cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        """
+        Remove box from the index
+
+        Arguments:
+            key (hashable): box identifier
+        """
+        box = self._boxes.pop(key)
+        for cell in self._cell_keys(box):
+            keys = self._cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self._cells[cell]
+
+    def box(self, key):
+        return self._boxes[key]
+
+    def query(self, box):
+        """
+        Find boxes overlapping a box
+
+        Arguments:
+            box (tuple): (min_x, min_y, max_x, max_y)
+
+        Returns:
+            set: keys of the boxes overlapping
+        """
+        min_x, min_y, max_x, max_y = self._cell_range(box)
+
+        # Checking every box is cheaper than visiting every cell
+        if (max_x-min_x+1)*(max_y-min_y+1) > len(self._boxes):
+            return {k for k, b in self._boxes.items()
+                    if boxes_overlap(box, b)}
+
+        candidates = set()
+        cells = self._cells
+        for cx in range(min_x, max_x+1):
+            for cy in range(min_y, max_y+1):
+                keys = cells.get((cx, cy))
+                if keys:
+                    candidates.update(keys)
+
+        boxes = self._boxes
+        return {k for k in candidates if boxes_overlap(box, boxes[k])}
+
+    def intersects(self, box):
+        """
+        Returns True if any box in the index overlaps box
+
+        Arguments:
+            box (tuple): (min_x, min_y, max_x, max_y)
+        """
+        min_x, min_y, max_x, max_y = self._cell_range(box)
+        if (max_x-min_x+1)*(max_y-min_y+1) > len(self._boxes):
+            return any(boxes_overlap(box, b) for b in self._boxes.values())
+
+        cells, boxes = self._cells, self._boxes
+        for cx in range(min_x, max_x+1):
+            for cy in range(min_y, max_y+1):
+                for key in cells.get((cx, cy), ()):
+                    if boxes_overlap(box, boxes[key]):
+                        return True
+        return False
+
+    def free_position(self, width, height, bounds, x=0, y=0):
+        """
+        Find the position nearest to (x, y) where a box of the given size
+        doesn't overlap any other. Candidate positions are the target
+        itself, and the bounds corner and box edges where a new box
+        would be touching others.
+
+        Arguments:
+            width (Number): box width
+            height (Number): box height
+            bounds (tuple): (min_x, min_y, max_x, max_y) area where the
+                box must be contained.
+            x (Number): target x coordinate
+            y (Number): target y coordinate
+
+        Returns:
+            (Number, Number)|None: box position, or None if there isn't
+                free space for it.
+        """
+        candidates = {(x, y), (bounds[0], bounds[1])}
+        for b in self._boxes.values():
+            candidates.add((b[2], b[1]))
+            candidates.add((b[0], b[3]))
+            candidates.add((b[2], bounds[1]))
+            candidates.add((bounds[0], b[3]))
+            candidates.add((b[2], b[3]))
+
+        # Nearest first, ties resolved top to bottom and left to right
+        def distance(position):
+            return ((position[0]-x)**2+(position[1]-y)**2,
+                    position[1], position[0])
+
+        for cx, cy in sorted(candidates, key=distance):
+            box = (cx, cy, cx+width, cy+height)
+            if box[0] < bounds[0] or box[1] < bounds[1] or \
+                    box[2] > bounds[2] or box[3] > bounds[3]:
+                continue
+            if not self.intersects(box):
+                return cx, cy
+
+        return None
@@ -0,0 +1,144 @@
+import re
+
+from .compression import open_source
+
+
+# Text placed inside the svg shell of a part, replaced by the part svg
+# once the shell is serialized. Private use characters never appear in
+# the output written by svgmapper.
+SPLICE_MARKER = u"\ue000svgmapper-splice\ue000"
+_MARKER = (u">"+SPLICE_MARKER+u"<").encode('utf-8')
+_MARKER_RE = re.compile(re.escape(_MARKER))
+
+UTF8_BOM = b'\xef\xbb\xbf'
+
+# Encodings that can be copied into the UTF-8 output as they are
+SPLICE_ENCODINGS = (b'utf-8', b'utf8', b'us-ascii', b'ascii')
+
+ENCODING_RE = re.compile(br'\sencoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+
+# Anything that may be an id attribute, false positives only cost a
+# fallback to the parsed tree.
+ID_ATTRIBUTE_RE = re.compile(br'\s(?:[\w.-]+:)?id\s*=')
+
+WHITESPACE = b' \t\r\n'
+
+
+def read_source(source):
+    """
+    Read svg source content
+
+    Arguments:
+        source (bytes|str): svg content, or path to a (maybe compressed)
+            svg file.
+
+    Returns:
+        bytes
+    """
+    if isinstance(source, bytes):
+        return source
+    with open_source(source) as f:
+        return f.read()
+
+
+def source_body(data):
+    """
+    Find the root element of a svg document, skipping the prolog (xml
+    declaration, doctype, comments and processing instructions) and
+    whatever follows the root element, without parsing it.
+
+    Arguments:
+        data (bytes): svg document
+
+    Returns:
+        memoryview|None: root element bytes, or None when they can't be
+            copied into another document as they are (encodings other
+            than UTF-8, doctype internal subsets, malformed prolog).
+    """
+    start, end = 0, len(data)
+    if data.startswith(UTF8_BOM):
+        start = len(UTF8_BOM)
+
+    while True:
+        while start < end and data[start] in WHITESPACE:
+            start += 1
+
+        if data.startswith(b'<?', start):
+            close = data.find(b'?>', start)
+            if close == -1:
+                return None
+            if data.startswith(b'<?xml', start) and \
+                    data[start+5:start+6] in (b' ', b'\t', b'\r', b'\n'):
+                encoding = ENCODING_RE.search(data, start, close)
+                if encoding and encoding.group(1).lower() not in \
+                        SPLICE_ENCODINGS:
+                    return None
+            start = close+2
+        elif data.startswith(b'<!--', start):
+            close = data.find(b'-->', start+4)
+            if close == -1:
+                return None
+            start = close+3
+        elif data.startswith(b'<!DOCTYPE', start):
+            # Internal subsets may declare entities used by the svg
+            close = data.find(b'>', start)
+            if close == -1 or data.find(b'[', start, close) != -1:
+                return None
+            start = close+1
+        elif data.startswith(b'<', start):
+            break
+        else:
+            return None
+
+    while True:
+        while end > start and data[end-1] in WHITESPACE:
+            end -= 1
+
+        if data.endswith(b'-->', start, end):
+            end = data.rfind(b'<!--', start, end)
+        elif data.endswith(b'?>', start, end):
+            end = data.rfind(b'<?', start, end)
+        else:
+            break
+
+        if end <= start:
+            return None
+
+    if not data.endswith(b'>', start, end):
+        return None
+    return memoryview(data)[start:end]
+
+
+def has_id_attributes(body):
+    """
+    Arguments:
+        body (bytes|memoryview): svg root element bytes
+
+    Returns:
+        bool: True when there may be id attributes in the svg
+    """
+    return ID_ATTRIBUTE_RE.search(body) is not None
+
+
+def splice_fragment(fragment, body):
+    """
+    Replace the marker inside a serialized part shell with the part svg
+
+    Arguments:
+        fragment (list): serialized part group chunks, with a
+            SPLICE_MARKER, see SVGStreamWriter.tostring
+        body (bytes|memoryview): svg root element bytes
+
+    Returns:
+        list: fragment chunks, the body is not copied
+    """
+    match = None
+    for i, chunk in enumerate(fragment):
+        match = _MARKER_RE.search(chunk)
+        if match is not None:
+            break
+    assert(match is not None)
+
+    chunk, position = memoryview(chunk), match.start()
+    return fragment[:i]+[chunk[:position+1], body,
+            chunk[position+len(_MARKER)-1:]]
@@ -0,0 +1,282 @@
+from array import array
+
+from .transform import rotation_angle, rotated_size
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class PartTable(object):
+
+    def __init__(self):
+        """
+        Columnar store of the parts placed on a mapper.
+
+        Each placement is a row of x, y, rotation (degrees), and index of
+        its source, stored in compact arrays. Sources are the distinct
+        parts (content plus scale) placed, so parts placed many times
+        keep a single svg tree. uids are kept in a list, as most of them
+        are usually None.
+        """
+        self.x = array('d')
+        self.y = array('d')
+        self.rotation = array('d')
+        self.source = array('q')
+        self.uids = []
+
+        # Distinct parts, and source position for each part key
+        self.sources = []
+        self._source_keys = {}
+
+        # First position of each uid, built on first use
+        self._uid_positions = None
+
+    def __len__(self):
+        return len(self.source)
+
+    def __bool__(self):
+        return len(self.source) > 0
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, i):
+        """
+        Returns:
+            (SVGPart, Number, Number, str|None): part source, x, y and uid
+        """
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return self.sources[self.source[i]], self.x[i], self.y[i], \
+                self.uids[i]
+
+    def __iter__(self):
+        sources, x, y, uids = self.sources, self.x, self.y, self.uids
+        for i, source in enumerate(self.source):
+            yield sources[source], x[i], y[i], uids[i]
+
+    def find_source(self, key):
+        """
+        Find the source for a part key (see SVGPart.part_key)
+
+        Returns:
+            SVGPart|None: source, or None if there isn't any
+        """
+        position = self._source_keys.get(key)
+        if position is None:
+            return None
+        return self.sources[position]
+
+    def add_source(self, part):
+        """
+        Find the source for a part, parts with the same content and scale
+        share the first of them added.
+
+        Arguments:
+            part (SVGPart): part
+
+        Returns:
+            int: source position
+        """
+        key = part.part_key()
+        if key is not None:
+            position = self._source_keys.get(key)
+            if position is not None:
+                return position
+            self._source_keys[key] = len(self.sources)
+
+        self.sources.append(part)
+        return len(self.sources)-1
+
+    def append(self, part, x, y, uid=None, rotation=None):
+        """
+        Add a placement
+
+        Arguments:
+            part (SVGPart): placed part
+            x (Number): part x position
+            y (Number): part y position
+            uid (str|None): part uid
+            rotation (Number|None): rotation in degrees, or None to use
+                part rotation.
+        """
+        if rotation is None:
+            rotation = rotation_angle(part.rotate)
+        self.source.append(self.add_source(part))
+        self.x.append(x)
+        self.y.append(y)
+        self.rotation.append(rotation)
+        self.uids.append(uid)
+
+        positions = self._uid_positions
+        if positions is not None and uid is not None and \
+                uid not in positions:
+            positions[uid] = len(self.uids)-1
+
+    def update(self, i, x=None, y=None, rotation=None, source=None,
+            uid=None):
+        """
+        Change a placement, only the values given are changed
+
+        Arguments:
+            i (int): placement position
+            x (Number|None): new x position
+            y (Number|None): new y position
+            rotation (Number|None): new rotation in degrees
+            source (int|None): new source position
+            uid (str|None): new uid
+        """
+        if x is not None:
+            self.x[i] = x
+        if y is not None:
+            self.y[i] = y
+        if rotation is not None:
+            self.rotation[i] = rotation
+        if source is not None:
+            self.source[i] = source
+        if uid is not None:
+            self.uids[i] = uid
+            self._uid_positions = None
+
+    def pop(self, i):
+        """
+        Remove a placement
+
+        Returns:
+            (SVGPart, Number, Number, str|None): part source, x, y and uid
+        """
+        entry = self[i]
+        for column in (self.x, self.y, self.rotation, self.source):
+            del column[i]
+        del self.uids[i]
+        # Following positions changed
+        self._uid_positions = None
+        return entry
+
+    def uid_positions(self):
+        """
+        Returns:
+            dict: first placement position for each uid, built once and
+                kept up to date as placements are appended. Don't modify
+                it.
+        """
+        if self._uid_positions is None:
+            positions = {}
+            for i, uid in enumerate(self.uids):
+                if uid is not None and uid not in positions:
+                    positions[uid] = i
+            self._uid_positions = positions
+        return self._uid_positions
+
+    def find_uid(self, uid):
+        """
+        Returns:
+            int|None: position of the first placement with a uid, or None
+                if there isn't any.
+        """
+        return self.uid_positions().get(uid)
+
+    def row(self, i):
+        """
+        Returns:
+            tuple: (source, x, y, rotation, uid) placement values, rows
+                with the same values generate the same output.
+        """
+        return (self.source[i], self.x[i], self.y[i], self.rotation[i],
+                self.uids[i])
+
+    def rows(self):
+        return zip(self.source, self.x, self.y, self.rotation, self.uids)
+
+    def part(self, i):
+        """
+        Returns:
+            SVGPart: placement part source
+        """
+        return self.sources[self.source[i]]
+
+    def placed_size(self, i):
+        """
+        Returns:
+            (Number, Number): placement bounding box size without margins
+        """
+        part = self.sources[self.source[i]]
+        return rotated_size(part.scaled_width, part.scaled_height,
+                self.rotation[i])
+
+    def bounding_boxes(self, margin_width=0):
+        """
+        Bounding boxes of all the placements, margins included, computed
+        in a single vectorized pass when numpy is available.
+
+        Arguments:
+            margin_width (Number): margin around each part
+
+        Returns:
+            (sequence, sequence, sequence, sequence): min_x, min_y,
+                max_x and max_y columns
+        """
+        widths = [p.scaled_width for p in self.sources]
+        heights = [p.scaled_height for p in self.sources]
+        margins = 2*margin_width
+
+        if numpy is None:
+            boxes = [(x, y, x+w+margins, y+h+margins) for x, y, (w, h) in
+                    zip(self.x, self.y, (self.placed_size(i)
+                        for i in range(len(self))))]
+            if not boxes:
+                return [], [], [], []
+            return tuple(list(column) for column in zip(*boxes))
+
+        # Columns are viewed without copying, only x and y are copied
+        # as they are returned, the views would lock the arrays size.
+        source = numpy.frombuffer(self.source, dtype=numpy.int64)
+        x, y = numpy.array(self.x), numpy.array(self.y)
+        rotation = numpy.frombuffer(self.rotation)
+
+        width = numpy.asarray(widths, dtype=float)[source]
+        height = numpy.asarray(heights, dtype=float)[source]
+        placed_width, placed_height = rotated_sizes(width, height, rotation)
+        return (x, y, x+placed_width+margins, y+placed_height+margins)
+
+    def used_area(self, margin_width=0):
+        """
+        Returns:
+            Number: area covered by all the placements bounding boxes,
+                margins included, overlapping areas are counted twice.
+        """
+        min_x, min_y, max_x, max_y = self.bounding_boxes(margin_width)
+        if numpy is not None:
+            return float(((max_x-min_x)*(max_y-min_y)).sum())
+        return sum((x2-x1)*(y2-y1) for x1, y1, x2, y2 in
+                zip(min_x, min_y, max_x, max_y))
+
+
+def rotated_sizes(width, height, rotation):
+    """
+    Vectorized rotated_size, multiples of 90 degrees are exact
+
+    Arguments:
+        width (numpy.ndarray): rectangle widths
+        height (numpy.ndarray): rectangle heights
+        rotation (numpy.ndarray): rotation in degrees
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): bounding box widths and heights
+    """
+    # Right angles only swap sides, avoiding trigonometry and its
+    # rounding errors
+    right = numpy.mod(rotation, 90) == 0
+    if right.all():
+        odd = numpy.mod(rotation, 180) != 0
+        return numpy.where(odd, height, width), numpy.where(odd, width, height)
+
+    radians = numpy.radians(rotation)
+    cos, sin = numpy.abs(numpy.cos(radians)), numpy.abs(numpy.sin(radians))
+    if right.any():
+        odd = numpy.mod(rotation, 180) != 0
+        cos = numpy.where(right, numpy.where(odd, 0.0, 1.0), cos)
+        sin = numpy.where(right, numpy.where(odd, 1.0, 0.0), sin)
+
+    return width*cos+height*sin, width*sin+height*cos
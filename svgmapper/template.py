@@ -0,0 +1,738 @@
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+from functools import partial
+from numbers import Number
+from xml.sax.saxutils import escape, unescape
+import ast
+import json
+import os
+import re
+import threading
+
+from lxml import etree
+from .cache import CacheInfo
+from .mapper import SVGPart
+from .transform import SVGFigure, SVG, format_number, DEFAULT_SVG_DPI
+from .utils import (parse_svg, parse_svg_file, element_dimensions,
+        svg_dimensions, content_digest, DIMENSIONS_ERROR_MSG)
+
+# Namespace of the template attributes
+TEMPLATE_NAMESPACE = "https://github.com/secnot/svgmapper/template"
+
+# Element attribute with the number of times the element is repeated,
+# and the name of the repetition index (i by default).
+REPEAT = "{%s}repeat" % TEMPLATE_NAMESPACE
+INDEX = "{%s}index" % TEMPLATE_NAMESPACE
+DEFAULT_INDEX = "i"
+
+# Max number of rendered variants remembered by each template
+DEFAULT_TEMPLATE_VARIANTS = 4096
+
+# Extension of the schema file next to each template file
+SCHEMA_EXTENSION = ".schm"
+
+# Placeholders in attributes and text, and the markers left where
+# repeated elements were while compiling.
+PLACEHOLDER_RE = re.compile(r"\{\{(.*?)\}\}|<\?svgmapper-repeat (\d+)\?>",
+        re.DOTALL)
+REPEAT_MARKER = "svgmapper-repeat"
+
+# Functions available to template expressions
+FUNCTIONS = {'min': min, 'max': max, 'abs': abs, 'round': round,
+        'int': int, 'float': float}
+
+EXPRESSION_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+        ast.Name, ast.Load, ast.Call, ast.Add, ast.Sub, ast.Mult, ast.Div,
+        ast.FloorDiv, ast.Mod, ast.Pow, ast.USub, ast.UAdd, ast.Compare,
+        ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# Root attributes the template dimensions are resolved from
+DIMENSION_ATTRIBUTES = ('width', 'height', 'viewBox', 'font-size')
+
+# Schema keywords without effect on validation
+SCHEMA_ANNOTATIONS = frozenset(['$schema', '$id', '$comment', 'title',
+    'description', 'examples'])
+
+SCHEMA_KEYWORDS = SCHEMA_ANNOTATIONS | frozenset(['type', 'properties',
+    'required', 'additionalProperties'])
+
+PROPERTY_KEYWORDS = SCHEMA_ANNOTATIONS | frozenset(['type', 'enum', 'const',
+    'minimum', 'maximum', 'exclusiveMinimum', 'exclusiveMaximum',
+    'multipleOf', 'default'])
+
+_MISSING = object()
+
+
+# Rendered template, svg is its content and width and height its size in
+# px, digest the content hash.
+Variant = namedtuple('Variant', ['svg', 'width', 'height', 'digest'])
+
+
+def _is_number(value):
+    return isinstance(value, Number) and not isinstance(value, bool)
+
+
+def _is_integer(value):
+    return _is_number(value) and float(value).is_integer()
+
+
+def _same_value(a, b):
+    """JSON values equality, booleans are not numbers"""
+    if isinstance(a, bool) or isinstance(b, bool):
+        return a is b
+    return a == b
+
+
+SCHEMA_TYPES = {
+    'number': _is_number,
+    'integer': _is_integer,
+    'boolean': lambda value: isinstance(value, bool),
+    'string': lambda value: isinstance(value, str),
+}
+
+
+def format_value(value):
+    """
+    Format a parameter or expression value for the svg
+
+    Arguments:
+        value (Number|bool|str): value
+
+    Returns:
+        str: escaped value
+    """
+    kind = type(value)
+    if kind is int:
+        return str(value)
+    if kind is bool:
+        return 'true' if value else 'false'
+    if kind is float or isinstance(value, Number):
+        return format_number(value)
+    return escape(str(value), {'"': '&quot;', "'": '&apos;'})
+
+
+class TemplateSchema(object):
+
+    def __init__(self, schema):
+        """
+        Template parameters schema, a JSON schema object with a property
+        for each parameter. Only the type, enum, const, minimum, maximum,
+        exclusiveMinimum, exclusiveMaximum, multipleOf and default
+        property keywords are supported, and the schema is compiled into
+        a list of checks for each parameter.
+
+        Arguments:
+            schema (dict): JSON schema
+
+        Raises:
+            ValueError: for invalid or unsupported schemas
+        """
+        if not isinstance(schema, dict):
+            raise ValueError("Template schema must be an object")
+        _check_keywords(schema, SCHEMA_KEYWORDS, "schema")
+        if schema.get('type', 'object') != 'object':
+            raise ValueError("Template schema type must be object")
+
+        properties = schema.get('properties', {})
+        self.required = frozenset(schema.get('required', ()))
+        self.additional = schema.get('additionalProperties', True)
+        if not isinstance(self.additional, bool):
+            raise ValueError("Unsupported additionalProperties schema")
+
+        self.names = frozenset(properties)
+        missing = self.required-self.names
+        if missing:
+            raise ValueError("Required parameters without property: {}"
+                    .format(", ".join(sorted(missing))))
+
+        self._properties = []
+        for name, prop in properties.items():
+            checks = _property_checks(name, prop)
+            default = prop.get('default', _MISSING)
+            if default is not _MISSING:
+                for check in checks:
+                    check(default)
+            self._properties.append((name, checks, default))
+
+    def validate(self, params):
+        """
+        Check parameters against the schema
+
+        Arguments:
+            params (dict): parameter values
+
+        Returns:
+            dict: parameter values, with defaults for those missing
+
+        Raises:
+            ValueError: when any parameter is invalid or missing
+        """
+        values = {}
+        for name, checks, default in self._properties:
+            value = params.get(name, _MISSING)
+            if value is _MISSING:
+                if default is _MISSING:
+                    if name in self.required:
+                        raise ValueError("Missing template parameter '{}'"
+                                .format(name))
+                    continue
+                value = default
+            else:
+                for check in checks:
+                    check(value)
+            values[name] = value
+
+        if len(values) != len(params) or not self.additional:
+            unknown = set(params)-self.names
+            if unknown and not self.additional:
+                raise ValueError("Unknown template parameters: {}".format(
+                    ", ".join(sorted(unknown))))
+            for name in unknown:
+                values[name] = params[name]
+        return values
+
+
+def _check_keywords(schema, allowed, context):
+    unsupported = set(schema)-allowed
+    if unsupported:
+        raise ValueError("Unsupported {} keywords: {}".format(context,
+            ", ".join(sorted(unsupported))))
+
+
+def _property_checks(name, prop):
+    """
+    Compile a schema property into a list of checks, each raising
+    ValueError for invalid values.
+    """
+    if not isinstance(prop, dict):
+        raise ValueError("Invalid schema for parameter '{}'".format(name))
+    _check_keywords(prop, PROPERTY_KEYWORDS, "'{}' property".format(name))
+
+    def fail(value, reason):
+        raise ValueError("Invalid template parameter '{}'={!r}, {}".format(
+            name, value, reason))
+
+    checks = []
+    if 'type' in prop:
+        types = prop['type']
+        types = [types] if isinstance(types, str) else list(types)
+        try:
+            tests = [SCHEMA_TYPES[t] for t in types]
+        except KeyError as e:
+            raise ValueError("Unsupported schema type {}".format(e))
+
+        def check_type(value):
+            if not any(test(value) for test in tests):
+                fail(value, "must be {}".format(" or ".join(types)))
+        checks.append(check_type)
+
+    if 'enum' in prop:
+        enum = list(prop['enum'])
+        def check_enum(value):
+            if not any(_same_value(value, e) for e in enum):
+                fail(value, "must be one of {}".format(enum))
+        checks.append(check_enum)
+
+    if 'const' in prop:
+        const = prop['const']
+        def check_const(value):
+            if not _same_value(value, const):
+                fail(value, "must be {!r}".format(const))
+        checks.append(check_const)
+
+    bounds = (('minimum', lambda v, b: v >= b, "at least"),
+              ('maximum', lambda v, b: v <= b, "at most"),
+              ('exclusiveMinimum', lambda v, b: v > b, "greater than"),
+              ('exclusiveMaximum', lambda v, b: v < b, "less than"))
+    for keyword, test, reason in bounds:
+        if keyword in prop:
+            bound = prop[keyword]
+            def check_bound(value, bound=bound, test=test, reason=reason):
+                if _is_number(value) and not test(value, bound):
+                    fail(value, "must be {} {}".format(reason, bound))
+            checks.append(check_bound)
+
+    if 'multipleOf' in prop:
+        multiple = prop['multipleOf']
+        def check_multiple(value):
+            if _is_number(value) and not float(value/multiple).is_integer():
+                fail(value, "must be multiple of {}".format(multiple))
+        checks.append(check_multiple)
+
+    return checks
+
+
+def load_schema(path):
+    """
+    Arguments:
+        path (str): JSON schema file path
+
+    Returns:
+        TemplateSchema
+    """
+    try:
+        with open(path) as f:
+            schema = json.load(f)
+    except ValueError as e:
+        raise ValueError("Invalid template schema {}: {}".format(path, e))
+    return TemplateSchema(schema)
+
+
+def compile_expression(text, names=None):
+    """
+    Check a template expression only uses numbers, parameters, arithmetic
+    and comparison operators, and FUNCTIONS.
+
+    Arguments:
+        text (str): expression
+        names (set|None): names available, or None for any
+
+    Returns:
+        (str, set): normalized expression source, and names used
+
+    Raises:
+        ValueError: for invalid expressions or unknown names
+    """
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError:
+        raise ValueError("Invalid template expression '{}'".format(text))
+
+    functions, used = set(), set()
+    for node in ast.walk(tree):
+        if not isinstance(node, EXPRESSION_NODES):
+            raise ValueError("Invalid template expression '{}'".format(text))
+        if isinstance(node, ast.Constant) and not _is_number(node.value):
+            raise ValueError("Invalid template expression '{}'".format(text))
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.keywords or \
+                    node.func.id not in FUNCTIONS:
+                raise ValueError("Invalid template expression '{}'".format(
+                    text))
+            functions.add(id(node.func))
+        elif isinstance(node, ast.Name) and id(node) not in functions:
+            if node.id.startswith('_') or \
+                    (names is not None and node.id not in names):
+                raise ValueError("Unknown template parameter '{}'".format(
+                    node.id))
+            used.add(node.id)
+
+    return ast.unparse(tree.body), used
+
+
+class Template(object):
+
+    def __init__(self, svg, schema=None,
+            max_variants=DEFAULT_TEMPLATE_VARIANTS):
+        """
+        Parametric svg, compiled once into a renderer producing the svg
+        for each set of parameter values without parsing it.
+
+        Attribute values and text can hold {{expression}} placeholders,
+        using the parameters, numbers, arithmetic operators and min, max,
+        abs, round, int and float. Elements with a t:repeat="expression"
+        attribute (t being the TEMPLATE_NAMESPACE) are repeated that
+        many times, with the repetition index available as i (or the
+        name given with t:index).
+
+        Arguments:
+            svg (bytes|SVGFigure): template content, or parsed template
+            schema (dict|TemplateSchema|None): parameters JSON schema, or
+                None to accept any parameters.
+            max_variants (int): Max number of rendered variants kept
+
+        Raises:
+            ValueError: for invalid templates, expressions or schemas
+        """
+        if isinstance(svg, SVGFigure):
+            root = svg.root
+        else:
+            try:
+                root = parse_svg(svg)
+            except etree.XMLSyntaxError:
+                raise ValueError(DIMENSIONS_ERROR_MSG)
+
+        if isinstance(schema, dict):
+            schema = TemplateSchema(schema)
+        self.schema = schema
+        self.max_variants = max_variants
+
+        names = None if schema is None else set(schema.names)
+        self.parameters, self._render = _compile_renderer(root, names)
+        self._dimensions = _compile_dimensions(root, names)
+
+        self._variants = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def fromfile(cls, path, schema=None, **kwargs):
+        """
+        Load a template file, and its schema
+
+        Arguments:
+            path (str): template svg path
+            schema (dict|str|TemplateSchema|None): schema, path to the
+                schema file, or None to load the .schm file with the same
+                name as the template when there is one.
+        """
+        if schema is None:
+            default = os.path.splitext(path)[0]+SCHEMA_EXTENSION
+            if os.path.exists(default):
+                schema = default
+        if isinstance(schema, str):
+            schema = load_schema(schema)
+
+        try:
+            figure = SVGFigure()
+            figure.root = parse_svg_file(path)
+        except etree.XMLSyntaxError:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
+        return cls(figure, schema, **kwargs)
+
+    def validate(self, params=None):
+        """
+        Arguments:
+            params (dict|None): parameter values
+
+        Returns:
+            dict: validated parameter values, defaults included
+
+        Raises:
+            ValueError: for invalid or missing parameters
+        """
+        params = params or {}
+        if self.schema is not None:
+            params = self.schema.validate(params)
+
+        missing = self.parameters.difference(params)
+        if missing:
+            raise ValueError("Missing template parameters: {}".format(
+                ", ".join(sorted(missing))))
+        return params
+
+    def render(self, params=None):
+        """
+        Arguments:
+            params (dict|None): parameter values
+
+        Returns:
+            bytes: svg for the parameters
+        """
+        return self._render(self.validate(params)).encode('utf-8')
+
+    def variant(self, params=None, dpi=DEFAULT_SVG_DPI):
+        """
+        Render the template for some parameters, variants already
+        rendered are remembered.
+
+        Arguments:
+            params (dict|None): parameter values
+            dpi (Number): dpi used to resolve the svg dimensions
+
+        Returns:
+            Variant
+
+        Raises:
+            ValueError: for invalid or missing parameters
+        """
+        params = params or {}
+        # Values are part of the variants key
+        for name, value in params.items():
+            try:
+                hash(value)
+            except TypeError:
+                raise ValueError("Invalid value for template parameter "
+                        "'{}', {} values are not supported".format(name,
+                            type(value).__name__))
+        key = (dpi,)+tuple(sorted((name, type(value), value)
+            for name, value in params.items()))
+
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None:
+                self._variants.move_to_end(key)
+                self.hits += 1
+                return variant
+
+        values = self.validate(params)
+        svg = self._render(values).encode('utf-8')
+        width, height = self._dimensions(values, svg, dpi)
+        if not width or not height:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
+        variant = Variant(svg, width, height, content_digest(svg))
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._variants:
+                self._variants[key] = variant
+                self._bytes += len(svg)
+            while len(self._variants) > self.max_variants:
+                _, evicted = self._variants.popitem(last=False)
+                self._bytes -= len(evicted.svg)
+                self.evictions += 1
+        return variant
+
+    def part(self, params=None, dpi=DEFAULT_SVG_DPI, **kwargs):
+        """
+        Create the part for some parameters, with the dimensions of the
+        rendered variant. The svg is only parsed when the part is output
+        (never when spliced), see SVGPart.lazy.
+
+        Arguments:
+            params (dict|None): parameter values
+            dpi (Number): dpi used to resolve the svg dimensions
+            scaled_width (number|None): svg image new width, None to use
+                original
+            scaled_height (number|None): svg image new height, None to use
+                original
+            rotate (bool|Number): rotation
+
+        Returns:
+            SVGPart
+        """
+        variant = self.variant(params, dpi)
+        return SVGPart(None, variant.width, variant.height, dpi=dpi,
+                digest=variant.digest, source=variant.svg,
+                loader=partial(SVGFigure.fromstring, variant.svg), **kwargs)
+
+    def info(self):
+        """
+        Returns:
+            CacheInfo: variants cache statistics
+        """
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions,
+                    len(self._variants), self._bytes)
+
+    def clear(self):
+        """Forget rendered variants"""
+        with self._lock:
+            self._variants.clear()
+            self._bytes = 0
+
+
+def _compile_renderer(root, names):
+    """
+    Compile a template into a python function returning its svg for the
+    parameter values. Repeated elements are serialized on their own and
+    replaced by markers, then the serialized template is split at each
+    placeholder and marker, and the pieces turned into code.
+
+    Returns:
+        (frozenset, callable): parameters used, and renderer
+    """
+    root = deepcopy(root)
+    _, repeats = _serialize(root, root, _declarations(root))
+    for element in root.iter():
+        for attribute in (REPEAT, INDEX):
+            element.attrib.pop(attribute, None)
+    etree.cleanup_namespaces(root)
+
+    compiler = _Compiler(names)
+    compiler.add((etree.tostring(root, encoding='unicode'), repeats))
+    return frozenset(compiler.used), compiler.function()
+
+
+def _declarations(root):
+    """Namespace declarations of the template root, as serialized"""
+    declarations = []
+    for prefix, namespace in root.nsmap.items():
+        if prefix is None:
+            declarations.append(' xmlns="{}"'.format(namespace))
+        else:
+            declarations.append(' xmlns:{}="{}"'.format(prefix, namespace))
+    return declarations
+
+
+def _serialize(element, root, declarations):
+    """
+    Serialize an element replacing its repeated descendants by markers,
+    repeated elements are serialized first (without the template root
+    namespace declarations).
+
+    Returns:
+        (str, list): element text (None for the root, serialized once
+            cleaned), and (count, index, template) for each repeated
+            element, in marker order.
+    """
+    repeats = []
+
+    def replace(parent):
+        for child in list(parent):
+            if not isinstance(child.tag, str):
+                continue
+            if child.get(REPEAT) is None:
+                replace(child)
+                continue
+
+            count = child.attrib.pop(REPEAT)
+            index = child.attrib.pop(INDEX, DEFAULT_INDEX)
+            repeats.append((count, index, _serialize(child, root,
+                declarations)))
+
+            marker = etree.ProcessingInstruction(REPEAT_MARKER,
+                    str(len(repeats)-1))
+            marker.tail = child.tail
+            parent.replace(child, marker)
+
+    replace(element)
+    if element is root:
+        return None, repeats
+
+    text = etree.tostring(element, encoding='unicode', with_tail=False)
+    end = text.find('>')
+    start, rest = text[:end], text[end:]
+    for declaration in declarations:
+        start = start.replace(declaration, '', 1)
+    return start+rest, repeats
+
+
+class _Compiler(object):
+
+    def __init__(self, names):
+        """
+        Generate the code of a template renderer. Expressions that don't
+        depend on any repetition index are evaluated and formatted once
+        at the start.
+
+        Arguments:
+            names (set|None): parameter names, None for any
+        """
+        self.names = names
+        self.used = set()
+        self.lines = []
+        self._constants = {}
+        self._constant_lines = []
+
+    def add(self, template, indexes=frozenset(), depth=1):
+        """
+        Add the code rendering a serialized template
+
+        Arguments:
+            template (tuple): text and repeated elements, see _serialize
+            indexes (frozenset): repetition indexes in scope
+            depth (int): code indentation level
+        """
+        text, repeats = template
+        indent = "    "*depth
+        position = 0
+        for match in PLACEHOLDER_RE.finditer(text):
+            if match.start() > position:
+                self.lines.append(indent+"_append({!r})".format(
+                    text[position:match.start()]))
+            position = match.end()
+
+            if match.group(2) is None:
+                # Comparisons are escaped in the serialized template
+                self.lines.append(indent+"_append({})".format(
+                    self.value(unescape(match.group(1)), indexes)))
+                continue
+
+            count, index, repeated = repeats[int(match.group(2))]
+            if not index.isidentifier() or index.startswith('_'):
+                raise ValueError("Invalid template index '{}'".format(index))
+            count, _ = self.expression(count, indexes)
+            self.lines.append(indent+"for _{} in _range(_int({})):".format(
+                index, count))
+            self.add(repeated, indexes | {index}, depth+1)
+
+        if position < len(text):
+            self.lines.append(indent+"_append({!r})".format(text[position:]))
+
+    def value(self, text, indexes):
+        """Code for the formatted value of an expression"""
+        source, constant = self.expression(text, indexes)
+        if not constant:
+            return "_format({})".format(source)
+
+        name = self._constants.get(source)
+        if name is None:
+            name = "_c{}".format(len(self._constants))
+            self._constants[source] = name
+            self._constant_lines.append("    {} = _format({})".format(name,
+                source))
+        return name
+
+    def expression(self, text, indexes):
+        """
+        Compile an expression into code, see compile_expression
+
+        Returns:
+            (str, bool): code, and True when it doesn't use any index
+        """
+        available = None if self.names is None else self.names | indexes
+        source, referenced = compile_expression(text, available)
+        self.used.update(referenced-indexes)
+
+        # Parameters and indexes are local variables prefixed with _ so
+        # they can't clash with the renderer variables or functions.
+        tree = ast.parse(source, mode='eval')
+        functions = set(id(node.func) for node in ast.walk(tree)
+                if isinstance(node, ast.Call))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and id(node) not in functions:
+                node.id = "_"+node.id
+        return "("+ast.unparse(tree.body)+")", not (referenced & indexes)
+
+    def function(self):
+        """
+        Returns:
+            callable: renderer, taking a dict of parameter values and
+                returning the rendered text.
+        """
+        code = ["def _render(_values):", "    _out = []",
+                "    _append = _out.append"]
+        code.extend("    _{0} = _values[{0!r}]".format(name)
+                for name in sorted(self.used))
+        code.extend(self._constant_lines)
+        code.extend(self.lines)
+        code.append("    return ''.join(_out)")
+
+        scope = dict(FUNCTIONS, _format=format_value, _range=range, _int=int)
+        exec(compile("\n".join(code), "<template>", "exec"), scope)
+        return scope['_render']
+
+
+def _compile_dimensions(root, names):
+    """
+    Compile the root attributes the template dimensions are resolved
+    from, see Template.variant.
+
+    Returns:
+        callable: (values, svg, dpi) -> (width, height)
+    """
+    attributes = []
+    for name in DIMENSION_ATTRIBUTES:
+        value = root.get(name)
+        if value is not None:
+            compiler = _Compiler(names)
+            compiler.add((value, []))
+            attributes.append((name, compiler.function()))
+
+    # Few distinct sizes are expected, their dimensions are remembered
+    resolved = {}
+
+    def dimensions(values, svg, dpi):
+        key = (dpi,)+tuple(render(values) for _, render in attributes)
+        try:
+            return resolved[key]
+        except KeyError:
+            pass
+
+        element = etree.Element(SVG+"svg", dict(zip(
+            (name for name, _ in attributes), key[1:])))
+        try:
+            size = element_dimensions(element, dpi)
+        except ValueError:
+            return svg_dimensions(svg, dpi)
+
+        if len(resolved) >= DEFAULT_TEMPLATE_VARIANTS:
+            resolved.clear()
+        resolved[key] = size
+        return size
+
+    return dimensions
@@ -1,34 +1,416 @@
 from lxml import etree
 from copy import deepcopy
+import math
 import re
 
-from .utils import to_num
+from .utils import to_num, parse_svg, parse_svg_file
+from .compression import CompressedWriter, path_compression
 
 SVG_NAMESPACE = "http://www.w3.org/2000/svg"
 SVG = "{%s}" % SVG_NAMESPACE
-NSMAP = {None : SVG_NAMESPACE}
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+XLINK = "{%s}" % XLINK_NAMESPACE
+NSMAP = {None : SVG_NAMESPACE, 'xlink': XLINK_NAMESPACE}
 DEFAULT_SVG_DPI = 90.0
 
+URL_REFERENCE_RE = re.compile(r"url\(\s*#([^)\s]+)\s*\)")
+HREF_ATTRIBUTES = (XLINK+"href", "href")
+
+TRANSFORM_RE = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)"
+        r"\s*\(([^)]*)\)")
+TRANSFORM_SEPARATOR_RE = re.compile(r"[\s,]+")
+
+# Decimals kept when serializing transform matrices
+MATRIX_PRECISION = 6
+
+
+def format_number(value):
+    """
+    Shortest string for a number, rounded to MATRIX_PRECISION decimals
+
+    Arguments:
+        value (Number): number
+
+    Returns:
+        str
+    """
+    if isinstance(value, int):
+        return str(value)
+    value = round(value, MATRIX_PRECISION)
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class Matrix(object):
+
+    def __init__(self, a=1, b=0, c=0, d=1, e=0, f=0):
+        """
+        Affine transformation matrix, as used in svg transform attribute
+
+            | a c e |
+            | b d f |
+            | 0 0 1 |
+        """
+        self.values = (a, b, c, d, e, f)
+
+    @classmethod
+    def translate(cls, x, y=0):
+        return cls(1, 0, 0, 1, x, y)
+
+    @classmethod
+    def scale(cls, sx, sy=None):
+        return cls(sx, 0, 0, sx if sy is None else sy, 0, 0)
+
+    @classmethod
+    def rotate(cls, angle, x=0, y=0):
+        """
+        Rotation around (x, y), angle in degrees clockwise. Multiples of
+        90 degrees are exact.
+        """
+        quarter, remainder = divmod(angle, 90)
+        if remainder == 0:
+            cos, sin = ((1, 0), (0, 1), (-1, 0), (0, -1))[int(quarter)%4]
+        else:
+            radians = math.radians(angle)
+            cos, sin = math.cos(radians), math.sin(radians)
+
+        rotation = cls(cos, sin, -sin, cos, 0, 0)
+        if x or y:
+            return cls.translate(x, y)*rotation*cls.translate(-x, -y)
+        return rotation
+
+    @classmethod
+    def skew_x(cls, angle):
+        return cls(1, 0, math.tan(math.radians(angle)), 1, 0, 0)
+
+    @classmethod
+    def skew_y(cls, angle):
+        return cls(1, math.tan(math.radians(angle)), 0, 1, 0, 0)
+
+    def __mul__(self, other):
+        a1, b1, c1, d1, e1, f1 = self.values
+        a2, b2, c2, d2, e2, f2 = other.values
+        return Matrix(a1*a2+c1*b2, b1*a2+d1*b2,
+                a1*c2+c1*d2, b1*c2+d1*d2,
+                a1*e2+c1*f2+e1, b1*e2+d1*f2+f1)
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and self.values == other.values
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return "Matrix{}".format(self.values)
+
+    def is_identity(self):
+        return self.values == (1, 0, 0, 1, 0, 0)
+
+    def apply(self, x, y):
+        """
+        Transform a point
+
+        Returns:
+            (Number, Number): transformed x, y
+        """
+        a, b, c, d, e, f = self.values
+        return a*x+c*y+e, b*x+d*y+f
+
+    def tostring(self):
+        """
+        Returns:
+            str: svg transform attribute value, translations are written
+                as translate() which is shorter.
+        """
+        a, b, c, d, e, f = self.values
+        if (a, b, c, d) == (1, 0, 0, 1):
+            if f == 0:
+                return "translate({})".format(format_number(e))
+            return "translate({} {})".format(format_number(e),
+                    format_number(f))
+        return "matrix({})".format(" ".join(format_number(v)
+            for v in self.values))
+
+    __str__ = tostring
+
+
+def parse_transform(transform):
+    """
+    Compose a svg transform attribute into a single matrix
+
+    Arguments:
+        transform (str|None): transform attribute value
+
+    Returns:
+        Matrix
+
+    Raises:
+        ValueError: when the transform is invalid
+    """
+    matrix = Matrix()
+    if not transform:
+        return matrix
+
+    for name, args in TRANSFORM_RE.findall(transform):
+        try:
+            args = [float(v) for v in
+                    TRANSFORM_SEPARATOR_RE.split(args.strip()) if v]
+        except ValueError:
+            raise ValueError("Invalid transform '{}'".format(transform))
+
+        if name == 'matrix' and len(args) == 6:
+            op = Matrix(*args)
+        elif name == 'translate' and len(args) in (1, 2):
+            op = Matrix.translate(*args)
+        elif name == 'scale' and len(args) in (1, 2):
+            op = Matrix.scale(*args)
+        elif name == 'rotate' and len(args) in (1, 3):
+            op = Matrix.rotate(*args)
+        elif name == 'skewX' and len(args) == 1:
+            op = Matrix.skew_x(*args)
+        elif name == 'skewY' and len(args) == 1:
+            op = Matrix.skew_y(*args)
+        else:
+            raise ValueError("Invalid transform '{}'".format(transform))
+        matrix = matrix*op
+
+    return matrix
+
+
+def rotation_angle(rotate):
+    """
+    Rotation angle in degrees for a rotate option
+
+    Arguments:
+        rotate (bool|Number): True for 90 degrees, False for none, or
+            angle in degrees clockwise.
+
+    Returns:
+        Number
+    """
+    if rotate is True:
+        return 90
+    if rotate is False or rotate is None:
+        return 0
+    return rotate
+
+
+def rotated_box(width, height, rotate):
+    """
+    Bounding box of a width x height rectangle with its origin at (0, 0)
+    after rotating it around the origin.
+
+    Arguments:
+        width (Number): rectangle width
+        height (Number): rectangle height
+        rotate (bool|Number): rotation, see rotation_angle
+
+    Returns:
+        (Number, Number, Number, Number): min_x, min_y, max_x, max_y
+    """
+    matrix = Matrix.rotate(rotation_angle(rotate))
+    xs, ys = zip(*(matrix.apply(x, y) for x, y in
+        ((0, 0), (width, 0), (0, height), (width, height))))
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def rotated_size(width, height, rotate):
+    """
+    Size of a width x height rectangle bounding box after rotating it
+
+    Returns:
+        (Number, Number): width, height
+    """
+    box = rotated_box(width, height, rotate)
+    return box[2]-box[0], box[3]-box[1]
+
+
+def prefix_ids(root, prefix):
+    """
+    Prefix all ids in an element tree, and rewrite url(#id) and href
+    references to them, so the tree can be combined with others
+    without id collisions.
+
+    Arguments:
+        root (lxml.etree._Element): tree root, modified in place
+        prefix (str): prefix added to each id
+    """
+    IdIndex(root).rename(prefix)
+
+
+class IdIndex(object):
+
+    # Elements inside defs that are never moved out of them
+    KEEP_IN_DEFS = (SVG+"style", SVG+"script")
+
+    def __init__(self, root):
+        """
+        Index of the ids in an element tree and of the references to
+        them (url(#id) and href), built with a single scan of the tree so
+        ids can be renamed many times without scanning it again.
+
+        Arguments:
+            root (lxml.etree._Element): tree root
+        """
+        self.root = root
+        # (element, id) for each element with an id
+        self.elements = []
+        # (element, attribute, value) for each attribute referencing an
+        # id, attribute is None for stylesheets text.
+        self.references = []
+        # (element, id) for each referenced element with id directly
+        # inside a defs
+        self.definitions = []
+        self._detached = []
+
+        referenced = set()
+        for element in root.iter(tag=etree.Element):
+            element_id = element.get("id")
+            if element_id is not None:
+                self.elements.append((element, element_id))
+
+            for name, value in element.items():
+                if name in HREF_ATTRIBUTES:
+                    if value.startswith("#"):
+                        self.references.append((element, name, value))
+                        referenced.add(value[1:])
+                elif "url(" in value:
+                    self.references.append((element, name, value))
+                    referenced.update(URL_REFERENCE_RE.findall(value))
+
+            # Stylesheets can also reference ids
+            if element.tag == SVG+"style" and element.text and \
+                    "url(" in element.text:
+                self.references.append((element, None, element.text))
+                referenced.update(URL_REFERENCE_RE.findall(element.text))
+
+        self.ids = frozenset(element_id for _, element_id in self.elements)
+
+        for element, element_id in self.elements:
+            parent = element.getparent()
+            if element_id in referenced and parent is not None and \
+                    parent.tag == SVG+"defs" and \
+                    element.tag not in self.KEEP_IN_DEFS:
+                self.definitions.append((element, element_id))
+
+    def __len__(self):
+        return len(self.elements)
+
+    def rename(self, prefix="", mapping=None):
+        """
+        Rename the ids and rewrite the references to them, ids are always
+        renamed from their original value so it can be called many times.
+
+        Arguments:
+            prefix (str): prefix added to each id
+            mapping (dict|None): new id for some of the original ids,
+                used instead of prefixing them.
+        """
+        if not self.elements:
+            return
+        ids, mapping = self.ids, mapping or {}
+
+        def new_id(element_id):
+            return mapping.get(element_id, prefix+element_id)
+
+        def replace_url(match):
+            if match.group(1) in ids:
+                return "url(#%s)" % new_id(match.group(1))
+            return match.group(0)
+
+        for element, element_id in self.elements:
+            element.set("id", new_id(element_id))
+
+        for element, name, value in self.references:
+            if name is None:
+                element.text = URL_REFERENCE_RE.sub(replace_url, value)
+            elif name in HREF_ATTRIBUTES:
+                if value[1:] in ids:
+                    element.set(name, "#"+new_id(value[1:]))
+            else:
+                element.set(name, URL_REFERENCE_RE.sub(replace_url, value))
+
+    def detach_definitions(self):
+        """
+        Remove the definitions with id from the tree, and the defs left
+        empty, until they are restored with restore_definitions.
+
+        Returns:
+            list: removed definitions, in document order
+        """
+        self.restore_definitions()
+        emptied = []
+        for element, _ in self.definitions:
+            self._detach(element)
+            parent = self._detached[-1][0]
+            if len(parent) == 0 and not parent.attrib and \
+                    parent not in emptied:
+                emptied.append(parent)
+
+        for defs in emptied:
+            if defs.getparent() is not None:
+                self._detach(defs)
+        return [element for element, _ in self.definitions]
+
+    def _detach(self, element):
+        """Remove element from its parent, remembering where it was"""
+        parent = element.getparent()
+        self._detached.append((parent, parent.index(element), element,
+            element.tail))
+        parent.remove(element)
+        element.tail = None
+
+    def restore_definitions(self):
+        """Put the detached definitions back into their place"""
+        # In reverse order, so each one goes back to its original index
+        for parent, position, element, tail in reversed(self._detached):
+            parent.insert(position, element)
+            element.tail = tail
+        self._detached = []
+
+
 class FigureElement(object):
 
     def __init__(self, xml_element, defs=None):
         self.root = xml_element
 
+    def get_matrix(self):
+        """
+        Returns:
+            Matrix: element transform composed into a single matrix
+        """
+        return parse_transform(self.root.get("transform"))
+
+    def set_matrix(self, matrix):
+        """
+        Replace element transform, identity matrices remove it
+
+        Arguments:
+            matrix (Matrix): new transform
+        """
+        if matrix.is_identity():
+            self.root.attrib.pop("transform", None)
+        else:
+            self.root.set("transform", matrix.tostring())
+
+    def transform(self, matrix):
+        """
+        Compose a transform after the element current one
+
+        Arguments:
+            matrix (Matrix): transform
+        """
+        self.set_matrix(self.get_matrix()*matrix)
+
     def moveto(self, x, y):
-        self.root.set("transform", "%s translate(%s, %s)" %
-                (self.root.get("transform") or '', x,y))
+        self.transform(Matrix.translate(x, y))
 
     def rotate(self, angle, x=0, y=0):
-        self.root.set("transform", "%s rotate(%f %f %f)" %
-                (self.root.get("transform") or '', angle,x, y))
+        self.transform(Matrix.rotate(angle, x, y))
 
     def scale(self, swidth, sheight=None):
-        if sheight is None:
-            self.root.set("transform", "%s scale(%s)" %
-                (self.root.get("transform") or '', swidth))
-        else:
-            self.root.set("transform", "%s scale(%s %s)" %
-                (self.root.get("transform") or '', swidth, sheight))
+        self.transform(Matrix.scale(swidth, sheight))
 
     def viewbox(self, min_x, min_y, width, height):
         self.root.set("viewBox", "%s %s %s %s" %
@@ -53,7 +435,7 @@ class TextElement(FigureElement):
         txt = etree.Element(SVG+"text", {"x": str(x), "y": str(y),
             "font-size":str(size), "font-family": font,
             "font-weight": weight, "letter-spacing": str(letterspacing),
-            "text-anchor": str(anchor)})
+            "text-anchor": str(anchor)}, nsmap=NSMAP)
         txt.text = text
         FigureElement.__init__(self, txt)
 
@@ -64,7 +446,7 @@ class LineElement(FigureElement):
         line = etree.Element(SVG+"path", 
                 {"d": linedata, 
                  "stroke-width":str(width),
-                 "stroke" : color}) 
+                 "stroke" : color}, nsmap=NSMAP)
         FigureElement.__init__(self, line)
 
 class RectElement(FigureElement):
@@ -74,13 +456,13 @@ class RectElement(FigureElement):
         rect = etree.Element(SVG+"rect", {"x": str(x), "y": str(y),
             "width": str(width), "height": str(height),
             "style": style,
-            })
+            }, nsmap=NSMAP)
         FigureElement.__init__(self, rect)
 
 class SVGElement(FigureElement):
     def __init__(self, element_list, width, height):
         svg = etree.Element(SVG+"svg", {"width": str(width), 
-            "height": str(height)})
+            "height": str(height)}, nsmap=NSMAP)
         for e in element_list:
             if isinstance(e, FigureElement):
                 svg.append(e.root)
@@ -90,9 +472,47 @@ class SVGElement(FigureElement):
                 svg.append(e)
         self.root = svg
 
+class SymbolElement(FigureElement):
+    def __init__(self, symbol_id, element_list, width, height):
+        symbol = etree.Element(SVG+"symbol", {"id": symbol_id,
+            "viewBox": "0 0 %s %s" % (width, height)}, nsmap=NSMAP)
+        for e in element_list:
+            if isinstance(e, (FigureElement, SVGFigure)):
+                symbol.append(e.root)
+            else:
+                symbol.append(e)
+        self.root = symbol
+
+class UseElement(FigureElement):
+    def __init__(self, href_id, width, height):
+        use = etree.Element(SVG+"use", {XLINK+"href": "#"+href_id,
+            "width": str(width), "height": str(height)}, nsmap=NSMAP)
+        FigureElement.__init__(self, use)
+
+class DefsElement(FigureElement):
+    def __init__(self, element_list):
+        defs = etree.Element(SVG+"defs", nsmap=NSMAP)
+        for e in element_list:
+            if isinstance(e, FigureElement):
+                defs.append(e.root)
+            else:
+                defs.append(e)
+        self.root = defs
+
+class ClipPathElement(FigureElement):
+    def __init__(self, clip_id, element_list):
+        clip = etree.Element(SVG+"clipPath", {"id": clip_id}, nsmap=NSMAP)
+        for e in element_list:
+            if isinstance(e, FigureElement):
+                clip.append(e.root)
+            else:
+                clip.append(e)
+        self.root = clip
+
 class GroupElement(FigureElement):
     def __init__(self, element_list, attrib=None):
-        new_group = etree.Element(SVG+"g", attrib=attrib)
+        new_group = etree.Element(SVG+"g", attrib=attrib,
+                nsmap=NSMAP)
         for e in element_list:
             if isinstance(e, FigureElement):
                 new_group.append(e.root)
@@ -105,6 +525,9 @@ class SVGFigure(object):
     def __init__(self, width=None, height=None):
         self.root = etree.Element(SVG+"svg",nsmap=NSMAP)
         self.root.set("version", "1.1")
+        # Element for each id, and the root it was built for
+        self._ids = None
+        self._ids_root = None
         if width:
             self.width = width
         if height:
@@ -113,14 +536,15 @@ class SVGFigure(object):
     @classmethod
     def fromstring(cls, svg, width=None, height=None):
         figure = cls(width=width, height=height)
-        figure.root = etree.fromstring(svg)
+        figure.root = parse_svg(svg)
         return figure
 
     @classmethod
     def fromfile(cls, filepath, width=None, height=None):
-        with open(filepath, 'br') as f:
-            content = f.read()
-        return cls.fromstring(content, width=width, height=height)
+        # Parsed straight from the file, without reading it into memory
+        figure = cls(width=width, height=height)
+        figure.root = parse_svg_file(filepath)
+        return figure
 
     @property
     def width(self):
@@ -142,9 +566,14 @@ class SVGFigure(object):
     
     def append(self, element):
         try:
-            self.root.append(element.root)
+            element = element.root
         except AttributeError:
-            self.root.append(GroupElement(element).root)
+            element = GroupElement(element).root
+        self.root.append(element)
+
+        # Keep the id index valid, earlier elements take precedence
+        if self._ids is not None and self._ids_root is self.root:
+            self._index_ids(element)
 
     def getroot(self):
         if 'class' in self.root.attrib:
@@ -160,16 +589,97 @@ class SVGFigure(object):
         return etree.tostring(self.root, xml_declaration=True,
                 standalone=True,pretty_print=True)
 
-    def save(self, fname):
+    def save(self, fname, compression=None, compression_level=None):
+        """
+        Save figure to a file
+
+        Arguments:
+            fname (str): path to output file
+            compression (str|None): compression, see SVGStreamWriter
+            compression_level (int|None): compression level
+        """
         out=etree.tostring(self.root, xml_declaration=True,
                 standalone=True,pretty_print=True)
+        if compression is None:
+            compression = path_compression(fname)
+
         fid = open(fname, 'wb')
-        fid.write(out)
-        fid.close()
+        if compression is not None:
+            fid = CompressedWriter(fid, compression, compression_level,
+                    close_stream=True)
+        try:
+            fid.write(out)
+        finally:
+            fid.close()
+
+    def _index_ids(self, root):
+        """Add the ids in an element tree to the id index"""
+        ids = self._ids
+        for element in root.iter(tag=etree.Element):
+            element_id = element.get("id")
+            if element_id is not None and element_id not in ids:
+                ids[element_id] = element
+
+    def reindex(self):
+        """
+        Rebuild the id index, needed after changing the figure ids other
+        than appending elements with append.
+        """
+        self._ids, self._ids_root = {}, self.root
+        self._index_ids(self.root)
+
+    def _lookup_id(self, element_id):
+        """Element with an id, or None, see find_id"""
+        if self._ids is None or self._ids_root is not self.root:
+            self.reindex()
+
+        element = self._ids.get(element_id)
+        if element is None:
+            return None
+
+        # Elements removed or renamed since the index was built, removed
+        # elements still belong to the document so ancestors are checked
+        top = element
+        for top in element.iterancestors():
+            pass
+        if element.get("id") != element_id or top is not self.root:
+            self.reindex()
+            element = self._ids.get(element_id)
+        return element
 
     def find_id(self, element_id):
-        find = etree.XPath("//*[@id=$id]")
-        return FigureElement(find(self.root, id=element_id)[0])
+        """
+        Find the first element with an id, in document order. Lookups use
+        an index of the figure ids built on first use, and kept up to
+        date by append.
+
+        Arguments:
+            element_id (str): id
+
+        Returns:
+            FigureElement
+
+        Raises:
+            IndexError: when there isn't such element
+        """
+        element = self._lookup_id(element_id)
+        if element is None:
+            raise IndexError(element_id)
+        return FigureElement(element)
+
+    def find_ids(self, element_ids):
+        """
+        Find the elements for many ids, see find_id
+
+        Arguments:
+            element_ids (iterable): ids
+
+        Returns:
+            list: FigureElement for each id, or None for missing ids
+        """
+        elements = [self._lookup_id(i) for i in element_ids]
+        return [FigureElement(e) if e is not None else None
+                for e in elements]
 
     def get_size(self):
         """Extract svg dimensions using native library
@@ -196,3 +706,144 @@ class SVGFigure(object):
         self.root.set('width', w)
         self.root.set('height', h)
 
+
+def fragment_size(fragment):
+    """Size in bytes of a serialized fragment, see SVGStreamWriter"""
+    return sum(len(chunk) for chunk in fragment)
+
+
+class SVGStreamWriter(object):
+
+    def __init__(self, output, root, pretty_print=False, optimizer=None,
+            compression=None, compression_level=None):
+        """
+        Write a svg document incrementally, elements are serialized and
+        written to the output as they are added instead of building the
+        whole document tree in memory.
+
+        Arguments:
+            output (str|file): path to output file, or writable binary
+                stream.
+            root (lxml.etree._Element): document root element, its
+                children (if any) are not written.
+            pretty_print (bool): Indent written elements
+            optimizer (Optimizer|None): optimizer applied to each written
+                element, see svgmapper.optimize
+            compression (str|None): 'gzip' or 'zstd' to compress the
+                document as it's written, by default paths ending in
+                .svgz/.gz are compressed with gzip and .zst with zstd.
+            compression_level (int|None): compression level, None for
+                the default.
+        """
+        self.pretty_print = pretty_print
+        self.optimizer = optimizer
+        self._root = root
+
+        if hasattr(output, 'write'):
+            self._stream, self._close = output, False
+        else:
+            if compression is None:
+                compression = path_compression(output)
+            self._stream, self._close = open(output, 'wb'), True
+
+        # The compressor is always closed to finish the compressed data,
+        # it closes the output only when owned.
+        if compression is not None:
+            self._stream = CompressedWriter(self._stream, compression,
+                    compression_level, close_stream=self._close)
+            self._close = True
+
+        # Namespaces declared by the root, redundant when repeated on the
+        # written elements.
+        self._declarations = []
+        for prefix, namespace in root.nsmap.items():
+            if prefix is None:
+                declaration = ' xmlns="{}"'.format(namespace)
+            else:
+                declaration = ' xmlns:{}="{}"'.format(prefix, namespace)
+            self._declarations.append(declaration.encode())
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        """Write xml declaration and root start tag"""
+        root = etree.Element(self._root.tag, self._root.attrib,
+                nsmap=self._root.nsmap)
+        start = etree.tostring(root, encoding='UTF-8')
+        self.write_raw(b"<?xml version='1.0' encoding='UTF-8' "
+                b"standalone='yes'?>\n")
+        self.write_raw(start[:-2]+b">")
+        if self.pretty_print:
+            self.write_raw(b"\n")
+
+    def close(self):
+        """Write root end tag and close output when owned"""
+        try:
+            self.write_raw("</{}>\n".format(self._root.tag.split('}')[-1])
+                    .encode())
+        finally:
+            if self._close:
+                self._stream.close()
+
+    def tostring(self, element):
+        """
+        Serialize element as it will be written into the document
+
+        Arguments:
+            element (FigureElement|lxml.etree._Element): element
+
+        Returns:
+            list: serialized element chunks (bytes or memoryview), in
+                order, see write_raw.
+        """
+        element = getattr(element, 'root', element)
+        if self.optimizer is None:
+            return self._serialize(element)
+
+        fragment = self._serialize(self.optimizer.optimize(element))
+        if self.optimizer.measure:
+            self.optimizer.record(fragment_size(self._serialize(element)),
+                    fragment_size(fragment))
+        return fragment
+
+    def _serialize(self, element):
+        """Serialize element removing the root namespace declarations,
+        only its start tag is copied to remove them."""
+        fragment = etree.tostring(element, encoding='UTF-8',
+                pretty_print=self.pretty_print)
+
+        # Remove namespace declarations repeated from the root
+        end = fragment.find(b'>')
+        start = fragment[:end]
+        for declaration in self._declarations:
+            start = start.replace(declaration, b"", 1)
+        if len(start) == end:
+            return [fragment]
+        return [start, memoryview(fragment)[end:]]
+
+    def write(self, element):
+        """
+        Serialize element and write it into the document
+
+        Arguments:
+            element (FigureElement|lxml.etree._Element): element
+        """
+        self.write_raw(self.tostring(element))
+
+    def write_raw(self, data):
+        """
+        Write already serialized data into the document
+
+        Arguments:
+            data (bytes|list): serialized svg, or its chunks
+        """
+        if isinstance(data, list):
+            for chunk in data:
+                self._stream.write(chunk)
+        else:
+            self._stream.write(data)
@@ -1,10 +1,49 @@
-from gi.repository import Rsvg
+from lxml import etree
+import hashlib
+import math
+import os
 import re
+import threading
+
+from .compression import open_source, source_compression
 
 
 DIMENSIONS_ERROR_MSG = 'Invalid svg unable to extract svg dimensions'
 
-def svg_dimensions(svg, dpi=90.0):
+# Font size used to resolve em/ex units when the svg doesn't set one,
+# the same default librsvg uses (12pt)
+DEFAULT_FONT_SIZE = 12.0
+
+LENGTH_RE = re.compile(r"^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+        r"\s*(px|pt|pc|mm|cm|in|em|ex|%)?\s*$")
+
+VIEWBOX_SEPARATOR_RE = re.compile(r"[\s,]+")
+
+
+# librsvg bindings, imported on first use because loading GObject
+# introspection is slow and only needed when the svg attributes aren't
+# enough to resolve its dimensions.
+_rsvg = None
+
+
+def _load_rsvg():
+    """
+    Import librsvg bindings
+
+    Returns:
+        module: gi.repository.Rsvg
+
+    Raises:
+        ImportError: when the bindings aren't installed
+    """
+    global _rsvg
+    if _rsvg is None:
+        from gi.repository import Rsvg
+        _rsvg = Rsvg
+    return _rsvg
+
+
+def rsvg_dimensions(svg, dpi=90.0):
     """
     extract svg dimensions using rsvg library
 
@@ -21,7 +60,7 @@ def svg_dimensions(svg, dpi=90.0):
         (int, int): svg width and height in px
     """
     try:
-        handle = Rsvg.Handle()
+        handle = _load_rsvg().Handle()
         if isinstance(svg, str):
             svg = svg.encode('utf8')
         svg = handle.new_from_data(svg)
@@ -32,6 +71,435 @@ def svg_dimensions(svg, dpi=90.0):
         raise ValueError(DIMENSIONS_ERROR_MSG)
 
 
+def parse_length(length, dpi=90.0, reference=None, font_size=None):
+    """
+    Convert svg length (i.e. '10', '3cm', '25%') to pixels
+
+    Arguments:
+        length (string): svg length attribute value
+        dpi (float): dpi used for unit conversion to px
+        reference (Number|None): length in px percentages are relative
+            to, or None if unknown.
+        font_size (Number|None): font size in px used for em and ex
+            units, or None to use the default font size.
+
+    Returns:
+        float|None: length in px, or None if it can't be resolved
+    """
+    match = LENGTH_RE.match(length)
+    if match is None:
+        return None
+
+    value, unit = float(match.group(1)), match.group(2)
+    if font_size is None:
+        font_size = DEFAULT_FONT_SIZE*dpi/72.0
+
+    if unit is None or unit == 'px':
+        return value
+    elif unit == 'in':
+        return value*dpi
+    elif unit == 'cm':
+        return value*dpi/2.54
+    elif unit == 'mm':
+        return value*dpi/25.4
+    elif unit == 'pt':
+        return value*dpi/72.0
+    elif unit == 'pc':
+        return value*dpi/6.0
+    elif unit == 'em':
+        return value*font_size
+    elif unit == 'ex':
+        return value*font_size/2.0
+    elif reference is not None: # '%'
+        return value*reference/100.0
+    else:
+        return None
+
+
+def parse_viewbox(viewbox):
+    """
+    Parse svg viewBox attribute
+
+    Arguments:
+        viewbox (string|None): viewBox attribute value
+
+    Returns:
+        (float, float, float, float)|None: min_x, min_y, width, height or
+            None if the viewbox is missing or invalid.
+    """
+    if not viewbox:
+        return None
+
+    try:
+        values = [float(v) for v in
+                VIEWBOX_SEPARATOR_RE.split(viewbox.strip())]
+    except ValueError:
+        return None
+
+    if len(values) != 4 or values[2] < 0 or values[3] < 0:
+        return None
+
+    return tuple(values)
+
+
+def _round_px(value):
+    """Round px to the nearest integer like librsvg does"""
+    return int(math.floor(value+0.5))
+
+
+def element_dimensions(root, dpi=90.0):
+    """
+    Extract svg dimensions from the attributes of an already parsed
+    root <svg> element, without rendering.
+
+    Arguments:
+        root (lxml.etree._Element): svg root element
+        dpi(float): dpi used for unit conversion to px
+
+    Returns:
+        (int, int): svg width and height in px
+
+    Raises:
+        ValueError: when the dimensions can't be resolved from the root
+            attributes alone.
+    """
+    if not isinstance(root.tag, str) or etree.QName(root).localname != 'svg':
+        raise ValueError(DIMENSIONS_ERROR_MSG)
+
+    width, height = root.get('width'), root.get('height')
+    viewbox = parse_viewbox(root.get('viewBox'))
+
+    if viewbox is not None:
+        vb_width, vb_height = viewbox[2], viewbox[3]
+    else:
+        vb_width, vb_height = None, None
+
+    # Without width and height the viewbox gives the size, and when
+    # neither is available the svg has no intrinsic dimensions.
+    if width is None and height is None:
+        if viewbox is None:
+            return 0, 0
+        return _round_px(vb_width), _round_px(vb_height)
+
+    font_size = root.get('font-size')
+    if font_size is not None:
+        font_size = parse_length(font_size, dpi)
+
+    if width is not None:
+        width = parse_length(width, dpi, vb_width, font_size)
+    if height is not None:
+        height = parse_length(height, dpi, vb_height, font_size)
+
+    # Only one dimension was given, use the viewbox aspect ratio
+    if viewbox is not None and vb_width and vb_height:
+        if width is None and height is not None:
+            width = height*vb_width/vb_height
+        elif height is None and width is not None:
+            height = width*vb_height/vb_width
+
+    if width is None or height is None:
+        raise ValueError(DIMENSIONS_ERROR_MSG)
+
+    return _round_px(width), _round_px(height)
+
+
+class DimensionBackend(object):
+    """
+    Strategy used to extract svg dimensions, subclasses implement
+    dimensions() and raise ValueError when they can't resolve them.
+    """
+
+    name = None
+
+    def dimensions(self, root, svg, dpi=90.0):
+        """
+        Arguments:
+            root (lxml.etree._Element|None): parsed svg root element, or
+                None when the svg is not valid xml.
+            svg (bytes|None): svg file content, or None if only the
+                parsed root is available.
+            dpi(float): dpi used for unit conversion to px
+
+        Returns:
+            (int, int): svg width and height in px
+        """
+        raise NotImplementedError
+
+
+class AttributeBackend(DimensionBackend):
+    """Pure python backend, dimensions are resolved from the root
+    element attributes"""
+
+    name = 'attributes'
+
+    def dimensions(self, root, svg, dpi=90.0):
+        if root is None:
+            raise ValueError(DIMENSIONS_ERROR_MSG)
+        return element_dimensions(root, dpi)
+
+
+class RsvgBackend(DimensionBackend):
+    """librsvg backend, the bindings are imported on first use"""
+
+    name = 'rsvg'
+
+    def dimensions(self, root, svg, dpi=90.0):
+        if svg is None:
+            svg = etree.tostring(root)
+        return rsvg_dimensions(svg, dpi)
+
+
+class FallbackBackend(DimensionBackend):
+
+    name = 'fallback'
+
+    def __init__(self, backends):
+        """
+        Try several backends in order until one resolves the dimensions
+
+        Arguments:
+            backends (list): DimensionBackend instances
+        """
+        self.backends = list(backends)
+
+    def dimensions(self, root, svg, dpi=90.0):
+        for backend in self.backends:
+            try:
+                return backend.dimensions(root, svg, dpi)
+            except ValueError:
+                pass
+        raise ValueError(DIMENSIONS_ERROR_MSG)
+
+
+# Default backend, librsvg is only loaded for svgs whose attributes
+# don't give their size.
+DEFAULT_DIMENSION_BACKEND = FallbackBackend([AttributeBackend(),
+    RsvgBackend()])
+
+_backends = {backend.name: backend for backend in
+        (AttributeBackend(), RsvgBackend(), DEFAULT_DIMENSION_BACKEND)}
+_backend = DEFAULT_DIMENSION_BACKEND
+_backend_lock = threading.Lock()
+
+
+def register_dimension_backend(backend):
+    """
+    Register a backend so it can be selected by name
+
+    Arguments:
+        backend (DimensionBackend): backend with a unique name
+    """
+    assert(isinstance(backend, DimensionBackend) and backend.name)
+    with _backend_lock:
+        _backends[backend.name] = backend
+
+
+def set_dimension_backend(backend):
+    """
+    Select the backend used by svg_dimensions
+
+    Arguments:
+        backend (DimensionBackend|str): backend, or name of a registered
+            backend ('attributes', 'rsvg' or 'fallback'), or None to
+            restore the default.
+
+    Returns:
+        DimensionBackend: previous backend
+    """
+    global _backend
+    with _backend_lock:
+        if backend is None:
+            backend = DEFAULT_DIMENSION_BACKEND
+        elif not isinstance(backend, DimensionBackend):
+            try:
+                backend = _backends[backend]
+            except KeyError:
+                raise ValueError("Unknown dimension backend '{}'".format(
+                    backend))
+        previous, _backend = _backend, backend
+        return previous
+
+
+def get_dimension_backend():
+    """
+    Returns:
+        DimensionBackend: backend used by svg_dimensions
+    """
+    return _backend
+
+
+def svg_dimensions(svg, dpi=90.0):
+    """
+    extract svg dimensions using the selected dimension backend, by
+    default from svg root attributes, librsvg is only used as fallback
+    when they can't be resolved from them.
+
+    Arguments:
+        svg(string|bytes|lxml.etree._Element): String containig svg
+            file, or already parsed root element.
+        dpi(float): dpi used for unit conversion to px
+
+    Returns:
+        (int, int): svg width and height in px
+    """
+    if isinstance(svg, str):
+        svg = svg.encode('utf8')
+
+    if isinstance(svg, bytes):
+        try:
+            root = parse_svg(svg)
+        except etree.XMLSyntaxError:
+            root = None
+    else:
+        root, svg = svg, None
+
+    return _backend.dimensions(root, svg, dpi)
+
+
+# Parsers aren't shared between threads, each thread creates its own
+_parsers = threading.local()
+
+# Size of the chunks read when hashing files
+DIGEST_CHUNK_SIZE = 1<<20
+
+
+def svg_parser():
+    """
+    Parser for svg sources, huge_tree is enabled so very large sources
+    (i.e. plotter exports with huge paths) can be parsed.
+
+    Returns:
+        lxml.etree.XMLParser: parser for the calling thread
+    """
+    parser = getattr(_parsers, 'parser', None)
+    if parser is None:
+        parser = etree.XMLParser(huge_tree=True)
+        _parsers.parser = parser
+    return parser
+
+
+def parse_svg(svg):
+    """
+    Parse svg content
+
+    Arguments:
+        svg (bytes): svg file content
+
+    Returns:
+        lxml.etree._Element: svg root element
+    """
+    return etree.fromstring(svg, svg_parser())
+
+
+def parse_svg_file(path):
+    """
+    Parse svg file, lxml reads the file itself in chunks so its content
+    is never loaded whole into memory. Compressed files (gzip or zstd)
+    are decompressed as they are read.
+
+    Arguments:
+        path (str|file): path to svg file, or binary file object
+
+    Returns:
+        lxml.etree._Element: svg root element
+    """
+    if isinstance(path, str) and source_compression(path) is not None:
+        with open_source(path) as source:
+            return etree.parse(source, svg_parser()).getroot()
+    return etree.parse(path, svg_parser()).getroot()
+
+
+def _root_element(path):
+    """Parse only the root element of a svg file, see svg_file_dimensions"""
+    if isinstance(path, str) and source_compression(path) is not None:
+        with open_source(path) as source:
+            return _root_element(source)
+
+    try:
+        for _, root in etree.iterparse(path, events=('start',),
+                huge_tree=True):
+            return root
+    except etree.XMLSyntaxError:
+        pass
+    raise ValueError(DIMENSIONS_ERROR_MSG)
+
+
+def svg_file_dimensions(path, dpi=90.0):
+    """
+    Extract svg file dimensions reading only its root element, the file
+    is parsed incrementally and parsing stops after the root start tag.
+    The whole file is parsed when the root attributes aren't enough, or
+    the selected backend doesn't resolve dimensions from them.
+
+    Arguments:
+        path (str|file): path to svg file, or binary file object
+        dpi(float): dpi used for unit conversion to px
+
+    Returns:
+        (int, int): svg width and height in px
+    """
+    root = _root_element(path)
+
+    if _backend is DEFAULT_DIMENSION_BACKEND or \
+            isinstance(_backend, AttributeBackend):
+        try:
+            return element_dimensions(root, dpi)
+        except ValueError:
+            pass
+
+    if hasattr(path, 'seek'):
+        path.seek(0)
+    try:
+        root = parse_svg_file(path)
+    except etree.XMLSyntaxError:
+        raise ValueError(DIMENSIONS_ERROR_MSG)
+    return svg_dimensions(root, dpi)
+
+
+def user_cache_directory():
+    """
+    Returns:
+        str: svgmapper directory inside the user cache directory
+            ($XDG_CACHE_HOME or ~/.cache)
+    """
+    cache_dir = os.environ.get('XDG_CACHE_HOME') or \
+            os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_dir, 'svgmapper')
+
+
+def content_digest(svg):
+    """
+    Content hash used to identify svg sources
+
+    Arguments:
+        svg (bytes): svg file content
+
+    Returns:
+        str: hex digest
+    """
+    return hashlib.sha1(svg).hexdigest()
+
+
+def file_digest(path):
+    """
+    Content hash of a svg file, read in chunks so the file is never
+    loaded whole into memory. Compressed files are hashed decompressed,
+    so they match the same svg uncompressed.
+
+    Arguments:
+        path (str): path to svg file
+
+    Returns:
+        str: hex digest, the same content_digest returns for the file
+            content.
+    """
+    digest = hashlib.sha1()
+    with open_source(path) as thefile:
+        for chunk in iter(lambda: thefile.read(DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def to_num(s):
     """
     Convert number string to int or float as needed
@@ -0,0 +1,154 @@
+from .transform import rotation_angle, rotated_size
+from .table import rotated_sizes
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# Reasons a placement is invalid, as bit flags so a placement can fail
+# for several of them.
+INVALID_SIZE = 1
+NEGATIVE_POSITION = 2
+OUT_OF_BOUNDS_X = 4
+OUT_OF_BOUNDS_Y = 8
+
+REASON_MESSAGES = {
+    INVALID_SIZE: "Width and height must be positive",
+    NEGATIVE_POSITION: "Position must be positive",
+    OUT_OF_BOUNDS_X: "Placement out of bounds (width)",
+    OUT_OF_BOUNDS_Y: "Placement out of bounds (height)",
+}
+
+
+class Validation(object):
+
+    def __init__(self, valid, reasons):
+        """
+        Result of a bulk placement validation
+
+        Arguments:
+            valid (sequence): True for each valid placement
+            reasons (sequence): reason flags for each placement, 0 for
+                the valid ones.
+        """
+        self.valid = valid
+        self.reasons = reasons
+
+    def __len__(self):
+        return len(self.valid)
+
+    def all(self):
+        """Returns True if all placements are valid"""
+        return bool(all(self.valid))
+
+    def invalid(self):
+        """
+        Returns:
+            list: positions of the invalid placements
+        """
+        if numpy is not None and isinstance(self.valid, numpy.ndarray):
+            return numpy.flatnonzero(~self.valid).tolist()
+        return [i for i, v in enumerate(self.valid) if not v]
+
+    def errors(self):
+        """
+        Yields:
+            (int, list): position and error messages of each invalid
+                placement
+        """
+        for i in self.invalid():
+            reasons = int(self.reasons[i])
+            yield i, [message for flag, message in
+                    sorted(REASON_MESSAGES.items()) if reasons & flag]
+
+
+def validate_placements(x, y, width, height, rotate=None, sheet_width=0,
+        sheet_height=0, margin_width=0):
+    """
+    Check many placements fit inside a sheet, margins included, the same
+    checks done when a part is added but in a single vectorized pass when
+    numpy is available.
+
+    Arguments:
+        x (sequence): placements x coordinate
+        y (sequence): placements y coordinate
+        width (sequence): svgs width (not including margins)
+        height (sequence): svgs height (not including margins)
+        rotate (sequence|None): True for svgs rotated 90 degrees, or
+            rotation angle in degrees, None if none is rotated.
+        sheet_width (Number): sheet width
+        sheet_height (Number): sheet height
+        margin_width (Number): margin around each svg
+
+    Returns:
+        Validation
+    """
+    if numpy is None:
+        return _validate_python(x, y, width, height, rotate, sheet_width,
+                sheet_height, margin_width)
+
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    width = numpy.asarray(width, dtype=float)
+    height = numpy.asarray(height, dtype=float)
+    if not (len(x) == len(y) == len(width) == len(height)):
+        raise ValueError("Placement columns must have the same length")
+
+    if rotate is None:
+        rotation = numpy.zeros(len(x))
+    else:
+        if isinstance(rotate, numpy.ndarray) and rotate.dtype != object:
+            if rotate.dtype == bool:
+                rotation = rotate*90.0
+            else:
+                rotation = rotate.astype(float)
+        else:
+            # Sequences can mix bools (90 degrees) and angles, converting
+            # them to an array would make True 1 degree.
+            rotation = numpy.array([rotation_angle(r) for r in rotate],
+                    dtype=float)
+        if len(rotation) != len(x):
+            raise ValueError("Placement columns must have the same length")
+
+    placed_width, placed_height = rotated_sizes(width, height, rotation)
+    margins = 2*margin_width
+
+    reasons = numpy.zeros(len(x), dtype=numpy.uint8)
+    # Negated comparisons so NaN values are invalid too
+    reasons[~((width > 0) & (height > 0))] |= INVALID_SIZE
+    reasons[~((x >= 0) & (y >= 0))] |= NEGATIVE_POSITION
+    reasons[~(x+placed_width+margins <= sheet_width)] |= OUT_OF_BOUNDS_X
+    reasons[~(y+placed_height+margins <= sheet_height)] |= OUT_OF_BOUNDS_Y
+
+    return Validation(reasons == 0, reasons)
+
+
+def _validate_python(x, y, width, height, rotate, sheet_width,
+        sheet_height, margin_width):
+    """validate_placements without numpy"""
+    count = len(x)
+    if not (count == len(y) == len(width) == len(height)) or \
+            (rotate is not None and len(rotate) != count):
+        raise ValueError("Placement columns must have the same length")
+
+    margins = 2*margin_width
+    reasons = []
+    for i in range(count):
+        w, h = width[i], height[i]
+        flags = 0
+        if not (w > 0 and h > 0):
+            flags |= INVALID_SIZE
+        if not (x[i] >= 0 and y[i] >= 0):
+            flags |= NEGATIVE_POSITION
+
+        if rotate is not None:
+            w, h = rotated_size(w, h, rotation_angle(rotate[i]))
+        if not (x[i]+w+margins <= sheet_width):
+            flags |= OUT_OF_BOUNDS_X
+        if not (y[i]+h+margins <= sheet_height):
+            flags |= OUT_OF_BOUNDS_Y
+        reasons.append(flags)
+
+    return Validation([r == 0 for r in reasons], reasons)
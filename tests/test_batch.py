@@ -0,0 +1,89 @@
+from unittest import TestCase
+from io import BytesIO
+import os
+import shutil
+import tempfile
+from lxml import etree
+from svgmapper.batch import render_sheets, build_sheet
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+class RenderSheetsTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def sheet(self, name, count=2):
+        parts = [(test_file_path('map1.svg'), 0, 520*i) for i in range(count)]
+        return {'name': name, 'width': 1000, 'height': 1000*count,
+                'margin_width': 5, 'parts': parts}
+
+    def test_build_sheet(self):
+        mapper = build_sheet(self.sheet('a', 3))
+        self.assertEqual(len(mapper.parts), 3)
+        self.assertEqual(mapper.margin_width, 5)
+        self.assertEqual(mapper.width, 1000)
+
+    def test_render_to_directory(self):
+        cache = PartCache()
+        sheets = [self.sheet('sheet{}'.format(i)) for i in range(5)]
+        results = render_sheets(iter(sheets), self.tmpdir, workers=2,
+                cache=cache)
+
+        self.assertEqual([r.index for r in results], list(range(5)))
+        for i, result in enumerate(results):
+            self.assertIsNone(result.error)
+            self.assertGreaterEqual(result.load_time, 0)
+            self.assertGreaterEqual(result.render_time, 0)
+            path = os.path.join(self.tmpdir, 'sheet{}.svg'.format(i))
+            self.assertEqual(result.output, path)
+            root = etree.parse(path).getroot()
+            self.assertEqual(len(root), 2)
+
+        # The source was parsed once for all the sheets
+        self.assertEqual(cache.info().misses, 1)
+
+    def test_render_to_sink(self):
+        outputs = {}
+
+        class Output(BytesIO):
+            def close(self):
+                outputs[self.name] = self.getvalue()
+                BytesIO.close(self)
+
+        def sink(name):
+            stream = Output()
+            stream.name = name
+            return stream
+
+        mapper = SVGMapper(1000, 1000)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+        results = render_sheets([mapper, self.sheet('second')], sink)
+
+        self.assertEqual([r.name for r in results], ['sheet-0', 'second'])
+        self.assertEqual(set(outputs), {'sheet-0', 'second'})
+        self.assertEqual(outputs['sheet-0'], mapper.to_svg(pretty_print=False))
+
+    def test_errors(self):
+        bad = self.sheet('bad')
+        bad['parts'].append((test_file_path('map1.svg'), 2000, 0))
+        results = render_sheets([bad, self.sheet('good')], self.tmpdir)
+
+        self.assertIsInstance(results[0].error, ValueError)
+        self.assertIsNone(results[0].output)
+        self.assertIsNone(results[1].error)
+        self.assertEqual(os.listdir(self.tmpdir), ['good.svg'])
+
+        with self.assertRaises(ValueError):
+            render_sheets([], os.path.join(self.tmpdir, 'missing'))
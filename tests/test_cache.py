@@ -0,0 +1,214 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+
+from io import BytesIO
+from svgmapper.cache import PartCache, RenderCache, content_digest
+from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.transform import SVGFigure
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+def load_svg(filename=''):
+    with open(test_file_path(filename), 'br') as f:
+        return f.read()
+
+
+
+class PartCacheTest(TestCase):
+
+    def test_hits_and_misses(self):
+        """Test repeated sources are only parsed once"""
+        cache = PartCache()
+        first = cache.get(load_svg('map1.svg'))
+        second = cache.get(load_svg('map1.svg'))
+        cache.get(load_svg('map2.svg'))
+
+        self.assertIs(first, second)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 2, 2))
+
+    def test_clones_are_independent(self):
+        """Test figures returned are copies of the cached tree"""
+        source = PartCache().get(load_svg('map1.svg'))
+        figure = source.figure()
+        figure.root.set('width', '1')
+        self.assertEqual(source.figure().root.get('width'), '400')
+        self.assertEqual(source.dimensions(90.0), (400, 400))
+
+    def test_lru_eviction(self):
+        """Test least recently used sources are evicted first"""
+        cache = PartCache(max_entries=2)
+        map1, map2 = load_svg('map1.svg'), load_svg('map2.svg')
+        cache.get(map1)
+        cache.get(map2)
+        cache.get(map1)
+        cache.get(load_svg('map4_rect.svg'))
+
+        self.assertIn(content_digest(map1), cache)
+        self.assertNotIn(content_digest(map2), cache)
+        self.assertEqual(cache.info().evictions, 1)
+
+    def test_byte_eviction(self):
+        """Test total size of cached sources is bounded"""
+        map1 = load_svg('map1.svg')
+        cache = PartCache(max_bytes=len(map1)+1)
+        cache.get(map1)
+        cache.get(load_svg('map2.svg'))
+        self.assertEqual(len(cache), 1)
+        self.assertLessEqual(cache.info().bytes, len(map1)+1)
+
+    def test_file_modification(self):
+        """Test files are only read again when modified"""
+        cache = PartCache()
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'part.svg')
+            shutil.copy(test_file_path('map1.svg'), path)
+            first = cache.get_file(path)
+            self.assertIs(first, cache.get_file(path))
+            
+            shutil.copy(test_file_path('map2.svg'), path)
+            os.utime(path, ns=(0, 0))
+            self.assertIsNot(first, cache.get_file(path))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_mapper_output(self):
+        """Test mappers produce the same svg with and without cache"""
+        cache = PartCache()
+        results = []
+        for mapper in (SVGMapper(1000, 1000), SVGMapper(1000, 1000, cache=cache)):
+            mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0,
+                    uid='first')
+            mapper.add_svg_fromfile(test_file_path('map1.svg'), 500, 0,
+                    width=200, height=100)
+            mapper.add_svg_fromstring(load_svg('map3_cm.svg'), 0, 500)
+            results.append(mapper.to_svg())
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(cache.info().hits, 1)
+
+
+
+class RenderCacheTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = RenderCache(os.path.join(self.tmpdir, 'renders'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def build(self, **kwargs):
+        mapper = SVGMapper(1000, 1000, render_cache=self.cache, **kwargs)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0, uid='a')
+        mapper.add_svg_fromstring(load_svg('map2.svg'), 500, 0, rotate=True)
+        return mapper
+
+    def test_fingerprint(self):
+        """Test fingerprints only change when the output would change"""
+        first = self.build().fingerprint()
+        self.assertEqual(first, self.build(lazy=True).fingerprint())
+        self.assertEqual(len(first), 40)
+
+        changes = [lambda m: m.move_part('a', 1, 0),
+                lambda m: m.update_part('a', width=200, height=100),
+                lambda m: m.update_part(1, rotate=False),
+                lambda m: setattr(m, 'border_color', 'red'),
+                lambda m: m.add_svg_fromfile(test_file_path('map1.svg'),
+                    0, 500)]
+        for change in changes:
+            mapper = self.build()
+            change(mapper)
+            self.assertNotEqual(mapper.fingerprint(), first)
+
+        self.assertNotEqual(self.build().fingerprint(dedup=True), first)
+        self.assertNotEqual(self.build().fingerprint(optimize=True), first)
+
+    def test_removed_parts(self):
+        """Test parts removed and added again hit the cache"""
+        svg = self.build().to_svg()
+        mapper = self.build()
+        mapper.remove_part(1)
+        mapper.add_svg_fromfile(test_file_path('map4_rect.svg'), 500, 500)
+        mapper.remove_part(1)
+        mapper.add_svg_fromstring(load_svg('map2.svg'), 500, 0, rotate=True)
+        self.assertEqual(len(mapper.parts.sources), 3)
+
+        self.assertEqual(mapper.to_svg(), svg)
+        self.assertEqual(self.cache.info()[:2], (1, 1))
+
+    def test_output(self):
+        """Test outputs are reused for every kind of output"""
+        mapper = self.build()
+        svg = mapper.to_svg()
+        self.assertEqual(self.cache.info().misses, 1)
+        self.assertEqual(self.build().to_svg(), svg)
+        self.assertEqual(self.cache.info().hits, 1)
+
+        path = os.path.join(self.tmpdir, 'out.svg')
+        self.build().to_svg(path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), svg)
+
+        stream = BytesIO()
+        self.build().to_svg(stream, pretty_print=False)
+        self.assertEqual(self.build().to_svg(pretty_print=False),
+                stream.getvalue())
+        self.assertEqual(self.cache.info()[:2], (3, 2))
+
+        # Compression from the path extension is part of the key
+        compressed = os.path.join(self.tmpdir, 'out.svgz')
+        self.build().to_svg(compressed)
+        with open(compressed, 'rb') as f:
+            self.assertEqual(f.read(2), b'\x1f\x8b')
+
+        # Parts without known content are always rendered
+        mapper._add_part(SVGPart(SVGFigure.fromfile(
+            test_file_path('map1.svg'))), 0, 500, None)
+        self.assertIsNone(mapper.fingerprint())
+        mapper.to_svg()
+        self.assertEqual(self.cache.info()[:2], (3, 3))
+
+    def test_eviction(self):
+        """Test the least recently used outputs are removed first"""
+        def moved(x):
+            mapper = self.build()
+            mapper.move_part('a', x, 0)
+            return mapper
+
+        sizes = [len(moved(x).to_svg()) for x in range(3)]
+        moved(0).to_svg() # Used again
+
+        self.cache.max_bytes = 3*max(sizes)
+        moved(3).to_svg()
+
+        self.assertIn(moved(0).fingerprint(), self.cache)
+        self.assertNotIn(moved(1).fingerprint(), self.cache)
+        self.assertEqual(self.cache.info().evictions, 1)
+        self.assertEqual(len(self.cache), 3)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_scans(self):
+        """Test the directory is only scanned when over the size limit,
+        or to refresh the size total"""
+        scans = []
+        entries = self.cache._entries
+        self.cache._entries = lambda: scans.append(1) or entries()
+
+        for i in range(10):
+            self.cache.put(str(i), b'x'*100)
+        self.assertEqual(len(scans), 1)
+
+        self.cache.max_bytes = 550
+        self.cache.put('last', b'x'*100)
+        self.assertEqual(len(scans), 2)
+        self.assertEqual(self.cache.info().bytes, 500)
+        self.assertIn('last', self.cache)
@@ -0,0 +1,133 @@
+from unittest import TestCase
+import os
+import shutil
+import tempfile
+from svgmapper.cache import PartCache
+from svgmapper.catalog import SourceCatalog, main
+from svgmapper.mapper import SVGMapper
+from svgmapper.utils import content_digest, file_digest, set_dimension_backend
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+class CatalogTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'cache', 'catalog.sqlite')
+
+    def tearDown(self):
+        set_dimension_backend(None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_entries(self):
+        catalog = SourceCatalog(self.path)
+        catalog.add('abc', 100, '0 0 10 20', ['a', 'b'], {90: (10, 20)})
+        catalog.add('abc', 100, dimensions={72: (8, 16)})
+
+        # Shared by other connections and kept between runs
+        entry = SourceCatalog(self.path).lookup('abc')
+        self.assertEqual(entry.size, 100)
+        self.assertEqual(entry.viewbox, '0 0 10 20')
+        self.assertEqual(entry.ids, ['a', 'b'])
+        self.assertEqual(entry.dimensions, {90: (10, 20), 72: (8, 16)})
+        self.assertEqual(catalog.dimensions('abc', 90), (10, 20))
+        self.assertIsNone(catalog.dimensions('abc', 100))
+        self.assertIsNone(catalog.lookup('def'))
+        self.assertEqual(catalog.info(), (1, 2, 1))
+
+        # Dimensions are kept for the backend that resolved them
+        set_dimension_backend('attributes')
+        self.assertIsNone(catalog.dimensions('abc', 90))
+
+        catalog.clear()
+        self.assertNotIn('abc', catalog)
+
+    def test_file_digest(self):
+        catalog = SourceCatalog(self.path)
+        path = os.path.join(self.tmpdir, 'map.svg')
+        shutil.copy(test_file_path('map1.svg'), path)
+        self.assertEqual(catalog.file_digest(path), file_digest(path))
+
+        # Known files aren't hashed until they change
+        with catalog._connection() as connection:
+            connection.execute("UPDATE files SET digest = 'known'")
+        self.assertEqual(catalog.file_digest(path), 'known')
+        with open(path, 'ab') as f:
+            f.write(b'\n')
+        self.assertEqual(catalog.file_digest(path), file_digest(path))
+
+    def test_mapper(self):
+        catalog = SourceCatalog(self.path)
+        with open(test_file_path('map1.svg'), 'rb') as f:
+            svg = f.read()
+        mapper = SVGMapper(1000, 1000, catalog=catalog)
+        mapper.add_svg_fromstring(svg, 0, 0)
+        mapper.add_svg_fromfile(test_file_path('map2.svg'), 300, 0)
+
+        entry = catalog.lookup(content_digest(svg))
+        self.assertEqual(entry.dimensions[mapper.dpi],
+                mapper.parts.part(0).get_size())
+        self.assertEqual(entry.size, len(svg))
+        self.assertIsInstance(entry.ids, list)
+
+        # Cataloged dimensions are used instead of sizing the svg
+        catalog.add(content_digest(svg), len(svg),
+                dimensions={mapper.dpi: (12, 34)})
+        for options in ({}, {'lazy': True}, {'cache': PartCache()}):
+            mapper = SVGMapper(1000, 1000, catalog=catalog, **options)
+            mapper.add_svg_fromstring(svg, 0, 0)
+            self.assertEqual(mapper.parts.part(0).get_size(), (12, 34))
+            self.assertEqual(mapper.new_sheet().catalog, catalog)
+
+    def test_cached_files(self):
+        """Test files are hashed once with a catalog and a cache"""
+        catalog = SourceCatalog(self.path)
+        path = os.path.join(self.tmpdir, 'map.svg')
+        shutil.copy(test_file_path('map1.svg'), path)
+        catalog.file_digest(path)
+        with catalog._connection() as connection:
+            connection.execute("UPDATE files SET digest = 'known'")
+
+        mapper = SVGMapper(1000, 1000, catalog=catalog, cache=PartCache())
+        mapper.add_svg_fromfile(path, 0, 0)
+        self.assertEqual(mapper.parts.part(0).digest, 'known')
+
+    def test_index_directory(self):
+        sources = os.path.join(self.tmpdir, 'sources')
+        os.makedirs(os.path.join(sources, 'nested'))
+        shutil.copy(test_file_path('map1.svg'), sources)
+        shutil.copy(test_file_path('dimension_cm.svg'),
+                os.path.join(sources, 'nested'))
+        with open(os.path.join(sources, 'broken.svg'), 'wb') as f:
+            f.write(b'<svg')
+        with open(os.path.join(sources, 'notes.txt'), 'wb') as f:
+            f.write(b'<svg')
+
+        catalog = SourceCatalog(self.path)
+        report = catalog.index_directory(sources, dpis=(72, 90), workers=2)
+        self.assertEqual((report.indexed, report.skipped), (2, 0))
+        self.assertEqual([os.path.basename(p) for p, _ in report.errors],
+                ['broken.svg'])
+
+        entry = catalog.lookup(file_digest(test_file_path('map1.svg')))
+        self.assertEqual(set(entry.dimensions), set([72, 90]))
+        self.assertIsNotNone(entry.ids)
+
+        report = catalog.index_directory(sources, dpis=(90,),
+                recursive=False)
+        self.assertEqual((report.indexed, report.skipped), (0, 1))
+
+        # Command line, a new dpi indexes files again
+        self.assertEqual(main([sources, '--catalog', self.path, '--dpi',
+            '100', '--workers', '1']), 1)
+        self.assertIsNotNone(catalog.dimensions(
+            file_digest(test_file_path('map1.svg')), 100))
+
+        with self.assertRaises(ValueError):
+            catalog.index_directory(os.path.join(self.tmpdir, 'missing'))
@@ -0,0 +1,118 @@
+from unittest import TestCase, skipIf
+from io import BytesIO
+import gzip
+import os
+import shutil
+import tempfile
+from svgmapper.cache import PartCache
+from svgmapper.compression import (path_compression, source_compression,
+        open_source, zstandard)
+from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.transform import SVGFigure
+from svgmapper.utils import svg_file_dimensions, file_digest, content_digest
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+class CompressionTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.mapper = SVGMapper(2000, 2000)
+        for i in range(4):
+            self.mapper.add_svg_fromfile(test_file_path('map1.svg'),
+                    0, 450*i)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, filename):
+        return os.path.join(self.tmpdir, filename)
+
+    def compressed_source(self, filename):
+        """Copy a test svg compressed with gzip"""
+        with open(test_file_path(filename), 'rb') as f:
+            content = f.read()
+        path = self.path(filename+'z')
+        with open(path, 'wb') as f:
+            f.write(gzip.compress(content))
+        return path, content
+
+    def test_path_compression(self):
+        self.assertEqual(path_compression('out.svgz'), 'gzip')
+        self.assertEqual(path_compression('out.SVG.GZ'), 'gzip')
+        self.assertEqual(path_compression('out.svg.zst'), 'zstd')
+        self.assertIsNone(path_compression('out.svg'))
+
+    def test_gzip_output(self):
+        plain = self.mapper.to_svg(pretty_print=False)
+        compressed = self.mapper.to_svg(pretty_print=False,
+                compression='gzip')
+        self.assertEqual(gzip.decompress(compressed), plain)
+
+        # Compression is chosen from the extension
+        path = self.path('out.svgz')
+        self.mapper.to_svg(path, pretty_print=False)
+        with gzip.open(path) as f:
+            self.assertEqual(f.read(), plain)
+
+        # Streams are left open
+        stream = BytesIO()
+        self.mapper.to_svg(stream, pretty_print=False, compression='gzip')
+        self.assertEqual(gzip.decompress(stream.getvalue()), plain)
+
+    def test_level(self):
+        fast = self.mapper.to_svg(compression='gzip', compression_level=1)
+        best = self.mapper.to_svg(compression='gzip', compression_level=9)
+        self.assertEqual(gzip.decompress(fast), gzip.decompress(best))
+        self.assertLessEqual(len(best), len(fast))
+
+        # Output is reproducible
+        self.assertEqual(best, self.mapper.to_svg(compression='gzip',
+            compression_level=9))
+
+    def test_unknown(self):
+        with self.assertRaises(ValueError):
+            self.mapper.to_svg(compression='rar')
+
+    @skipIf(zstandard is None, "zstandard not installed")
+    def test_zstd(self):
+        path = self.path('out.svg.zst')
+        self.mapper.to_svg(path)
+        self.assertEqual(source_compression(path), 'zstd')
+        with open_source(path) as f:
+            self.assertEqual(f.read(), self.mapper.to_svg())
+
+        mapper = SVGMapper(2000, 2000)
+        mapper.add_svg_fromfile(path, 0, 0)
+        self.assertEqual(mapper.parts[0][0].get_size(), (2000, 2000))
+
+    def test_figure_save(self):
+        figure = SVGFigure.fromfile(test_file_path('map1.svg'))
+        figure.save(self.path('figure.svgz'))
+        loaded = SVGFigure.fromfile(self.path('figure.svgz'))
+        self.assertEqual(loaded.width, '400')
+
+    def test_compressed_sources(self):
+        """Test compressed sources are read transparently, and match
+        the same svg uncompressed"""
+        path, content = self.compressed_source('map1.svg')
+        self.assertEqual(source_compression(path), 'gzip')
+        self.assertIsNone(source_compression(test_file_path('map1.svg')))
+        self.assertEqual(file_digest(path), content_digest(content))
+        self.assertEqual(svg_file_dimensions(path), (400, 400))
+
+        part = SVGPart.fromfile(path)
+        self.assertEqual(part.get_size(), (400, 400))
+        self.assertEqual(part.symbol_key(),
+                SVGPart.fromfile(test_file_path('map1.svg')).symbol_key())
+
+        mapper = SVGMapper(2000, 2000, cache=PartCache())
+        mapper.add_svg_fromfile(path, 0, 0)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 500, 0)
+        self.assertEqual(len(mapper.parts.sources), 1)
@@ -0,0 +1,38 @@
+from unittest import TestCase
+import os
+import subprocess
+import sys
+
+
+# Max time importing the package can take in a new interpreter, generous
+# enough for slow machines, but far below loading GObject introspection.
+MAX_IMPORT_TIME = 0.5
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import svgmapper
+import svgmapper.mapper, svgmapper.layout, svgmapper.batch
+elapsed = time.perf_counter()-start
+print(elapsed, 'gi' in sys.modules)
+"""
+
+
+class ImportTimeTest(TestCase):
+
+    def import_package(self):
+        basepath = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([sys.executable, '-c', IMPORT_SCRIPT],
+                cwd=basepath)
+        elapsed, gi_loaded = output.decode().split()
+        return float(elapsed), gi_loaded == 'True'
+
+    def test_rsvg_not_imported(self):
+        """Test librsvg bindings are not loaded by importing the package"""
+        _, gi_loaded = self.import_package()
+        self.assertFalse(gi_loaded)
+
+    def test_import_time(self):
+        """Test package import time doesn't regress"""
+        elapsed = min(self.import_package()[0] for _ in range(3))
+        self.assertLess(elapsed, MAX_IMPORT_TIME)
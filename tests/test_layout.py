@@ -0,0 +1,104 @@
+from unittest import TestCase
+import os
+import random
+
+from svgmapper.layout import SkylinePacker, pack, layout_svgs
+from svgmapper.mapper import SVGMapper
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+def overlap(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class PackTest(TestCase):
+
+    def boxes(self, sizes, placements):
+        boxes = []
+        for p in placements:
+            w, h = sizes[p.index]
+            if p.rotate:
+                w, h = h, w
+            boxes.append((p.sheet, (p.x, p.y, p.x+w, p.y+h)))
+        return boxes
+
+    def test_no_overlaps(self):
+        """Test packed rectangles are inside the sheet and don't overlap"""
+        random.seed(5)
+        sizes = [(random.randint(5, 60), random.randint(5, 60))
+                for _ in range(300)]
+        placements, sheets = pack(sizes, 200, 150)
+        
+        boxes = self.boxes(sizes, placements)
+        for i, (sheet, box) in enumerate(boxes):
+            self.assertTrue(box[2] <= 200 and box[3] <= 150)
+            for other_sheet, other in boxes[i+1:]:
+                self.assertFalse(sheet == other_sheet and overlap(box, other))
+
+        self.assertGreater(len(sheets), 1)
+        for sheet in sheets[:-1]:
+            self.assertGreater(sheet.utilization(), 0.8)
+
+    def test_rotation(self):
+        """Test rectangles only fitting rotated are rotated"""
+        placements, _ = pack([(10, 100)], 100, 10)
+        self.assertTrue(placements[0].rotate)
+
+        with self.assertRaises(ValueError):
+            pack([(10, 100)], 100, 10, allow_rotation=False)
+
+    def test_float_sizes(self):
+        """Test rounding of float sizes doesn't run past the skyline"""
+        random.seed(0)
+        sizes = [(random.choice([0.1, 0.2, 0.3, 0.7]),
+            random.choice([0.1, 0.2, 0.3])) for _ in range(60)]
+        placements, sheets = pack(sizes, 1.0, 1.0, allow_rotation=False)
+        self.assertEqual(len(placements), 60)
+        for sheet, box in self.boxes(sizes, placements):
+            self.assertTrue(box[2] <= 1.0+1e-9 and box[3] <= 1.0+1e-9)
+
+    def test_packer_full(self):
+        """Test insertion fails when the sheet is full"""
+        packer = SkylinePacker(20, 10)
+        self.assertEqual(packer.insert(10, 10), (0, 0, False))
+        self.assertEqual(packer.insert(10, 10), (10, 0, False))
+        self.assertIsNone(packer.insert(1, 1))
+        self.assertEqual(packer.utilization(), 1.0)
+
+
+class LayoutSVGsTest(TestCase):
+
+    def test_spill_sheets(self):
+        """Test svgs not fitting in the first sheet are placed in new ones
+        with the same settings"""
+        mapper = SVGMapper(1000, 1000)
+        mapper.border_color = 'darkorange'
+        svgs = [test_file_path('map1.svg')]*6+\
+            [(test_file_path('map4_rect.svg'), {'uid': 'rect'})]
+
+        sheets = layout_svgs(mapper, svgs)
+        self.assertIs(sheets[0], mapper)
+        self.assertEqual(len(sheets), 2)
+        self.assertEqual(sum(len(s.parts) for s in sheets), 7)
+        
+        svg = sheets[1].to_svg()
+        self.assertTrue(b'darkorange' in svg)
+        self.assertTrue(b'id="rect"' in b''.join(s.to_svg() for s in sheets))
+
+    def test_rotation(self):
+        """Test rotations are stored for each placement, parts aren't
+        changed"""
+        mapper = SVGMapper(200, 1000)
+        sheets = layout_svgs(mapper, [(test_file_path('map1.svg'),
+            {'width': 400, 'height': 100})]*5)
+        rotations = [r for s in sheets for r in s.parts.rotation]
+        self.assertIn(90.0, rotations)
+        for sheet in sheets:
+            for part, _, _, _ in sheet.parts:
+                self.assertFalse(part.rotate)
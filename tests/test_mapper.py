@@ -1,6 +1,11 @@
 from unittest import TestCase, skip
+from io import BytesIO
 import os
+import shutil
+import tempfile
+from lxml import etree
 from svgmapper.mapper import SVGMapper, SVGPart
+from svgmapper.cache import PartCache
 import svgmapper.transform as tf 
 
 
@@ -31,8 +36,38 @@ class SVGPartTest(TestCase):
         part = SVGPart.fromfile(test_file_path('dimension.svg'))
 
     def test_rotation(self):
-        #TODO: Do some rotations testing
-        pass
+        """Test rotated parts bounding box is placed at the group origin
+        plus margins, with a single transform"""
+        part = SVGPart.fromfile(test_file_path('map4_rect.svg'), rotate=True)
+        self.assertEqual(part.placed_size(), (100, 400))
+
+        group = part.generate_group(margin_width=10, x=100, y=50)
+        matrix = group.get_matrix()
+        self.assertEqual(matrix, tf.Matrix(0, 1, -1, 0, 210, 60))
+        self.assertEqual(matrix.apply(0, 0), (210, 60))
+        self.assertEqual(matrix.apply(400, 100), (110, 460))
+
+        # Without border the svg is the only group child
+        self.assertEqual(len(group.root), 1)
+        self.assertEqual(group.root[0].tag, tf.SVG+'svg')
+
+        # Any angle, rotated bounding box starts at the margins
+        part.rotate = 45
+        matrix = part.generate_group(margin_width=10).get_matrix()
+        corners = [matrix.apply(x, y) for x, y in 
+                ((0, 0), (400, 0), (0, 100), (400, 100))]
+        self.assertAlmostEqual(min(x for x, _ in corners), 10, places=3)
+        self.assertAlmostEqual(min(y for _, y in corners), 10, places=3)
+
+    def test_border_group(self):
+        """Test border is placed unrotated around the rotated part"""
+        part = SVGPart.fromfile(test_file_path('map4_rect.svg'), rotate=True)
+        group = part.generate_group(margin_width=10, border_width=2, x=5, y=5)
+        self.assertEqual(group.root.get('transform'), 'translate(5 5)')
+
+        wrapper, rect = group.root
+        self.assertEqual(wrapper.get('transform'), 'matrix(0 1 -1 0 110 10)')
+        self.assertEqual((rect.get('width'), rect.get('height')), ('118', '418'))
 
     def test_scaling(self):
         #TODO: Do some scaling testing
@@ -163,6 +198,18 @@ class SVGMapperTest(TestCase):
 
         self.assertNotEqual(svg_rotated, svg_normal)
 
+    def test_svg_rotation_angle(self):
+        """Test svg rotated any angle must fit its bounding box"""
+        # 400x100 rotated 30 degrees is 396.4x286.6
+        with self.assertRaises(ValueError):
+            self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'),
+                    600, 0, rotate=30)
+        self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'),
+                580, 0, rotate=30, uid='rotated')
+
+        svg = self.mapper.to_svg()
+        self.assertIn(b'matrix(0.866025 0.5 -0.5 0.866025', svg)
+
     def test_dpi_conversion(self):
         """Test dpi is used to convert svg dimmensions from in and cm to
         pixels"""
@@ -187,3 +234,447 @@ class SVGMapperTest(TestCase):
         os.remove(filepath)
         self.assertFalse(os.path.exists(filepath))
 
+
+    def test_dedup_symbols(self):
+        """Test repeated parts are output once as a symbol and placed
+        with use elements, rescaled parts share the symbol"""
+        for y in (0, 150, 300):
+            self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'), 0, y)
+        self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'), 0, 450,
+                width=200, height=50)
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 500, 500)
+        
+        svg = self.mapper.to_svg(dedup=True)
+        self.assertEqual(svg.count(b'<symbol'), 2)
+        self.assertEqual(svg.count(b'<use'), 5)
+        self.assertEqual(svg.count(b'<rect width="300"'), 1)
+
+        # The scale is applied by each use
+        root = etree.fromstring(svg)
+        uses = root.findall('.//'+tf.SVG+'use')
+        hrefs = set(use.get(tf.XLINK+'href') for use in uses[:4])
+        self.assertEqual(len(hrefs), 1)
+        self.assertEqual((uses[3].get('width'), uses[3].get('height')),
+                ('200', '50'))
+
+    def test_dedup_ids(self):
+        """Test ids inside symbols are prefixed and references rewritten,
+        identical definitions are shared by both symbols"""
+        svg = (b'<svg xmlns="http://www.w3.org/2000/svg" width="{}" height="10">'
+               b'<defs><linearGradient id="grad"/></defs>'
+               b'<rect width="10" height="10" fill="url(#grad)"/></svg>')
+        self.mapper.add_svg_fromstring(svg.replace(b'{}', b'10'), 0, 0)
+        self.mapper.add_svg_fromstring(svg.replace(b'{}', b'20'), 0, 100)
+
+        result = self.mapper.to_svg(dedup=True)
+        self.assertNotIn(b'id="grad"', result)
+        self.assertEqual(result.count(b'<linearGradient'), 1)
+        self.assertIn(b'id="svgmapper-src0-grad"', result)
+        self.assertEqual(result.count(b'url(#svgmapper-src0-grad)'), 2)
+
+    def test_save_to_stream(self):
+        """Test resulting svg can be written into a binary stream"""
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+        
+        stream = BytesIO()
+        self.mapper.to_svg(stream, pretty_print=False)
+        self.assertEqual(stream.getvalue(), 
+                self.mapper.to_svg(pretty_print=False))
+        self.assertTrue(b'circle' in stream.getvalue())
+
+    def test_check_overlap(self):
+        """Test overlapping parts are rejected when enabled"""
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 100, 100)
+        
+        with self.assertRaises(ValueError):
+            self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 
+                    410, 0, check_overlap=True)
+        
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'),
+                520, 520, check_overlap=True)
+        self.assertEqual(len(self.mapper.parts), 3)
+
+    def test_parts_in_rect(self):
+        """Test parts overlapping a rectangle are found"""
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0, uid='a')
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 500, 500,
+                uid='b')
+
+        uids = lambda parts: [p[3] for p in parts]
+        self.assertEqual(uids(self.mapper.parts_in_rect(0, 0, 10, 10)), ['a'])
+        self.assertEqual(uids(self.mapper.parts_in_rect(400, 400, 200, 200)), 
+                ['a', 'b'])
+        self.assertEqual(uids(self.mapper.parts_in_rect(420, 0, 10, 10)), [])
+
+    def test_find_free_slot(self):
+        """Test free slots can be used to add parts without overlaps"""
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+
+        x, y = self.mapper.find_free_slot(400, 400)
+        self.mapper.add_svg_fromfile(test_file_path('map1.svg'), x, y,
+                check_overlap=True)
+        self.assertEqual((x, y), (420, 0))
+        self.assertIsNone(self.mapper.find_free_slot(900, 900))
+
+    def test_add_svgs(self):
+        """Test batch additions keep order and report errors per svg"""
+        errors = self.mapper.add_svgs([
+            (test_file_path('map1.svg'), 0, 0, {'uid': 'first'}),
+            (b'not a svg', 0, 0),
+            (test_file_path('map1.svg'), 900, 900),
+            (test_file_path('map2.svg'), 500, 500, {'uid': 'last'}),
+            (test_file_path('map2.svg'), 500, 500, {'check_overlap': True}),
+        ], workers=2)
+
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], ValueError)
+        self.assertIsInstance(errors[2], ValueError)
+        self.assertIsNone(errors[3])
+        self.assertIsInstance(errors[4], ValueError)
+        self.assertEqual([p[3] for p in self.mapper.parts], ['first', 'last'])
+
+
+class PartEditTest(TestCase):
+
+    def setUp(self):
+        self.mapper = SVGMapper(2000, 2000, incremental=True)
+        for i in range(4):
+            self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'),
+                    0, 200*i, uid='part{}'.format(i))
+
+    def expected(self, **kwargs):
+        """Output of a non incremental mapper with the same parts"""
+        mapper = self.mapper.new_sheet()
+        mapper.incremental = False
+        mapper._table = self.mapper._table
+        return mapper.to_svg(**kwargs)
+
+    def test_move_part(self):
+        self.mapper.move_part('part1', 500, 500)
+        self.assertEqual(self.mapper.parts[1][1:], (500, 500, 'part1'))
+        self.mapper.move_part(0, 1000, 0)
+        self.assertEqual(self.mapper.parts[0][1:3], (1000, 0))
+
+        with self.assertRaises(ValueError):
+            self.mapper.move_part('part2', 1900, 0)
+        with self.assertRaises(ValueError):
+            self.mapper.move_part('part2', 1000, 10, check_overlap=True)
+        with self.assertRaises(KeyError):
+            self.mapper.move_part('unknown', 0, 0)
+
+        # Moving over itself is not an overlap
+        self.mapper.move_part('part2', 10, 400, check_overlap=True)
+
+    def test_update_part(self):
+        self.mapper.update_part('part3', rotate=True, uid='rotated')
+        self.assertEqual(self.mapper.parts.rotation[3], 90)
+        self.assertEqual(self.mapper.parts[3][3], 'rotated')
+        self.assertEqual(self.mapper.parts.placed_size(3), (100, 400))
+
+        self.mapper.update_part(0, width=200, height=50)
+        self.assertEqual(self.mapper.parts.placed_size(0), (200, 50))
+
+        # Only the updated part is scaled
+        self.assertEqual(self.mapper.parts.placed_size(1), (400, 100))
+
+        # Invalid changes are not applied
+        with self.assertRaises(ValueError):
+            self.mapper.update_part(0, width=2000)
+        self.assertEqual(self.mapper.parts.placed_size(0), (200, 50))
+
+    def test_placements(self):
+        """Test placements are found by uid without generating output"""
+        self.mapper.move_part('part2', 500, 400)
+        placement = self.mapper.find_placement('part2')
+        self.assertEqual(placement.index, 2)
+        self.assertEqual((placement.x, placement.y), (500, 400))
+        self.assertEqual((placement.width, placement.height), (400, 100))
+        self.assertIs(placement.part, self.mapper.parts.part(2))
+
+        self.mapper.remove_part('part0')
+        placements = self.mapper.placements_by_uid()
+        self.assertEqual(sorted(placements), ['part1', 'part2', 'part3'])
+        self.assertEqual(placements['part3'].index, 2)
+        self.assertEqual(self.mapper.find_placement(0).uid, 'part1')
+
+        with self.assertRaises(KeyError):
+            self.mapper.find_placement('part0')
+
+    def test_remove_part(self):
+        part, x, y, uid = self.mapper.remove_part('part1')
+        self.assertEqual((x, y, uid), (0, 200, 'part1'))
+        self.assertEqual([p[3] for p in self.mapper.parts],
+                ['part0', 'part2', 'part3'])
+        self.assertEqual(self.mapper.parts_in_rect(0, 250, 10, 10), [])
+
+    def test_incremental_output(self):
+        """Test output after changes matches a full render"""
+        for options in ({}, {'dedup': True, 'pretty_print': False}):
+            self.assertEqual(self.mapper.to_svg(**options),
+                    self.expected(**options))
+
+            self.mapper.move_part('part0', 600, 0)
+            self.mapper.update_part('part1', rotate=90)
+            self.mapper.update_part('part2', width=200)
+            self.mapper.remove_part('part3')
+            self.mapper.border_width = 1
+            self.assertEqual(self.mapper.to_svg(**options),
+                    self.expected(**options))
+            self.setUp()
+
+    def test_fragments_reused(self):
+        """Test only changed parts are generated again"""
+        self.mapper.to_svg()
+        self.mapper.move_part('part0', 600, 0)
+
+        calls = []
+        original = SVGPart.generate_group
+        def generate_group(part, *args, **kwargs):
+            calls.append(part)
+            return original(part, *args, **kwargs)
+
+        SVGPart.generate_group = generate_group
+        try:
+            self.mapper.to_svg()
+        finally:
+            SVGPart.generate_group = original
+
+        self.assertEqual(calls, [self.mapper.parts[0][0]])
+
+
+class TilesTest(TestCase):
+
+    def setUp(self):
+        self.mapper = SVGMapper(1000, 1000)
+        self.mapper.margin_width = 0
+        # map4_rect.svg is 400x100
+        self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'), 0, 0,
+                uid='inside')
+        self.mapper.add_svg_fromfile(test_file_path('map4_rect.svg'),
+                450, 600, uid='crossing')
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_grid(self):
+        """Test edge tiles are cropped to the surface"""
+        tiles = list(self.mapper.tiles(400, 300))
+        self.assertEqual(len(tiles), 12)
+        self.assertEqual(tiles[0], (0, 0, 0, 0, 400, 300))
+        self.assertEqual(tiles[-1], (3, 2, 800, 900, 200, 100))
+
+    def test_culling(self):
+        """Test tiles only contain the parts overlapping them"""
+        tiles = self.mapper.to_tiles(500, 500, self.tmpdir)
+        self.assertEqual([(t.row, t.column, t.parts) for t in tiles],
+                [(0, 0, 1), (0, 1, 0), (1, 0, 1), (1, 1, 1)])
+
+        tile = tiles[3]
+        self.assertEqual(tile.output, os.path.join(self.tmpdir,
+            'tile-1-1.svg'))
+        root = etree.parse(tile.output).getroot()
+        self.assertEqual(root.get('viewBox'), '500 500 500 500')
+        self.assertEqual(root.get('width'), '500')
+
+        defs, content = root
+        clip = defs[0]
+        self.assertEqual(clip.tag, tf.SVG+'clipPath')
+        self.assertEqual(content.get('clip-path'),
+                'url(#{})'.format(clip.get('id')))
+        self.assertEqual([g.get('id') for g in content], ['crossing'])
+
+    def test_skip_empty(self):
+        tiles = self.mapper.to_tiles(500, 500, self.tmpdir, skip_empty=True)
+        self.assertEqual(len(tiles), 3)
+        self.assertEqual(sorted(os.listdir(self.tmpdir)),
+                ['tile-0-0.svg', 'tile-1-0.svg', 'tile-1-1.svg'])
+
+    def test_dedup(self):
+        """Test each tile only defines the symbols it uses"""
+        outputs = {}
+
+        class Output(BytesIO):
+            def close(self):
+                outputs[self.name] = self.getvalue()
+                BytesIO.close(self)
+
+        def sink(row, column):
+            stream = Output()
+            stream.name = (row, column)
+            return stream
+
+        self.mapper.to_tiles(500, 500, sink, dedup=True)
+        for position, count in (((0, 1), 0), ((1, 1), 1)):
+            root = etree.fromstring(outputs[position])
+            symbols = root.findall('.//'+tf.SVG+'symbol')
+            uses = root.findall('.//'+tf.SVG+'use')
+            self.assertEqual(len(symbols), count)
+            self.assertEqual(len(uses), count)
+
+
+class IdNamespaceTest(TestCase):
+
+    SVG_SOURCE = (b'<svg xmlns="http://www.w3.org/2000/svg" width="100" '
+        b'height="100"><defs><linearGradient id="grad">'
+        b'<stop offset="0" stop-color="{}"/></linearGradient></defs>'
+        b'<rect id="box" width="100" height="100" fill="url(#grad)"/></svg>')
+
+    def setUp(self):
+        self.mapper = SVGMapper(1000, 1000)
+        self.red = self.SVG_SOURCE.replace(b'{}', b'red')
+        self.blue = self.SVG_SOURCE.replace(b'{}', b'blue')
+        for i, svg in enumerate((self.red, self.blue, self.red)):
+            self.mapper.add_svg_fromstring(svg, 200*i, 0)
+
+    def test_collisions(self):
+        """Test ids of different sources don't collide, and definitions
+        are written once in a shared defs"""
+        root = etree.fromstring(self.mapper.to_svg())
+        defs = root[0]
+        self.assertEqual([e.get('id') for e in defs],
+                ['svgmapper-src0-grad', 'svgmapper-src1-grad'])
+        self.assertEqual(len(root.findall('.//'+tf.SVG+'linearGradient')), 2)
+
+        fills = [rect.get('fill') for rect in root.iter(tf.SVG+'rect')
+                if rect.get('id')]
+        self.assertEqual(fills, ['url(#svgmapper-src0-grad)',
+            'url(#svgmapper-src1-grad)', 'url(#svgmapper-src0-grad)'])
+
+    def test_merge_identical(self):
+        """Test identical definitions from different sources are merged"""
+        self.mapper.add_svg_fromstring(self.red.replace(b'width="100"',
+            b'width="50"', 1), 600, 0)
+        output = self.mapper.to_svg()
+        self.assertEqual(output.count(b'<linearGradient'), 2)
+        self.assertEqual(output.count(b'url(#svgmapper-src0-grad)'), 3)
+
+    def test_sources_restored(self):
+        """Test sources are left untouched once written"""
+        part = self.mapper.parts.part(0)
+        before = etree.tostring(part._figure.root)
+        self.mapper.to_svg()
+        self.mapper.to_svg(dedup=True)
+        self.assertEqual(etree.tostring(part._figure.root), before)
+
+    def test_incremental_and_tiles(self):
+        expected = self.mapper.to_svg()
+        self.mapper.incremental = True
+        self.assertEqual(self.mapper.to_svg(), expected)
+        self.assertEqual(self.mapper.to_svg(), expected)
+
+        outputs = {}
+        def sink(row, column):
+            stream = BytesIO()
+            stream.close = lambda: outputs.setdefault((row, column),
+                    stream.getvalue())
+            return stream
+
+        # Each tile only defines the gradients of its parts
+        self.mapper.to_tiles(150, 300, sink)
+        root = etree.fromstring(outputs[(0, 1)])
+        self.assertEqual([e.get('id') for e in root[0]][1:],
+                ['svgmapper-src1-grad'])
+
+    def test_repeated_placements(self):
+        """Test ids other than definitions are unique for each placement
+        of the same source"""
+        svg = (b'<svg xmlns="http://www.w3.org/2000/svg" '
+            b'xmlns:xlink="http://www.w3.org/1999/xlink" width="100" '
+            b'height="100"><rect id="r" width="10" height="10"/>'
+            b'<use xlink:href="#r" x="20"/></svg>')
+        mapper = SVGMapper(1000, 1000)
+        for i in range(3):
+            mapper.add_svg_fromstring(svg, 200*i, 0)
+        mapper.add_svg_fromstring(self.red, 0, 200)
+
+        href = '{http://www.w3.org/1999/xlink}href'
+        expected = mapper.to_svg()
+        root = etree.fromstring(expected)
+        ids = [e.get('id') for e in root.iter() if e.get('id')]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual([use.get(href) for use in
+            root.iter(tf.SVG+'use')], ['#svgmapper-src0.0-r',
+                '#svgmapper-src0.1-r', '#svgmapper-src0.2-r'])
+        # Sources placed once keep the source namespace
+        self.assertIn('svgmapper-src1-box', ids)
+
+        mapper.incremental = True
+        self.assertEqual(mapper.to_svg(), expected)
+        mapper.remove_part(0)
+        root = etree.fromstring(mapper.to_svg())
+        self.assertEqual([use.get(href) for use in
+            root.iter(tf.SVG+'use')], ['#svgmapper-src0.0-r',
+                '#svgmapper-src0.1-r'])
+
+        # Symbols are written once, their ids are already unique
+        root = etree.fromstring(mapper.to_svg(dedup=True))
+        ids = [e.get('id') for e in root.iter() if e.get('id')]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(len([i for i in ids if i.endswith('src0-r')]), 1)
+
+
+
+class LazyPartTest(TestCase):
+
+    def setUp(self):
+        self.files = ['map1.svg', 'map2.svg', 'map4_rect.svg', 'editor.svg']
+
+    def build(self, **kwargs):
+        mapper = SVGMapper(4000, 2400, **kwargs)
+        for i, filename in enumerate(self.files):
+            mapper.add_svg_fromfile(test_file_path(filename), 800*i, 0,
+                    uid=filename)
+            with open(test_file_path(filename), 'rb') as f:
+                mapper.add_svg_fromstring(f.read(), 800*i, 1200,
+                        rotate=(i%2 == 1))
+        return mapper
+
+    def test_output(self):
+        """Test lazy parts output is the same, and they are only loaded
+        while it's written"""
+        eager, lazy = self.build(), self.build(lazy=True)
+        self.assertEqual(lazy.parts.sources[0].get_size(),
+                eager.parts.sources[0].get_size())
+        self.assertFalse(any(p.loaded for p in lazy.parts.sources))
+
+        self.assertEqual(lazy.to_svg(), eager.to_svg())
+        self.assertEqual(lazy.to_svg(dedup=True), eager.to_svg(dedup=True))
+        self.assertFalse(any(p.loaded for p in lazy.parts.sources))
+
+        # Sources with the same content are shared
+        self.assertEqual(len(lazy.parts.sources), len(self.files))
+
+    def test_edit_and_tiles(self):
+        eager, lazy = self.build(), self.build(lazy=True)
+        for mapper in (eager, lazy):
+            mapper.update_part('map1.svg', width=200, height=100)
+        self.assertFalse(lazy.find_placement('map1.svg').part.loaded)
+        self.assertEqual(lazy.to_svg(), eager.to_svg())
+
+        outputs = []
+        for mapper in (eager, lazy):
+            streams = {}
+            def sink(row, column):
+                stream = BytesIO()
+                stream.close = lambda: None
+                streams[(row, column)] = stream
+                return stream
+            mapper.to_tiles(2000, 1500, sink)
+            outputs.append({k: v.getvalue() for k, v in streams.items()})
+        self.assertEqual(outputs[0], outputs[1])
+
+    def test_cache_and_errors(self):
+        cache = PartCache()
+        lazy = self.build(lazy=True, cache=cache)
+        self.assertEqual(cache.info().misses, 0)
+        self.assertEqual(lazy.to_svg(), self.build().to_svg())
+        self.assertEqual(cache.info().misses, len(self.files))
+
+        # Only the root element is read when added
+        mapper = SVGMapper(1000, 1000, lazy=True)
+        mapper.add_svg_fromstring(b'<svg xmlns="http://www.w3.org/2000/svg" '
+            b'width="10" height="10"><g></svg>', 0, 0)
+        with self.assertRaises(ValueError):
+            mapper.to_svg()
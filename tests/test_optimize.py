@@ -0,0 +1,109 @@
+from unittest import TestCase
+import os
+from lxml import etree
+from svgmapper.mapper import SVGMapper
+from svgmapper.optimize import (Optimizer, format_decimal, round_numbers,
+        shorten_path, shorten_style, remove_unused_defs)
+import svgmapper.transform as tf
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+class OptimizeTest(TestCase):
+
+    def test_numbers(self):
+        self.assertEqual(format_decimal(0.5), '.5')
+        self.assertEqual(format_decimal(-0.0001), '0')
+        self.assertEqual(format_decimal(10.123456, 2), '10.12')
+        self.assertEqual(format_decimal(1e-7, 8), '.0000001')
+        self.assertEqual(round_numbers('translate(10.0000 -0.50)'),
+                'translate(10 -.5)')
+
+        # Colors and ids are not numbers
+        self.assertEqual(round_numbers('#000000 url(#a2)'), '#000000 url(#a2)')
+
+    def test_path(self):
+        self.assertEqual(shorten_path('M 10.0000,20.5 L -3.25,0.5 0.25 0.5'),
+                'M10 20.5L-3.25.5.25.5')
+        self.assertEqual(shorten_path('10,20 30.5,40'), '10 20 30.5 40')
+
+        # Arc flags can be written without separators
+        self.assertEqual(shorten_path('a25,25 -30 0,1 50,-25'),
+                'a25 25-30 01 50-25')
+        self.assertEqual(shorten_path('A1 1 0 1110 10'), 'A1 1 0 11 10 10')
+
+    def test_style(self):
+        self.assertEqual(shorten_style('stroke:blue; stroke-width:0.10;'
+            'fill-opacity:0.0;stroke-opacity:1.0'),
+            'stroke:blue;stroke-width:.1;fill-opacity:0')
+
+    def test_unused_defs(self):
+        root = etree.fromstring('<svg xmlns="http://www.w3.org/2000/svg" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink"><defs>'
+            '<linearGradient id="a" xlink:href="#b"/>'
+            '<linearGradient id="b"/><linearGradient id="c"/>'
+            '<style>rect {fill: url(#d)}</style><linearGradient id="d"/>'
+            '</defs><rect style="fill:url(#a)"/></svg>')
+        self.assertEqual(remove_unused_defs(root), 1)
+        self.assertEqual([e.get('id') for e in root[0]],
+                ['a', 'b', None, 'd'])
+
+        # Definitions written on their own are kept
+        defs = etree.fromstring('<defs xmlns="http://www.w3.org/2000/svg">'
+            '<symbol id="s"/></defs>')
+        self.assertEqual(remove_unused_defs(defs), 0)
+
+    def test_editor_data(self):
+        """Test comments, metadata, editor data and whitespace are removed"""
+        root = etree.parse(test_file_path('editor.svg')).getroot()
+        optimized = Optimizer().optimize(root)
+        self.assertEqual(len(root), 4)
+
+        output = etree.tostring(optimized).decode()
+        for removed in ('inkscape', 'sodipodi', 'metadata', 'unused', '<!--',
+                'xmlns:dc', '\n'):
+            self.assertNotIn(removed, output)
+
+        self.assertEqual(optimized.get('viewBox'), '0 0 210 297')
+        defs, layer = optimized
+        self.assertEqual([e.get('id') for e in defs], ['used'])
+        path, text = layer
+        self.assertEqual(path.get('d'), 'M10.583 20.411L100-20.5Z')
+        self.assertEqual(text.text, ' keep  me ')
+
+    def test_mapper_output(self):
+        """Test the optimized output keeps the same parts, and the bytes
+        saved are reported"""
+        mapper = SVGMapper(2000, 2000)
+        mapper.add_svg_fromfile(test_file_path('editor.svg'), 0, 0)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 1000, 0,
+                uid='map1')
+
+        optimizer = Optimizer()
+        output = mapper.to_svg(optimize=optimizer)
+        plain = mapper.to_svg()
+        self.assertLess(len(output), len(plain))
+
+        report = optimizer.report()
+        self.assertEqual(report.elements, 3)
+        self.assertEqual(report.saved, report.original-report.optimized)
+        self.assertGreater(report.saved, 0)
+
+        # Referenced gradients are moved to the shared defs
+        root = etree.fromstring(output)
+        defs, part, last = root
+        self.assertEqual([e.get('id') for e in defs],
+                ['svgmapper-src0-used', 'svgmapper-src0-unused2'])
+        self.assertEqual(last.get('id'), 'map1')
+        self.assertNotIn(b'-unused"', output)
+
+        # Symbols are kept when deduplicating
+        output = mapper.to_svg(dedup=True, optimize=True)
+        root = etree.fromstring(output)
+        self.assertEqual(len(root.findall(tf.SVG+'defs/'+tf.SVG+'symbol')),
+                2)
@@ -0,0 +1,47 @@
+from unittest import TestCase
+import random
+
+from svgmapper.spatial import GridIndex, boxes_overlap
+
+
+
+class GridIndexTest(TestCase):
+
+    def test_query(self):
+        """Test query returns the same boxes as checking all of them"""
+        random.seed(3)
+        index = GridIndex(50)
+        boxes = {}
+        for i in range(200):
+            x, y = random.uniform(0, 1000), random.uniform(0, 1000)
+            boxes[i] = (x, y, x+random.uniform(1, 120), y+random.uniform(1, 120))
+            index.insert(i, boxes[i])
+
+        for query in [(0, 0, 10, 10), (100, 200, 400, 300), (-5, -5, 2000, 2000)]:
+            expected = {k for k, b in boxes.items() if boxes_overlap(query, b)}
+            self.assertEqual(index.query(query), expected)
+            self.assertEqual(index.intersects(query), bool(expected))
+
+    def test_touching(self):
+        """Test boxes sharing an edge don't overlap"""
+        index = GridIndex(10)
+        index.insert('a', (0, 0, 10, 10))
+        self.assertFalse(index.intersects((10, 0, 20, 10)))
+        self.assertTrue(index.intersects((9.5, 0, 20, 10)))
+
+    def test_remove(self):
+        index = GridIndex(10)
+        index.insert('a', (0, 0, 30, 30))
+        index.remove('a')
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.query((0, 0, 100, 100)), set())
+
+    def test_free_position(self):
+        """Test free position is the nearest one without overlaps"""
+        index = GridIndex(10)
+        index.insert('a', (0, 0, 50, 50))
+        bounds = (0, 0, 100, 100)
+
+        self.assertEqual(index.free_position(20, 20, bounds), (50, 0))
+        self.assertEqual(index.free_position(20, 20, bounds, 0, 90), (0, 50))
+        self.assertIsNone(index.free_position(60, 60, bounds))
@@ -0,0 +1,111 @@
+from unittest import TestCase
+import os
+from lxml import etree
+from svgmapper.cache import PartCache
+from svgmapper.mapper import SVGMapper
+from svgmapper.splice import source_body, has_id_attributes
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+def same_tree(a, b):
+    """Compare elements ignoring namespace declarations and whitespace"""
+    if a.tag != b.tag or dict(a.attrib) != dict(b.attrib) or \
+            len(a) != len(b):
+        return False
+    if (a.text or '').strip() != (b.text or '').strip() or \
+            (a.tail or '').strip() != (b.tail or '').strip():
+        return False
+    return all(same_tree(x, y) for x, y in zip(a, b))
+
+
+
+class SpliceTest(TestCase):
+
+    def test_source_body(self):
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg"><g/></svg>'
+        prolog = (b'\xef\xbb\xbf<?xml version="1.0" encoding="UTF-8"?>\n'
+            b'<!-- comment --><?pi data?>\n<!DOCTYPE svg PUBLIC '
+            b'"-//W3C//DTD SVG 1.1//EN" "svg11.dtd">\n')
+        self.assertEqual(bytes(source_body(svg)), svg)
+        self.assertEqual(bytes(source_body(prolog+svg+b'\n<!-- end -->\n')),
+                svg)
+
+        # Other encodings and internal subsets can't be copied
+        self.assertIsNone(source_body(b'<?xml version="1.0" '
+            b'encoding="ISO-8859-1"?>'+svg))
+        self.assertIsNone(source_body(b'<!DOCTYPE svg [<!ENTITY a "b">]>'+
+            svg))
+        self.assertIsNone(source_body(b'text'+svg))
+        self.assertIsNone(source_body(b'<!-- unclosed '+svg))
+
+    def test_ids(self):
+        self.assertTrue(has_id_attributes(b'<svg><g\nid="a"/></svg>'))
+        self.assertTrue(has_id_attributes(b'<svg><g xml:id = "a"/></svg>'))
+        self.assertFalse(has_id_attributes(b'<svg><g uid="a"/></svg>'))
+
+    def test_output(self):
+        """Test spliced output is equivalent to the serialized one, parts
+        with ids are serialized"""
+        mapper = SVGMapper(4000, 3000)
+        mapper.border_width = 2
+        for i, filename in enumerate(['map1.svg', 'map2.svg', 'editor.svg']):
+            mapper.add_svg_fromfile(test_file_path(filename), 1000*i, 0,
+                    uid=filename)
+            with open(test_file_path(filename), 'rb') as f:
+                mapper.add_svg_fromstring(f.read(), 1000*i, 1500, rotate=30)
+
+        self.assertIsNotNone(mapper.parts.part(0).splice_body())
+        self.assertIsNone(mapper.parts.part(4).splice_body())
+
+        for pretty_print in (False, True):
+            serialized = mapper.to_svg(pretty_print=pretty_print)
+            spliced = mapper.to_svg(pretty_print=pretty_print, splice=True)
+            self.assertTrue(same_tree(etree.fromstring(serialized),
+                etree.fromstring(spliced)))
+
+    def test_lazy_not_parsed(self):
+        cache = PartCache()
+        mapper = SVGMapper(1000, 1000, lazy=True, cache=cache)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 500, 0)
+
+        output = mapper.to_svg(splice=True)
+        self.assertEqual(cache.info().misses, 0)
+        self.assertEqual(output.count(b'<svg'), 5)
+
+        # Optimized output is serialized
+        mapper.to_svg(splice=True, optimize=True)
+        self.assertEqual(cache.info().misses, 1)
+
+    def test_source_not_read(self):
+        """Test lazy sources are only read for splicing"""
+        mapper = SVGMapper(1000, 1000, lazy=True)
+        mapper.add_svg_fromfile(test_file_path('map1.svg'), 0, 0)
+        part = mapper.parts.part(0)
+
+        mapper._namespace_ids()
+        self.assertIsNone(part._body)
+        mapper._restore_ids()
+
+        mapper._namespace_ids(splice=True)
+        self.assertTrue(part._body)
+        mapper._restore_ids()
+
+    def test_cached_sources(self):
+        """Test parts loaded through a cache are spliced"""
+        with open(test_file_path('map1.svg'), 'rb') as f:
+            svg = f.read()
+        mapper = SVGMapper(1000, 1000, cache=PartCache())
+        mapper.add_svg_fromstring(svg, 0, 0)
+        mapper.add_svg_fromfile(test_file_path('map2.svg'), 500, 0)
+
+        for part in mapper.parts.sources:
+            self.assertIsNotNone(part.source)
+        body = bytes(source_body(svg))
+        self.assertIn(body, mapper.to_svg(splice=True))
+        self.assertNotIn(body, mapper.to_svg())
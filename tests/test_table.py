@@ -0,0 +1,80 @@
+from unittest import TestCase
+import os
+
+import svgmapper.table as table
+from svgmapper.mapper import SVGPart
+from svgmapper.table import PartTable
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+
+class PartTableTest(TestCase):
+
+    def setUp(self):
+        self.table = PartTable()
+        for i in range(3):
+            part = SVGPart.fromfile(test_file_path('map4_rect.svg'),
+                    rotate=(i == 1))
+            self.table.append(part, 500*i, 10, 'part{}'.format(i))
+        self.scaled = SVGPart.fromfile(test_file_path('map4_rect.svg'),
+                scaled_width=40, scaled_height=10)
+        self.table.append(self.scaled, 0, 200, rotation=45)
+
+    def test_sources(self):
+        """Test parts with the same content and scale share a source"""
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(len(self.table.sources), 2)
+        self.assertEqual(list(self.table.source), [0, 0, 0, 1])
+        self.assertEqual(list(self.table.rotation), [0, 90, 0, 45])
+        self.assertIs(self.table[3][0], self.scaled)
+        self.assertEqual(self.table[1][1:], (500, 10, 'part1'))
+
+    def test_update_pop(self):
+        self.table.update(0, x=5, y=6, rotation=180, uid='moved')
+        self.assertEqual(self.table.row(0), (0, 5, 6, 180, 'moved'))
+
+        part, x, y, uid = self.table.pop(1)
+        self.assertEqual((x, y, uid), (500, 10, 'part1'))
+        self.assertEqual([r[4] for r in self.table.rows()],
+                ['moved', 'part2', None])
+
+    def test_uid_positions(self):
+        """Test uid positions follow appends, updates and removals"""
+        self.assertEqual(self.table.find_uid('part2'), 2)
+        self.table.append(self.scaled, 0, 0, 'part2')
+        self.table.append(self.scaled, 0, 0, 'last')
+        self.assertEqual(self.table.find_uid('part2'), 2)
+        self.assertEqual(self.table.find_uid('last'), 5)
+
+        self.table.pop(0)
+        self.assertEqual(self.table.find_uid('last'), 4)
+        self.table.update(1, uid='renamed')
+        self.assertEqual(self.table.find_uid('part2'), 3)
+        self.assertIsNone(self.table.find_uid('part0'))
+
+    def test_bounding_boxes(self):
+        """Test vectorized and pure python boxes are the same"""
+        expected = [(0, 10, 420, 130), (500, 10, 620, 430),
+                (1000, 10, 1420, 130)]
+
+        boxes = list(zip(*self.table.bounding_boxes(10)))
+        self.assertEqual([tuple(b) for b in boxes[:3]], expected)
+        # 40x10 rotated 45 degrees plus margins
+        self.assertAlmostEqual(boxes[3][2], 50/2**0.5+20)
+
+        numpy = table.numpy
+        table.numpy = None
+        try:
+            python_boxes = list(zip(*self.table.bounding_boxes(10)))
+            area = self.table.used_area(10)
+        finally:
+            table.numpy = numpy
+
+        self.assertEqual(python_boxes[:3], expected)
+        self.assertAlmostEqual(python_boxes[3][2], boxes[3][2])
+        self.assertAlmostEqual(area, self.table.used_area(10))
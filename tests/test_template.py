@@ -0,0 +1,153 @@
+from unittest import TestCase
+import json
+import os
+import shutil
+import tempfile
+from lxml import etree
+from svgmapper.mapper import SVGMapper
+from svgmapper.template import (Template, TemplateSchema, compile_expression,
+        TEMPLATE_NAMESPACE)
+import svgmapper.transform as tf
+
+
+
+def test_file_path(filename=""):
+    basepath = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(basepath, 'data/', filename)
+
+
+def template(content):
+    return ('<svg xmlns="http://www.w3.org/2000/svg" xmlns:t="{}" '
+            'width="{{{{w}}}}" height="20">{}</svg>'.format(
+                TEMPLATE_NAMESPACE, content)).encode()
+
+
+
+class TemplateTest(TestCase):
+
+    def setUp(self):
+        self.template = Template.fromfile(test_file_path('template1.svg'))
+
+    def test_render(self):
+        root = etree.fromstring(self.template.render({'holes': 3}))
+        self.assertEqual(root.get('viewBox'), '0 0 100 80')
+        self.assertEqual(root.nsmap, {None: tf.SVG_NAMESPACE})
+        circles = root.findall(tf.SVG+'circle')
+        self.assertEqual([c.get('cx') for c in circles], ['25', '50', '75'])
+        self.assertEqual(circles[0].get('r'), '8')
+
+        # Nested repetitions with named indexes
+        nested = Template(template('<g t:repeat="2" t:index="row">'
+            '<rect t:repeat="w" x="{{i}}" y="{{row*10}}"/></g>'))
+        root = etree.fromstring(nested.render({'w': 3}))
+        self.assertEqual([(r.get('x'), r.get('y')) for r in
+            root.iter(tf.SVG+'rect')], [('0', '0'), ('1', '0'), ('2', '0'),
+                ('0', '10'), ('1', '10'), ('2', '10')])
+        self.assertEqual(nested.parameters, frozenset(['w']))
+
+    def test_schema(self):
+        validate = self.template.validate
+        self.assertEqual(validate({'holes': 2}),
+                {'holes': 2, 'width': 100, 'height': 80})
+
+        for params in ({}, {'holes': 5}, {'holes': 2.5}, {'holes': True},
+                {'holes': 2, 'width': 151}, {'holes': 2, 'height': '85'}):
+            with self.assertRaises(ValueError):
+                validate(params)
+
+        schema = TemplateSchema({'properties': {'a': {'type': 'integer',
+            'exclusiveMinimum': 0, 'multipleOf': 2}},
+            'additionalProperties': False})
+        self.assertEqual(schema.validate({'a': 4}), {'a': 4})
+        for params in ({'a': 0}, {'a': 3}, {'a': 2, 'b': 1}):
+            with self.assertRaises(ValueError):
+                schema.validate(params)
+
+        with self.assertRaises(ValueError):
+            TemplateSchema({'properties': {'a': {'pattern': '.*'}}})
+
+        # Templates can only use the parameters in the schema
+        with self.assertRaises(ValueError):
+            Template(template('<rect x="{{z}}"/>'), {'properties':
+                {'w': {'type': 'number'}}})
+
+    def test_expressions(self):
+        self.assertEqual(compile_expression(' max(a, 2)*-b '),
+                ('max(a, 2) * -b', set(['a', 'b'])))
+        for expression in ('__import__("os")', 'a.real', 'a[0]', '"a"',
+                'open(a)', 'lambda: 1', 'a if b else c', '_a'):
+            with self.assertRaises(ValueError):
+                compile_expression(expression)
+
+        with self.assertRaises(ValueError):
+            Template(template('<rect x="{{1 +}}"/>'))
+
+        # Comparisons
+        self.assertEqual(compile_expression('(a >= 2)*10'),
+                ('(a >= 2) * 10', set(['a'])))
+        compare = Template(template('<rect x="{{(w > 2)*10}}" '
+            'y="{{1 &lt; w &lt;= 4}}"/>'))
+        self.assertIn(b'<rect x="10" y="true"/>', compare.render({'w': 3}))
+        self.assertIn(b'<rect x="0" y="false"/>', compare.render({'w': 1}))
+
+        # Values are escaped
+        text = Template(template('<text>{{w}}</text>'))
+        self.assertIn(b'<text>a&lt;b&amp;&quot;</text>',
+                text.render({'w': 'a<b&"'}))
+
+    def test_variants(self):
+        first = self.template.variant({'holes': 3, 'width': 120})
+        self.assertEqual((first.width, first.height), (120, 80))
+        self.assertIs(self.template.variant({'holes': 3, 'width': 120}),
+                first)
+        self.assertIsNot(self.template.variant({'holes': 3, 'width': 120.0}),
+                first)
+
+        info = self.template.info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 2, 2))
+
+        with self.assertRaises(ValueError):
+            self.template.variant({'holes': [1, 2]})
+
+        self.template.max_variants = 1
+        self.template.variant({'holes': 2})
+        self.assertEqual(self.template.info().entries, 1)
+
+    def test_mapper(self):
+        mapper = SVGMapper(1000, 1000)
+        for i in range(4):
+            mapper.add_template(self.template, 200*i, 0,
+                    {'holes': 2+i%2}, uid=str(i))
+        mapper.add_template(self.template, 0, 200, {'holes': 4},
+                width=300, height=160, rotate=True)
+
+        self.assertEqual(len(mapper.parts.sources), 3)
+        part = mapper.find_placement('0').part
+        self.assertEqual(part.get_size(), (100, 80))
+        self.assertFalse(part.loaded)
+
+        spliced = etree.fromstring(mapper.to_svg(splice=True))
+        serialized = etree.fromstring(mapper.to_svg())
+        self.assertEqual(len(serialized.findall('.//'+tf.SVG+'circle')), 14)
+        self.assertEqual(len(spliced.findall('.//'+tf.SVG+'circle')), 14)
+
+        with self.assertRaises(ValueError):
+            mapper.add_template(self.template, 0, 500, {'holes': 1})
+
+    def test_schema_file(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmpdir, 'plate.svg')
+            shutil.copy(test_file_path('template1.svg'), path)
+            with open(os.path.join(tmpdir, 'plate.schm'), 'w') as f:
+                f.write('{"properties": {"holes": {"type": "integer"},}}')
+            with self.assertRaises(ValueError):
+                Template.fromfile(path)
+
+            with open(os.path.join(tmpdir, 'plate.schm'), 'w') as f:
+                json.dump({"properties": {"holes": {"type": "integer"},
+                    "width": {"default": 10}, "height": {"default": 10}}}, f)
+            self.assertEqual(Template.fromfile(path).variant(
+                {'holes': 7}).width, 10)
+        finally:
+            shutil.rmtree(tmpdir)
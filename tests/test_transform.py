@@ -1,6 +1,8 @@
 from unittest import TestCase, skip
+from io import BytesIO
 import os
 
+from lxml import etree
 from svgmapper.transform import *
 
 
@@ -30,5 +32,152 @@ class SVGFigureTest(TestCase):
         part = SVGFigure.fromfile(test_file_path('dimension.svg'))
         self.assertEqual((800, 600), part.get_size())
 
+    def test_find_id(self):
+        """Test ids are found through the index as elements are added"""
+        figure = SVGFigure('100', '100')
+        figure.append(GroupElement([], {'id': 'first'}))
+        self.assertEqual(figure.find_id('first').root.get('id'), 'first')
 
+        second = GroupElement([RectElement(0, 0, 1, 1)], {'id': 'second'})
+        second.root[0].set('id', 'rect')
+        figure.append(second)
+        figure.append(GroupElement([], {'id': 'first'}))
+        found = figure.find_ids(['rect', 'missing', 'first'])
+        self.assertEqual(found[0].root.tag, SVG+'rect')
+        self.assertIsNone(found[1])
+        self.assertIs(found[2].root, figure.root[0])
+
+        with self.assertRaises(IndexError):
+            figure.find_id('missing')
+
+        # Removed elements aren't found
+        figure.root.remove(second.root)
+        self.assertIsNone(figure.find_ids(['rect'])[0])
+
+        # Ids added directly need reindexing
+        figure.root[0].set('id', 'renamed')
+        figure.reindex()
+        self.assertIs(figure.find_id('renamed').root, figure.root[0])
+
+
+
+
+class SVGStreamWriterTest(TestCase):
+
+    def test_stream(self):
+        """Test elements written into a stream form a valid document"""
+        stream = BytesIO()
+        figure = SVGFigure('100', '200')
+        with SVGStreamWriter(stream, figure.root) as writer:
+            writer.write(GroupElement([RectElement(0, 0, 10, 10)]))
+            writer.write(RectElement(10, 10, 10, 10))
+
+        root = etree.fromstring(stream.getvalue())
+        self.assertEqual(root.get('height'), '200')
+        self.assertEqual(len(root), 2)
+        self.assertEqual(root[0][0].tag, SVG+'rect')
+
+    def test_namespace_declarations(self):
+        """Test namespaces already declared by the root are not repeated"""
+        writer = SVGStreamWriter(BytesIO(), SVGFigure().root)
+        fragment = writer.tostring(GroupElement([UseElement('id', 1, 1)]))
+        self.assertNotIn(b'xmlns', b"".join(fragment))
+        self.assertEqual(fragment_size(fragment), len(b"".join(fragment)))
+
+        # Only the start tag is copied
+        self.assertIsInstance(fragment[-1], memoryview)
+        self.assertTrue(bytes(fragment[-1]).startswith(b'><use'))
+
+    def test_pretty_print(self):
+        """Test pretty print can be disabled"""
+        for pretty_print in (True, False):
+            stream = BytesIO()
+            with SVGStreamWriter(stream, SVGFigure().root, pretty_print) as w:
+                w.write(GroupElement([RectElement(0, 0, 10, 10)]))
+            self.assertEqual(b'\n  <rect' in stream.getvalue(), pretty_print)
+
+
+class MatrixTest(TestCase):
+
+    def test_compose(self):
+        """Test transforms are composed in svg order"""
+        matrix = parse_transform('translate(10,20) rotate(90 5 5) scale(2)')
+        self.assertEqual(matrix, Matrix(0, 2, -2, 0, 20, 20))
+        self.assertEqual(matrix.tostring(), 'matrix(0 2 -2 0 20 20)')
+        self.assertEqual(parse_transform('translate(1.5) translate(0 2)'),
+                Matrix.translate(1.5, 2))
+        self.assertTrue(parse_transform(None).is_identity())
+
+        with self.assertRaises(ValueError):
+            parse_transform('rotate(1 2)')
+
+    def test_element_transform(self):
+        """Test element operations are kept as a single transform"""
+        element = GroupElement([])
+        element.moveto(10, 10)
+        element.rotate(90)
+        element.scale(2, 3)
+        self.assertEqual(element.root.get('transform'),
+                'matrix(0 2 -3 0 10 10)')
+
+        element.set_matrix(Matrix())
+        self.assertIsNone(element.root.get('transform'))
+
+    def test_rotated_size(self):
+        self.assertEqual(rotated_size(40, 10, True), (10, 40))
+        self.assertEqual(rotated_size(40, 10, 180), (40, 10))
+        self.assertEqual(rotated_size(40, 10, False), (40, 10))
+        width, height = rotated_size(40, 10, 30)
+        self.assertAlmostEqual(width, 39.641016, places=5)
+        self.assertAlmostEqual(height, 28.660254, places=5)
+
+
+class IdIndexTest(TestCase):
+
+    SVG_SOURCE = (b'<svg xmlns="http://www.w3.org/2000/svg" '
+        b'xmlns:xlink="http://www.w3.org/1999/xlink">'
+        b'<defs><linearGradient id="a" xlink:href="#b"/>'
+        b'<linearGradient id="b"/><linearGradient id="c"/>'
+        b'<style>rect {fill: url(#a)}</style></defs>'
+        b'<rect id="r" style="fill:url(#a)"/><use xlink:href="#r"/></svg>')
+
+    def test_rename(self):
+        """Test ids are always renamed from their original value"""
+        root = etree.fromstring(self.SVG_SOURCE)
+        index = IdIndex(root)
+        self.assertEqual(index.ids, {'a', 'b', 'c', 'r'})
+
+        index.rename('x-')
+        index.rename('y-', {'a': 'shared'})
+        text = etree.tostring(root)
+        self.assertIn(b'id="shared"', text)
+        self.assertIn(b'xlink:href="#y-b"', text)
+        self.assertIn(b'fill: url(#shared)', text)
+        self.assertIn(b'style="fill:url(#shared)"', text)
+        self.assertIn(b'xlink:href="#y-r"', text)
+        self.assertNotIn(b'x-', text)
+
+        index.rename()
+        self.assertEqual(etree.tostring(root), self.SVG_SOURCE)
+
+    def test_detach_definitions(self):
+        """Test only referenced definitions are detached, and restored
+        into their place"""
+        root = etree.fromstring(self.SVG_SOURCE)
+        index = IdIndex(root)
+        detached = index.detach_definitions()
+        self.assertEqual([e.get('id') for e in detached], ['a', 'b'])
+        self.assertEqual([e.get('id') for e in root[0]], ['c', None])
+
+        index.restore_definitions()
+        self.assertEqual(etree.tostring(root), self.SVG_SOURCE)
+
+        # Empty defs are detached too
+        root = etree.fromstring(b'<svg xmlns="http://www.w3.org/2000/svg">'
+                b'<defs><g id="a"/></defs><use href="#a"/></svg>')
+        index = IdIndex(root)
+        index.detach_definitions()
+        self.assertEqual(len(root), 1)
+        index.restore_definitions()
+        self.assertEqual(root[0][0].get('id'), 'a')
 
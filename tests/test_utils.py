@@ -1,7 +1,15 @@
 from unittest import TestCase
 import os
 
-from svgmapper.utils import svg_dimensions
+import shutil
+import tempfile
+
+from lxml import etree
+from svgmapper.utils import (svg_dimensions, element_dimensions,
+        svg_file_dimensions, parse_svg_file, file_digest, content_digest,
+        DimensionBackend, AttributeBackend, FallbackBackend,
+        register_dimension_backend, set_dimension_backend,
+        get_dimension_backend)
 
 
 class SVGDimensionsTest(TestCase):
@@ -61,3 +69,140 @@ class SVGDimensionsTest(TestCase):
         """Test an invalid svg raises an exception"""
         with self.assertRaises(ValueError):
             width, height = svg_dimensions("nothing to see")
+
+
+class ElementDimensionsTest(TestCase):
+
+    def dimensions(self, attributes, dpi=90.0):
+        svg = '<svg xmlns="http://www.w3.org/2000/svg" {}/>'.format(attributes)
+        return element_dimensions(etree.fromstring(svg), dpi)
+
+    def test_units(self):
+        """Test all supported units are converted to pixels"""
+        self.assertEqual(self.dimensions('width="10px" height="20"'), (10, 20))
+        self.assertEqual(self.dimensions('width="1in" height="2.54cm"'), (90, 90))
+        self.assertEqual(self.dimensions('width="25.4mm" height="72pt"'), (90, 90))
+        self.assertEqual(self.dimensions('width="6pc" height="1in"', 100), (100, 100))
+        self.assertEqual(self.dimensions('width="2em" height="2ex"', 72), (24, 12))
+
+    def test_viewbox(self):
+        """Test viewBox is used when width and height are missing, or
+        as reference for percentages"""
+        self.assertEqual(self.dimensions('viewBox="0 0 300 200"'), (300, 200))
+        self.assertEqual(self.dimensions('viewBox="0,0,300,200" '
+            'width="50%" height="100%"'), (150, 200))
+        self.assertEqual(self.dimensions('viewBox="0 0 300 200" '
+            'width="600"'), (600, 400))
+
+    def test_unresolvable(self):
+        """Test percentages without a viewBox can't be resolved"""
+        with self.assertRaises(ValueError):
+            self.dimensions('width="50%" height="100%"')
+
+    def test_matches_svg_dimensions(self):
+        """Test parsed and unparsed svg produce the same dimensions"""
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        for filename in ('dimension.svg', 'dimension_cm.svg',
+                'dimension_in.svg', 'dimension_viewport.svg'):
+            with open(os.path.join(base_path, 'data/', filename), 'br') as f:
+                svg = f.read()
+            self.assertEqual(svg_dimensions(svg, 100.0),
+                element_dimensions(etree.fromstring(svg), 100.0))
+
+
+class DimensionBackendTest(TestCase):
+
+    def tearDown(self):
+        set_dimension_backend(None)
+
+    def test_default(self):
+        """Test the default backend resolves dimensions from attributes"""
+        backend = get_dimension_backend()
+        self.assertIsInstance(backend, FallbackBackend)
+        self.assertIsInstance(backend.backends[0], AttributeBackend)
+
+    def test_select_by_name(self):
+        set_dimension_backend('attributes')
+        self.assertIsInstance(get_dimension_backend(), AttributeBackend)
+
+        svg = b'<svg xmlns="http://www.w3.org/2000/svg" width="10%"/>'
+        with self.assertRaises(ValueError):
+            svg_dimensions(svg)
+
+        with self.assertRaises(ValueError):
+            set_dimension_backend('unknown')
+
+    def test_custom_backend(self):
+        """Test registered backends are used by svg_dimensions"""
+        class FixedBackend(DimensionBackend):
+            name = 'fixed'
+            def dimensions(self, root, svg, dpi=90.0):
+                return 1, 2
+
+        register_dimension_backend(FixedBackend())
+        set_dimension_backend('fixed')
+        self.assertEqual(svg_dimensions(b'<svg/>'), (1, 2))
+
+        # A fallback chain with the custom backend last
+        set_dimension_backend(FallbackBackend([AttributeBackend(),
+            FixedBackend()]))
+        self.assertEqual(svg_dimensions(b'not xml'), (1, 2))
+        self.assertEqual(svg_dimensions(
+            b'<svg xmlns="http://www.w3.org/2000/svg" width="3" height="4"/>'),
+            (3, 4))
+
+
+class FileInputTest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def data_path(self, filename):
+        base_path = os.path.dirname(os.path.abspath(__file__))
+        return os.path.join(base_path, 'data/', filename)
+
+    def write(self, content):
+        path = os.path.join(self.tmpdir, 'file.svg')
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_file_dimensions(self):
+        """Test file sizing matches svg_dimensions"""
+        for filename in ('dimension.svg', 'dimension_cm.svg',
+                'dimension_in.svg', 'dimension_viewport.svg', 'map1.svg'):
+            path = self.data_path(filename)
+            with open(path, 'br') as f:
+                svg = f.read()
+            self.assertEqual(svg_file_dimensions(path, 100.0),
+                    svg_dimensions(svg, 100.0))
+            with open(path, 'br') as f:
+                self.assertEqual(svg_file_dimensions(f, 100.0),
+                        svg_dimensions(svg, 100.0))
+
+    def test_root_only(self):
+        """Test only the root element is read when sizing"""
+        path = self.write(b'<svg xmlns="http://www.w3.org/2000/svg" '
+                b'width="10" height="20"><g><broken')
+        self.assertEqual(svg_file_dimensions(path), (10, 20))
+        with self.assertRaises(etree.XMLSyntaxError):
+            parse_svg_file(path)
+
+        with self.assertRaises(ValueError):
+            svg_file_dimensions(self.write(b'nothing to see'))
+
+    def test_huge_tree(self):
+        """Test text nodes over libxml2 default limits are parsed"""
+        path = self.write(b'<svg xmlns="http://www.w3.org/2000/svg" '
+                b'width="10" height="20"><desc>' + b'a'*(11*1024*1024) +
+                b'</desc></svg>')
+        root = parse_svg_file(path)
+        self.assertEqual(len(root[0].text), 11*1024*1024)
+
+    def test_file_digest(self):
+        path = self.data_path('map1.svg')
+        with open(path, 'br') as f:
+            self.assertEqual(file_digest(path), content_digest(f.read()))
@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+import svgmapper.validation as validation
+from svgmapper.mapper import SVGMapper
+from svgmapper.validation import (validate_placements, INVALID_SIZE,
+        NEGATIVE_POSITION, OUT_OF_BOUNDS_X, OUT_OF_BOUNDS_Y)
+
+
+
+class ValidatePlacementsTest(TestCase):
+
+    # x, y, width, height, rotate, expected reasons
+    PLACEMENTS = [
+        (0, 0, 80, 80, False, 0),
+        (10, 10, 20, 60, True, 0),
+        (-1, 0, 10, 10, False, NEGATIVE_POSITION),
+        (50, 0, 60, 10, False, OUT_OF_BOUNDS_X),
+        (0, 0, 10, 90, True, OUT_OF_BOUNDS_X),
+        (0, 50, 10, 60, False, OUT_OF_BOUNDS_Y),
+        (0, 0, 0, 10, False, INVALID_SIZE),
+        (95, 95, 10, 10, False, OUT_OF_BOUNDS_X|OUT_OF_BOUNDS_Y),
+    ]
+
+    def validate(self, rotate=True):
+        x, y, width, height, rotation, _ = zip(*self.PLACEMENTS)
+        return validate_placements(x, y, width, height,
+                rotation if rotate else None, 100, 100, margin_width=10)
+
+    def check(self, result):
+        expected = [p[5] for p in self.PLACEMENTS]
+        self.assertEqual([int(r) for r in result.reasons], expected)
+        self.assertEqual([bool(v) for v in result.valid],
+                [r == 0 for r in expected])
+        self.assertFalse(result.all())
+        self.assertEqual(result.invalid(), [2, 3, 4, 5, 6, 7])
+
+        errors = dict(result.errors())
+        self.assertEqual(len(errors[7]), 2)
+        self.assertEqual(errors[2], ["Position must be positive"])
+
+    def test_validate(self):
+        self.check(self.validate())
+
+    def test_validate_without_numpy(self):
+        numpy = validation.numpy
+        validation.numpy = None
+        try:
+            self.check(self.validate())
+        finally:
+            validation.numpy = numpy
+
+    def test_angles(self):
+        """Test any angle is checked with its rotated bounding box"""
+        # 60x10 rotated 30 degrees is 56.96x38.66
+        result = validate_placements([0, 0], [0, 0], [60, 60], [10, 10],
+                [30, 0], 60, 60)
+        self.assertEqual([bool(v) for v in result.valid], [True, True])
+        result = validate_placements([4], [0], [60], [10], [30], 60, 60)
+        self.assertFalse(result.all())
+
+    def test_mixed_rotations(self):
+        """Test True is 90 degrees when mixed with angles"""
+        numpy = validation.numpy
+        for module in (numpy, None):
+            validation.numpy = module
+            try:
+                result = validate_placements([0, 0], [0, 0], [10, 10],
+                        [100, 100], [True, 45], 50, 200)
+            finally:
+                validation.numpy = numpy
+            self.assertEqual([int(r) for r in result.reasons],
+                    [OUT_OF_BOUNDS_X, OUT_OF_BOUNDS_X])
+
+    def test_mapper(self):
+        """Test mapper validation agrees with adding parts"""
+        mapper = SVGMapper(100, 100)
+        result = mapper.validate_placements([0, 50], [0, 0], [80, 80],
+                [20, 20], [False, False])
+        self.assertEqual([bool(v) for v in result.valid], [True, False])
+
+        with self.assertRaises(ValueError):
+            validate_placements([0], [0, 1], [1], [1])